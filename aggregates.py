@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Materialized aggregate cube behind the Overview Dashboard.
+
+The cube holds one row per (month, channel, home_branch, location,
+account_type) with transaction count, fraud count and amount sums. It is
+built at ingest, updated incrementally as new transactions arrive, and
+every KPI card and fraud-rate chart is answered from it, so the cost of
+a page render depends on the number of cells rather than on history.
+"""
+
+import os
+
+import pandas as pd
+
+CUBE_KEYS = ["month", "channel", "home_branch", "location", "account_type"]
+CUBE_MEASURES = ["txn_count", "fraud_count", "amount_sum", "fraud_amount_sum"]
+
+# Merged-table columns the cube is built from
+CUBE_SOURCE_COLUMNS = ["date", "amount_etb", "fraud_flag"] + CUBE_KEYS
+
+CUBE_FILE = "_cube.parquet"  # underscore prefix keeps it out of the Parquet dataset scan
+
+
+def build_cube(df):
+    """Aggregate a block of merged transactions into cube cells."""
+    if "month" not in df.columns:
+        df = df.assign(month=pd.to_datetime(df["date"]).dt.strftime("%Y-%m"))
+    fraud = df["fraud_flag"].astype("int64")
+    cells = df.assign(
+        txn_count=1,
+        fraud_count=fraud,
+        amount_sum=df["amount_etb"],
+        fraud_amount_sum=df["amount_etb"] * fraud,
+    )
+    return _rollup(cells)
+
+
+def _rollup(cells):
+    cube = cells.groupby(CUBE_KEYS, observed=True, dropna=False)[CUBE_MEASURES].sum().reset_index()
+    for key in CUBE_KEYS:
+        cube[key] = cube[key].astype("category")
+    return cube
+
+
+def merge_cubes(*cubes):
+    """Combine cubes cell by cell; only cells present in the inputs change."""
+    cubes = [c for c in cubes if c is not None and len(c)]
+    if not cubes:
+        return None
+    combined = pd.concat([c.astype({k: str for k in CUBE_KEYS}) for c in cubes], ignore_index=True)
+    return _rollup(combined)
+
+
+def update_cube(cube, new_transactions):
+    """Fold a batch of newly arrived merged transactions into the cube."""
+    return merge_cubes(cube, build_cube(new_transactions))
+
+
+def kpis(cube):
+    """The four Overview KPI cards."""
+    total = int(cube["txn_count"].sum())
+    amount = cube["amount_sum"].sum()
+    return {
+        "total_transactions": total,
+        "total_fraud": int(cube["fraud_count"].sum()),
+        "avg_amount": amount / total if total else 0.0,
+        "fraud_amount_etb": cube["fraud_amount_sum"].sum(),
+    }
+
+
+def fraud_rate_by(cube, dim):
+    """Fraud rate (%) per value of one cube key, highest first."""
+    grouped = cube.groupby(dim, observed=True)[["txn_count", "fraud_count"]].sum()
+    out = grouped.reset_index()
+    out[dim] = out[dim].astype(str)
+    out["fraud_rate"] = out["fraud_count"] / out["txn_count"] * 100
+    return out.sort_values("fraud_rate", ascending=False).reset_index(drop=True)
+
+
+def cube_path(store_dir):
+    return os.path.join(store_dir, CUBE_FILE)
+
+
+def save_cube(cube, store_dir):
+    # Write then rename so readers never see a partial file
+    path = cube_path(store_dir)
+    tmp_path = path + ".tmp"
+    cube.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def read_cube(store_dir):
+    path = cube_path(store_dir)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
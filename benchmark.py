@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Headless benchmark of the dashboard's hot paths.
+
+    python benchmark.py --sizes 100000 1000000 10000000
+    python benchmark.py --save-baseline            # record the current numbers
+    python benchmark.py --baseline bench_baseline.json --tolerance 1.25
+
+Each size gets a seeded synthetic dataset from generate_data.py (cached
+under ``--data-dir``). The cases then run without Streamlit, through the
+same functions the app uses: CSV load and merge, store load, cube build
+and Overview KPIs (exact, and from the stratified sample), Explorer
+index build and filtering with a set of channel/branch selections, and
+single-row and batch scoring. Wall time (median of ``--repeat`` runs)
+and peak traced memory (one extra run under tracemalloc) go to a JSON
+results file. That file is compared against a baseline, and the exit
+status is 1 when a case got slower or bigger than the tolerance allows.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from functools import cached_property
+
+from constants import branches, transaction_channels
+
+DATA_DIR = os.path.join("data", "bench")
+RESULTS_PATH = "bench_results.json"
+BASELINE_PATH = "bench_baseline.json"
+SIZES = [100_000, 1_000_000, 10_000_000]
+BATCH_ROWS = 100_000
+SINGLE_ROWS = 200
+MEMORY_NOISE = 1.05  # peak-memory ratios below this are measurement noise in the flat-vs-sklearn check
+
+# Explorer filter selections: (channels, branches, fraud_only)
+SELECTIONS = [
+    (transaction_channels[:3], [], False),  # the app's default
+    ([], [], True),
+    (transaction_channels, branches, False),
+    (transaction_channels[:1], branches[:2], True),
+    ([], branches[:5], False),
+]
+
+
+class Dataset:
+    """Synthetic data of one size and everything the cases build from it (not timed)."""
+
+    def __init__(self, rows, data_dir=DATA_DIR, model_path="fraud_model.pkl", features_path="model_features.pkl"):
+        from generate_data import generate
+
+        self.rows = rows
+        self.dir = os.path.join(data_dir, str(rows))
+        self.transactions_csv = os.path.join(self.dir, "awash_transactions.csv")
+        self.customers_csv = os.path.join(self.dir, "awash_customers.csv")
+        self.model_path = model_path
+        self.features_path = features_path
+        if not os.path.exists(self.transactions_csv):
+            generate(self.dir, rows)
+
+    @cached_property
+    def store_dir(self):
+        from data_store import build_store
+
+        path = os.path.join(self.dir, "store")
+        if not os.path.exists(path):
+            build_store(self.transactions_csv, self.customers_csv, path)
+        return path
+
+    @cached_property
+    def frame(self):
+        from data_store import merge_customers, read_customers, read_transactions
+
+        return merge_customers(read_transactions(self.transactions_csv), read_customers(self.customers_csv))
+
+    @cached_property
+    def cube(self):
+        from aggregates import CUBE_SOURCE_COLUMNS, build_cube
+
+        return build_cube(self.frame[CUBE_SOURCE_COLUMNS])
+
+    @cached_property
+    def sample(self):
+        from sampling import build_sample
+
+        return build_sample(self.frame)
+
+    @cached_property
+    def index(self):
+        from explorer_query import SOURCE_COLUMNS, ExplorerIndex
+
+        return ExplorerIndex(self.frame[SOURCE_COLUMNS])
+
+    @property
+    def has_model(self):
+        return os.path.exists(self.model_path)
+
+    @cached_property
+    def model(self):
+        from scoring import load_scoring_model
+
+        return load_scoring_model(self.model_path, self.features_path)
+
+    @cached_property
+    def flat_model(self):
+        from flat_forest import FlatForest
+
+        return FlatForest.from_sklearn(self.model[0])
+
+    @cached_property
+    def records(self):
+        """Raw form-style fields for single-row scoring."""
+        df = self.frame.head(SINGLE_ROWS)
+        return [
+            {
+                "amount_etb": row.amount_etb, "hour": row.date.hour, "is_weekend": row.date.dayofweek >= 5,
+                "location": str(row.location), "home_branch": str(row.home_branch), "balance_etb": row.balance_etb,
+                "channel": str(row.channel), "account_type": str(row.account_type),
+            }
+            for row in df.itertuples(index=False)
+        ]
+
+
+# Each case returns the number of operations it performed (rows, queries or predictions)
+def csv_load_merge(ds):
+    from data_store import merge_customers, read_customers, read_transactions
+
+    return len(merge_customers(read_transactions(ds.transactions_csv), read_customers(ds.customers_csv)))
+
+
+def store_load(ds):
+    from aggregates import CUBE_SOURCE_COLUMNS
+    from data_store import load_store
+    from explorer_query import SOURCE_COLUMNS
+
+    return len(load_store(ds.store_dir, columns=list(dict.fromkeys(CUBE_SOURCE_COLUMNS + SOURCE_COLUMNS))))
+
+
+def cube_build(ds):
+    from aggregates import CUBE_SOURCE_COLUMNS, build_cube
+
+    build_cube(ds.frame[CUBE_SOURCE_COLUMNS])
+    return ds.rows
+
+
+def overview_kpis(ds):
+    from aggregates import fraud_rate_by, kpis
+
+    kpis(ds.cube)
+    fraud_rate_by(ds.cube, "channel")
+    fraud_rate_by(ds.cube, "home_branch")
+    return 1
+
+
+def sample_build(ds):
+    from sampling import build_sample
+
+    build_sample(ds.frame)
+    return ds.rows
+
+
+def overview_kpis_sampled(ds):
+    from sampling import sample_fraud_rate_by, sample_kpis
+
+    sample_kpis(ds.sample)
+    sample_fraud_rate_by(ds.sample, "channel")
+    sample_fraud_rate_by(ds.sample, "home_branch")
+    return 1
+
+
+def explorer_index_build(ds):
+    from explorer_query import SOURCE_COLUMNS, ExplorerIndex
+
+    ExplorerIndex(ds.frame[SOURCE_COLUMNS])
+    return ds.rows
+
+
+def explorer_filter(ds):
+    for channels, selected_branches, fraud_only in SELECTIONS:
+        matches = ds.index.query(channels, selected_branches, fraud_only)
+        ds.index.page(matches, 1, 1000)
+    return len(SELECTIONS)
+
+
+def _predict_single(ds, model):
+    from scoring import predict_fraud_proba
+
+    schema = ds.model[1]
+    for record in ds.records:
+        predict_fraud_proba(model, schema.transform_record(record))
+    return len(ds.records)
+
+
+def predict_single(ds):
+    return _predict_single(ds, ds.model[0])
+
+
+def predict_single_flat(ds):
+    return _predict_single(ds, ds.flat_model)
+
+
+def _predict_batch(ds, model):
+    from scoring import build_features, predict_fraud_proba
+    from velocity import add_velocity_features
+
+    df = ds.frame.head(BATCH_ROWS)
+    schema = ds.model[1]
+    predict_fraud_proba(model, build_features(add_velocity_features(df, schema), schema))
+    return len(df)
+
+
+def predict_batch(ds):
+    return _predict_batch(ds, ds.model[0])
+
+
+def predict_batch_flat(ds):
+    return _predict_batch(ds, ds.flat_model)
+
+
+CASES = {
+    "csv_load_merge": csv_load_merge,
+    "store_load": store_load,
+    "cube_build": cube_build,
+    "overview_kpis": overview_kpis,
+    "sample_build": sample_build,
+    "overview_kpis_sampled": overview_kpis_sampled,
+    "explorer_index_build": explorer_index_build,
+    "explorer_filter": explorer_filter,
+    "predict_single": predict_single,
+    "predict_single_flat": predict_single_flat,
+    "predict_batch": predict_batch,
+    "predict_batch_flat": predict_batch_flat,
+}
+MODEL_CASES = {"predict_single", "predict_single_flat", "predict_batch", "predict_batch_flat"}
+
+
+def measure(fn, ds, repeat, memory=True):
+    fn(ds)  # warm-up; also builds whatever the case reads from ds
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops = fn(ds)
+        runs.append(time.perf_counter() - start)
+    result = {"seconds": statistics.median(runs), "runs": runs, "ops": ops}
+    result["us_per_op"] = result["seconds"] / ops * 1e6 if ops else None
+    if memory:
+        # Separate run: tracemalloc slows allocation-heavy code down
+        tracemalloc.start()
+        fn(ds)
+        result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(sizes=SIZES, cases=None, repeat=3, data_dir=DATA_DIR, memory=True):
+    results = {}
+    for rows in sizes:
+        ds = Dataset(rows, data_dir)
+        for name in cases or CASES:
+            if name in MODEL_CASES and not ds.has_model:
+                print(f"  - {name} @ {rows:,}: skipped (no fraud_model.pkl)")
+                continue
+            result = measure(CASES[name], ds, repeat, memory)
+            results[f"{name}@{rows}"] = result
+            peak = f", peak {result['peak_mb']:,.1f} MB" if memory else ""
+            print(f"  {name:<22}{rows:>12,} rows {result['seconds'] * 1000:>10.1f} ms{peak}")
+        del ds
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def flat_vs_sklearn(current):
+    """Warn about FlatForest cases that are slower or use more memory than their sklearn counterpart.
+
+    Returns the keys of the flat cases that lost.
+    """
+    slower = []
+    for key, flat in current["results"].items():
+        name, rows = key.split("@")
+        if not name.endswith("_flat"):
+            continue
+        base = current["results"].get(f"{name[:-len('_flat')]}@{rows}")
+        if base is None:
+            continue
+        notes = []
+        if flat["seconds"] > base["seconds"]:
+            notes.append(f"{flat['seconds'] / base['seconds']:.2f}x the time")
+        if flat.get("peak_mb") and base.get("peak_mb") and flat["peak_mb"] > base["peak_mb"] * MEMORY_NOISE:
+            notes.append(f"{flat['peak_mb'] / base['peak_mb']:.2f}x the peak memory")
+        if notes:
+            slower.append(key)
+            print(f"⚠ {key} takes {' and '.join(notes)} of the sklearn forest; prefer the sklearn backend for this case")
+    return slower
+
+
+def compare(current, baseline, tolerance=1.25):
+    """Print current vs baseline; returns the keys that regressed."""
+    regressions = []
+    print(f"\n{'case':<36}{'baseline':>12}{'current':>12}{'ratio':>8}{'peak ratio':>12}")
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        ratio = result["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        mem_ratio = result["peak_mb"] / base["peak_mb"] if result.get("peak_mb") and base.get("peak_mb") else None
+        slower = ratio > tolerance or (mem_ratio is not None and mem_ratio > tolerance)
+        if slower:
+            regressions.append(key)
+        mem = f"{mem_ratio:>11.2f}x" if mem_ratio is not None else f"{'-':>12}"
+        print(f"{key:<36}{base['seconds'] * 1000:>10.1f}ms{result['seconds'] * 1000:>10.1f}ms{ratio:>7.2f}x{mem}"
+              + ("  ✗ regression" if slower else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark load, aggregation, Explorer filtering and scoring.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--cases", nargs="+", choices=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--out", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Allowed slowdown / memory growth ratio")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc peak-memory run")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.cases, args.repeat, args.data_dir, not args.no_memory)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+    print(f"✓ Results written to {args.out}")
+    flat_vs_sklearn(results)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+        print(f"✓ Baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s) beyond {args.tolerance:.2f}x")
+            sys.exit(1)
+        print("\n✓ No regressions")
+
+
+if __name__ == "__main__":
+    main()
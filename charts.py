@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Pre-rendered, cached charts for the Overview Dashboard.
+
+Each chart is rendered once per (dataset version, chart key, options)
+into PNG bytes and kept in a process-wide LRU bounded by total bytes, so
+repeat page views and other sessions reuse the image instead of building
+a new Matplotlib figure. Figures are created with the object-oriented
+``Figure`` API rather than ``pyplot``: they are never registered with
+pyplot's figure manager, and are released as soon as the PNG is written.
+"""
+
+import io
+import threading
+from collections import OrderedDict
+
+from metrics import METRICS
+
+CACHE_BYTES = 32 * 1024 * 1024
+DPI = 100
+
+
+def _error_bars(ax, df, horizontal=False):
+    # Confidence intervals of approximate (sampled) fraud rates; bars are drawn in frame order
+    if "ci_low" not in df.columns:
+        return
+    rate = df["fraud_rate"].to_numpy()
+    err = [rate - df["ci_low"].to_numpy(), df["ci_high"].to_numpy() - rate]
+    pos = range(len(df))
+    if horizontal:
+        ax.errorbar(rate, pos, xerr=err, fmt="none", ecolor="black", elinewidth=1, capsize=3)
+    else:
+        ax.errorbar(pos, rate, yerr=err, fmt="none", ecolor="black", elinewidth=1, capsize=3)
+
+
+# Seaborn/Matplotlib are imported on the first render only; cache hits never need them
+def _fraud_rate_by_channel(channel_df):
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(11, 6))
+    ax = fig.subplots()
+    sns.barplot(data=channel_df, x='channel', y='fraud_rate', hue='channel', palette='Blues_d', legend=False, ax=ax)
+    _error_bars(ax, channel_df)
+    ax.set_title("Fraud Rate by Channel (%)", fontsize=14)
+    ax.set_ylabel("Fraud Rate (%)")
+    ax.tick_params(axis='x', rotation=45)
+    return fig
+
+
+def _top_branches(branch_df, top=15):
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    branch_df = branch_df.head(top)
+    fig = Figure(figsize=(11, 8))
+    ax = fig.subplots()
+    sns.barplot(data=branch_df, y='home_branch', x='fraud_rate', hue='home_branch', palette='Greens_d', legend=False, ax=ax)
+    _error_bars(ax, branch_df, horizontal=True)
+    ax.set_title("Top Branches by Fraud Rate (%)", fontsize=14)
+    ax.set_xlabel("Fraud Rate (%)")
+    return fig
+
+
+# chart key -> function(data, **options) returning a Figure
+CHARTS = {
+    "fraud_rate_by_channel": _fraud_rate_by_channel,
+    "top_branches": _top_branches,
+}
+
+# Overview charts: chart key -> (fraud_rate_by dimension, options)
+OVERVIEW_CHARTS = {
+    "fraud_rate_by_channel": ("channel", {}),
+    "top_branches": ("home_branch", {"top": 15}),
+}
+
+
+def render_png(fig, dpi=DPI):
+    """PNG bytes of a figure; the figure is cleared afterwards."""
+    buf = io.BytesIO()
+    try:
+        fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+    finally:
+        fig.clear()
+    return buf.getvalue()
+
+
+class ChartCache:
+    """Thread-safe LRU of rendered charts, bounded by total PNG bytes."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(name, version, **options):
+        return (name, version, tuple(sorted(options.items())))
+
+    def get(self, key):
+        with self._lock:
+            png = self._entries.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return png
+
+    def put(self, key, png):
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = png
+            self.size += len(png)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def chart(self, name, version, data, **options):
+        """PNG bytes for chart ``name`` at a dataset version.
+
+        data: the chart's input frame, or a callable returning it, so a
+        cache hit does not even fetch the data.
+        """
+        key = self.key(name, version, **options)
+        png = self.get(key)
+        if png is None:
+            frame = data() if callable(data) else data
+            with METRICS.span("chart_render", chart=name):
+                png = render_png(CHARTS[name](frame, **options))
+            self.put(key, png)
+        return png
+
+    def overview_chart(self, name, source, version):
+        """One of OVERVIEW_CHARTS for a data source at a dataset version."""
+        dim, options = OVERVIEW_CHARTS[name]
+        return self.chart(name, version, lambda: source.fraud_rate_by(dim), **options)
+
+    def stats(self):
+        return {"entries": len(self._entries), "bytes": self.size, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,41 @@
+# Realistic lists shared by the dashboard, the loaders and the model features
+
+branches = [
+    "Awash Towers Headquarters - Addis Ababa",
+    "Bole Branch - Addis Ababa",
+    "Kirkos Branch - Addis Ababa",
+    "Mexico Square Branch - Addis Ababa",
+    "Piassa Branch - Addis Ababa",
+    "Merkato Branch - Addis Ababa",
+    "Dire Dawa Branch - Dire Dawa",
+    "Bahir Dar Branch - Bahir Dar",
+    "Mekelle Branch - Mekelle",
+    "Jimma Branch - Jimma",
+    "Awassa Branch - Awassa",
+    "Adama Branch - Adama",
+    "Gondar Branch - Gondar",
+    "Dessie Branch - Dessie",
+    "Harar Branch - Harar",
+    "Shashemene Branch - Shashemene",
+    "Arba Minch Branch - Arba Minch",
+    "Debre Birhan Branch - Debre Birhan"
+]
+
+transaction_channels = [
+    "AwashBirr Mobile Transfer",
+    "ATM Withdrawal",
+    "POS Payment",
+    "Branch Deposit",
+    "Branch Withdrawal",
+    "Agent Banking",
+    "Bill Payment",
+    "Fund Transfer"
+]
+
+account_types = [
+    "Savings Account",
+    "Current Account",
+    "Diaspora Foreign Currency",
+    "Lucy Women Saving",
+    "Wadiah Saving (Interest-Free)"
+]
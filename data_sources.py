@@ -0,0 +1,499 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Data sources behind the dashboard pages.
+
+Every page asks a DataSource for exactly what it shows: the KPI cards,
+fraud rates per channel or branch, and one filtered page of the Fraud
+Explorer. Three implementations answer those questions:
+
+* CsvSource     - the raw CSV exports, merged in memory
+* StoreSource   - the columnar Parquet store and its aggregate cube
+* SqlSource     - the awash_analytics schema (MySQL, or SQLite as a
+                  local stand-in); aggregation and LIMIT/OFFSET paging
+                  run in the database over pooled connections, with the
+                  Overview read from fraud_daily_summary when it exists
+
+* SnapshotSource - a memory-mapped warm-start snapshot (snapshot.py)
+
+``open_data_source()`` picks one from ``AWASH_DATA_SOURCE``
+(auto | csv | store | snapshot | mysql | sqlite); "auto" uses the store
+when it has been built and the CSVs otherwise, starting from the
+snapshot when there is one.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from aggregates import CUBE_SOURCE_COLUMNS, build_cube, fraud_rate_by, kpis, read_cube
+from data_store import (
+    CUSTOMERS_CSV, STORE_DIR, TRANSACTIONS_CSV, dataset_version, load_store,
+    merge_customers, read_customers, read_transactions, scan_store, store_exists,
+)
+from explorer_query import DISPLAY_COLUMNS, SOURCE_COLUMNS as EXPLORER_SOURCE_COLUMNS, ExplorerIndex
+from sampling import read_sample
+from snapshot import SNAPSHOT_DIR, open_snapshot
+
+SQLITE_PATH = "awash.db"
+POOL_SIZE = 4
+EXPORT_BATCH_ROWS = 100_000
+
+
+class DataSource:
+    """What the dashboard needs from the data, wherever it lives."""
+
+    def version(self):
+        """Token that changes whenever the data does; caches key on it."""
+        raise NotImplementedError
+
+    def kpis(self):
+        """The four Overview KPI cards (see aggregates.kpis)."""
+        raise NotImplementedError
+
+    def fraud_rate_by(self, dim):
+        """[dim, txn_count, fraud_count, fraud_rate] per value, highest rate first."""
+        raise NotImplementedError
+
+    def explorer_count(self, channels=None, branches=None, fraud_only=False):
+        """Number of transactions matching the Explorer filters."""
+        raise NotImplementedError
+
+    def explorer_page(self, channels=None, branches=None, fraud_only=False, page=1, page_size=1000):
+        """One page of matching transactions with DISPLAY_COLUMNS."""
+        raise NotImplementedError
+
+    def transactions(self, columns):
+        """All merged transactions with the given columns (e.g. to warm velocity
+        state), or None when the source does not hold them in memory."""
+        return None
+
+    def sample(self):
+        """The stratified sample kept at ingest (sampling.py), or None without one."""
+        return None
+
+    def explorer_batches(self, channels=None, branches=None, fraud_only=False, batch_size=EXPORT_BATCH_ROWS):
+        """Every transaction matching the Explorer filters, as frames of ``batch_size``
+        rows with DISPLAY_COLUMNS (the last one shorter)."""
+        raise NotImplementedError
+
+
+class _FrameSource(DataSource):
+    """In-memory sources: the cube and Explorer index are built once per version."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built_version = None
+        self._cube = None
+        self._index = None
+
+    def _frame(self, columns):
+        raise NotImplementedError
+
+    def _build_cube(self):
+        return build_cube(self._frame(CUBE_SOURCE_COLUMNS))
+
+    def _current(self):
+        version = self.version()
+        if version != self._built_version:
+            self._cube = self._index = None
+            self._built_version = version
+
+    def cube(self):
+        with self._lock:
+            self._current()
+            if self._cube is None:
+                self._cube = self._build_cube()
+            return self._cube
+
+    def index(self):
+        with self._lock:
+            self._current()
+            if self._index is None:
+                self._index = ExplorerIndex(self._frame(EXPLORER_SOURCE_COLUMNS))
+            return self._index
+
+    def kpis(self):
+        return kpis(self.cube())
+
+    def fraud_rate_by(self, dim):
+        return fraud_rate_by(self.cube(), dim)
+
+    def explorer_count(self, channels=None, branches=None, fraud_only=False):
+        return len(self.index().query(channels, branches, fraud_only))
+
+    def explorer_page(self, channels=None, branches=None, fraud_only=False, page=1, page_size=1000):
+        index = self.index()
+        return index.page(index.query(channels, branches, fraud_only), page, page_size, DISPLAY_COLUMNS)
+
+    def explorer_batches(self, channels=None, branches=None, fraud_only=False, batch_size=EXPORT_BATCH_ROWS):
+        index = self.index()
+        positions = index.query(channels, branches, fraud_only)
+        for page in range(1, -(-len(positions) // batch_size) + 1):
+            yield index.page(positions, page, batch_size, DISPLAY_COLUMNS)
+
+    def transactions(self, columns):
+        with self._lock:
+            self._current()
+            return self._frame(columns)
+
+
+class CsvSource(_FrameSource):
+    """The raw CSV exports, merged on account_number."""
+
+    def __init__(self, transactions_csv=TRANSACTIONS_CSV, customers_csv=CUSTOMERS_CSV):
+        super().__init__()
+        self.transactions_csv = transactions_csv
+        self.customers_csv = customers_csv
+        self._merged = None
+        self._merged_version = None
+
+    def version(self):
+        mtimes = (os.stat(path).st_mtime_ns for path in (self.transactions_csv, self.customers_csv))
+        return "csv-" + "-".join(str(m) for m in mtimes)
+
+    def _frame(self, columns):
+        # Merged once per version and shared by the cube, the Explorer index and transactions()
+        version = self.version()
+        if self._merged is None or self._merged_version != version:
+            self._merged = merge_customers(read_transactions(self.transactions_csv), read_customers(self.customers_csv))
+            self._merged_version = version
+        return self._merged[columns]
+
+
+class StoreSource(_FrameSource):
+    """The Parquet store; the Overview reads the cube kept up to date at ingest."""
+
+    def __init__(self, store_dir=STORE_DIR):
+        super().__init__()
+        self.store_dir = store_dir
+
+    def version(self):
+        return dataset_version(self.store_dir)
+
+    def _frame(self, columns):
+        return load_store(self.store_dir, columns=columns)
+
+    def _build_cube(self):
+        cube = read_cube(self.store_dir)
+        return cube if cube is not None else super()._build_cube()
+
+    def sample(self):
+        return read_sample(self.store_dir)
+
+    def explorer_batches(self, channels=None, branches=None, fraud_only=False, batch_size=EXPORT_BATCH_ROWS):
+        # Straight from the Parquet files; a channel filter prunes whole partitions
+        filters = {"channel": channels or None, "home_branch": branches or None, "fraud_flag": [1] if fraud_only else None}
+        for rows in scan_store(self.store_dir, EXPLORER_SOURCE_COLUMNS, filters, batch_size):
+            rows = rows.assign(status=np.where(rows["fraud_flag"].to_numpy() == 1, "Fraud", "Normal"))
+            yield rows[DISPLAY_COLUMNS]
+
+
+class _Pool:
+    """Blocking pool of open connections (the MySQL pool raises when exhausted).
+
+    ping(conn), when given, runs on every checkout and raises if the
+    connection is unusable (e.g. dropped by the server's wait_timeout);
+    such a connection is replaced with a fresh one. After a failed query
+    only a connection that still answers the ping goes back in the pool.
+    """
+
+    def __init__(self, connect, size=POOL_SIZE, ping=None):
+        self._connect = connect
+        self._ping = ping
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            self._idle.put(connect())
+
+    def _healthy(self, conn):
+        if self._ping is None:
+            return True
+        try:
+            self._ping(conn)
+            return True
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return False
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()  # None marks a slot whose connection was dropped
+        try:
+            if conn is None or not self._healthy(conn):
+                conn = self._connect()
+        except BaseException:
+            self._idle.put(None)
+            raise
+        try:
+            yield conn
+        except BaseException:
+            self._idle.put(conn if self._healthy(conn) else None)
+            raise
+        self._idle.put(conn)
+
+
+def mysql_pool(size=POOL_SIZE):
+    from dotenv import load_dotenv
+    import mysql.connector
+
+    load_dotenv()
+    config = {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'database': os.getenv('DB_NAME', 'awash_analytics'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+    }
+    # autocommit so every query sees rows committed by the loader since the last one
+    return _Pool(lambda: mysql.connector.connect(autocommit=True, **config), size,
+                 ping=lambda conn: conn.ping(reconnect=True, attempts=1, delay=0))
+
+
+def sqlite_pool(path=SQLITE_PATH, size=POOL_SIZE):
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    uri = f"file:{os.path.abspath(path)}?mode=ro"
+    return _Pool(lambda: sqlite3.connect(uri, uri=True, check_same_thread=False), size)
+
+
+class SqlSource(DataSource):
+    """The awash_analytics schema; each page is one or two aggregate/paged queries."""
+
+    # Dimension -> qualified column; customer columns need the join
+    DIMENSIONS = {
+        "channel": "t.channel",
+        "location": "t.location",
+        "home_branch": "c.home_branch",
+        "account_type": "c.account_type",
+    }
+    JOIN = "FROM transactions t JOIN customers c ON c.account_number = t.account_number"
+    PAGE_SELECT = (
+        "SELECT t.transaction_id, t.date, t.amount_etb, t.channel, t.location, t.merchant, "
+        "CASE WHEN t.fraud_flag = 1 THEN 'Fraud' ELSE 'Normal' END AS status, "
+        "c.home_branch, c.balance_etb "
+    )
+
+    KPI_SELECT = (
+        "SELECT COUNT(*) AS total, SUM(t.fraud_flag) AS fraud, SUM(t.amount_etb) AS amount, "
+        "SUM(CASE WHEN t.fraud_flag = 1 THEN t.amount_etb ELSE 0 END) AS fraud_amount "
+    )
+    # fraud_daily_summary (summary_tables.sql) and the rows not yet folded into it
+    SUMMARY_DIMENSIONS = ("channel", "home_branch", "location")
+    WATERMARK = "(SELECT last_transaction_id FROM summary_watermark WHERE table_name = 'fraud_daily_summary')"
+
+    def __init__(self, pool, placeholder, use_summary=True):
+        self.pool = pool
+        self.placeholder = placeholder
+        self.use_summary = use_summary
+        self._has_summary = None
+
+    def _query(self, sql, params=()):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, tuple(params))
+                rows = cursor.fetchall()
+                columns = [d[0] for d in cursor.description]
+            finally:
+                cursor.close()
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+    def summary(self):
+        """Whether the maintained daily summary can answer the Overview."""
+        if self._has_summary is None:
+            try:
+                self._has_summary = self.use_summary and len(self._query(self.WATERMARK[1:-1])) > 0
+            except Exception:
+                self._has_summary = False  # summary_tables.sql has not been run
+        return self._has_summary
+
+    def version(self):
+        # Transactions are append-only, so the newest id identifies the dataset
+        latest = self._query("SELECT MAX(transaction_id) AS latest FROM transactions")["latest"].iloc[0]
+        return f"sql-{latest}"
+
+    def kpis(self):
+        if self.summary():
+            # Summary totals plus the rows above the watermark, in one statement
+            sql = (
+                "SELECT SUM(txn_count) AS total, SUM(fraud_count) AS fraud, SUM(amount_sum) AS amount, "
+                "SUM(fraud_amount_sum) AS fraud_amount FROM fraud_daily_summary "
+                f"UNION ALL {self.KPI_SELECT}FROM transactions t WHERE t.transaction_id > {self.WATERMARK}"
+            )
+        else:
+            sql = f"{self.KPI_SELECT}FROM transactions t"
+        row = self._query(sql).astype(float).fillna(0).sum()
+        total = int(row["total"])
+        return {
+            "total_transactions": total,
+            "total_fraud": int(row["fraud"]),
+            "avg_amount": row["amount"] / total if total else 0.0,
+            "fraud_amount_etb": row["fraud_amount"],
+        }
+
+    def fraud_rate_by(self, dim):
+        column = self.DIMENSIONS[dim]
+        source = self.JOIN if column.startswith("c.") else "FROM transactions t"
+        select = f"SELECT {column} AS {dim}, COUNT(*) AS txn_count, SUM(t.fraud_flag) AS fraud_count {source}"
+        if self.summary() and dim in self.SUMMARY_DIMENSIONS:
+            sql = (
+                f"SELECT {dim}, SUM(txn_count) AS txn_count, SUM(fraud_count) AS fraud_count "
+                f"FROM fraud_daily_summary GROUP BY {dim} "
+                f"UNION ALL {select} WHERE t.transaction_id > {self.WATERMARK} GROUP BY {column}"
+            )
+        else:
+            sql = f"{select} GROUP BY {column}"
+        out = self._query(sql).astype({dim: str, "txn_count": "int64", "fraud_count": "int64"})
+        out = out.groupby(dim, as_index=False)[["txn_count", "fraud_count"]].sum()
+        out["fraud_rate"] = out["fraud_count"] / out["txn_count"] * 100
+        return out.sort_values("fraud_rate", ascending=False).reset_index(drop=True)
+
+    def _where(self, channels, branches, fraud_only):
+        clauses, params = [], []
+        for column, values in (("t.channel", channels), ("c.home_branch", branches)):
+            if values:
+                clauses.append(f"{column} IN ({', '.join([self.placeholder] * len(values))})")
+                params += list(values)
+        if fraud_only:
+            clauses.append("t.fraud_flag = 1")
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def explorer_count(self, channels=None, branches=None, fraud_only=False):
+        where, params = self._where(channels, branches, fraud_only)
+        if branches:
+            sql = f"SELECT COUNT(*) AS n {self.JOIN}{where}"
+        else:
+            sql = f"SELECT COUNT(*) AS n FROM transactions t{where}"  # no join needed
+        return int(self._query(sql, params)["n"].iloc[0])
+
+    def explorer_page(self, channels=None, branches=None, fraud_only=False, page=1, page_size=1000):
+        where, params = self._where(channels, branches, fraud_only)
+        sql = (f"{self.PAGE_SELECT}{self.JOIN}{where} ORDER BY t.transaction_id "
+               f"LIMIT {self.placeholder} OFFSET {self.placeholder}")
+        rows = self._query(sql, params + [int(page_size), int((page - 1) * page_size)])
+        return self._display(rows)
+
+    @staticmethod
+    def _display(rows):
+        rows["date"] = pd.to_datetime(rows["date"])
+        return rows.astype({"amount_etb": "float64", "balance_etb": "float64"})[DISPLAY_COLUMNS]
+
+    def explorer_batches(self, channels=None, branches=None, fraud_only=False, batch_size=EXPORT_BATCH_ROWS):
+        # Keyset pagination on the primary key: each batch is an index range
+        # scan, where a growing OFFSET would re-read every earlier row
+        where, params = self._where(channels, branches, fraud_only)
+        after = " AND " if where else " WHERE "
+        sql = (f"{self.PAGE_SELECT}{self.JOIN}{where}{after}t.transaction_id > {self.placeholder} "
+               f"ORDER BY t.transaction_id LIMIT {self.placeholder}")
+        last = -1
+        while True:
+            rows = self._query(sql, params + [last, int(batch_size)])
+            if rows.empty:
+                return
+            yield self._display(rows)
+            if len(rows) < batch_size:
+                return
+            last = int(rows["transaction_id"].iloc[-1])
+
+
+class SnapshotSource(_FrameSource):
+    """A warm-start snapshot (snapshot.py), handing over to the live source once it moves on."""
+
+    def __init__(self, snapshot, live=None):
+        super().__init__()
+        self.snapshot = snapshot
+        self.live = live
+
+    def version(self):
+        return self.live.version() if self.live is not None else self.snapshot.version
+
+    def current(self):
+        """The snapshot while it matches the live data, otherwise the live source."""
+        if self.live is None or self.live.version() == self.snapshot.version:
+            return None
+        return self.live
+
+    def _frame(self, columns):
+        return self.snapshot.frame(columns)
+
+    def _build_cube(self):
+        return self.snapshot.cube()
+
+    def kpis(self):
+        live = self.current()
+        return live.kpis() if live else dict(self.snapshot.kpis)
+
+    def fraud_rate_by(self, dim):
+        live = self.current()
+        return live.fraud_rate_by(dim) if live else super().fraud_rate_by(dim)
+
+    def explorer_count(self, channels=None, branches=None, fraud_only=False):
+        live = self.current()
+        if live:
+            return live.explorer_count(channels, branches, fraud_only)
+        return super().explorer_count(channels, branches, fraud_only)
+
+    def explorer_page(self, channels=None, branches=None, fraud_only=False, page=1, page_size=1000):
+        live = self.current()
+        if live:
+            return live.explorer_page(channels, branches, fraud_only, page, page_size)
+        return super().explorer_page(channels, branches, fraud_only, page, page_size)
+
+    def transactions(self, columns):
+        live = self.current()
+        if live:
+            return live.transactions(columns)
+        if not self.snapshot.has_columns(columns):
+            # A snapshot built without these columns; the live source holds the same version
+            return self.live.transactions(columns) if self.live is not None else None
+        return super().transactions(columns)
+
+    def sample(self):
+        # The snapshot's own answers are precomputed; only the live source needs one
+        live = self.current()
+        return live.sample() if live else None
+
+    def explorer_batches(self, channels=None, branches=None, fraud_only=False, batch_size=EXPORT_BATCH_ROWS):
+        live = self.current()
+        if live:
+            return live.explorer_batches(channels, branches, fraud_only, batch_size)
+        return super().explorer_batches(channels, branches, fraud_only, batch_size)
+
+
+def open_live_source(kind="auto"):
+    """A CSV, store or SQL source; "auto" is the store when built, else the CSVs."""
+    if kind == "auto":
+        kind = "store" if store_exists() else "csv"
+    if kind == "csv":
+        return CsvSource()
+    if kind == "store":
+        return StoreSource(os.getenv("AWASH_STORE_DIR", STORE_DIR))
+    if kind == "mysql":
+        return SqlSource(mysql_pool(), "%s")
+    if kind == "sqlite":
+        return SqlSource(sqlite_pool(os.getenv("AWASH_SQLITE_PATH", SQLITE_PATH)), "?")
+    raise ValueError(f"Unknown data source {kind!r}; expected auto, csv, store, snapshot, mysql or sqlite")
+
+
+def open_data_source(kind=None):
+    """The data source named by ``kind`` or the AWASH_DATA_SOURCE variable.
+
+    "snapshot" serves only the snapshot; "auto" starts from the snapshot
+    when one exists and follows the store (or CSVs) once they change.
+    """
+    kind = kind or os.getenv("AWASH_DATA_SOURCE", "auto")
+    snapshot = open_snapshot(os.getenv("AWASH_SNAPSHOT_DIR", SNAPSHOT_DIR)) if kind in ("auto", "snapshot") else None
+    if kind == "snapshot":
+        if snapshot is None:
+            raise FileNotFoundError("no snapshot; run `python snapshot.py` first")
+        return SnapshotSource(snapshot)
+    live = open_live_source(kind)
+    return SnapshotSource(snapshot, live) if snapshot is not None else live
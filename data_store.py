@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Columnar Parquet store for the merged transactions table.
+
+Run the ingest step whenever new CSV exports land:
+
+    python data_store.py --transactions awash_transactions.csv --customers awash_customers.csv
+
+The transactions CSV is read in chunks, joined to customers once, and
+written as a Parquet dataset partitioned by month and channel. The
+dashboard then reads only the columns and partitions a page needs,
+memory-mapping the files instead of copying them into the heap.
+"""
+
+import argparse
+import itertools
+import os
+import shutil
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+from aggregates import build_cube, merge_cubes, save_cube
+from constants import account_types, branches, transaction_channels
+from sampling import build_sample, merge_samples, save_sample
+
+STORE_DIR = os.path.join("data", "transactions_store")
+TRANSACTIONS_CSV = "awash_transactions.csv"
+CUSTOMERS_CSV = "awash_customers.csv"
+
+# Column types for the raw CSV exports
+TRANSACTION_DTYPES = {
+    "transaction_id": "int64",
+    "account_number": "int64",
+    "amount_etb": "float64",
+    "channel": "string",
+    "location": "string",
+    "merchant": "string",
+    "fraud_flag": "int64",
+}
+CUSTOMER_DTYPES = {
+    "customer_id": "int64",
+    "full_name": "string",
+    "phone": "string",
+    "address": "string",
+    "account_number": "int64",
+    "account_type": "string",
+    "balance_etb": "float64",
+    "home_branch": "string",
+}
+
+# Columns the dashboard and model actually use; customer PII (name, phone,
+# address) and bookkeeping ids are dropped at ingest
+KEEP_COLUMNS = [
+    "transaction_id", "account_number", "date", "amount_etb", "channel", "location",
+    "merchant", "fraud_flag", "home_branch", "balance_etb", "account_type", "month",
+]
+
+# Dictionary-encoded columns and their known values (codes stay stable across loads)
+CATEGORIES = {
+    "channel": transaction_channels,
+    "location": branches,
+    "home_branch": branches,
+    "account_type": account_types,
+    "merchant": [],
+    "month": [],
+}
+
+VERSION_FILE = "_VERSION"  # bumped on every change; the dashboard caches per version
+
+PARTITION_SCHEMA = pa.schema([("month", pa.string()), ("channel", pa.string())])
+
+
+def _partitioning():
+    return ds.partitioning(PARTITION_SCHEMA, flavor="hive")
+
+
+def _filesystem():
+    # Memory-mapped reads: pages are shared with the OS cache instead of copied
+    return pafs.LocalFileSystem(use_mmap=True)
+
+
+def read_customers(customers_csv=CUSTOMERS_CSV):
+    return pd.read_csv(customers_csv, dtype=CUSTOMER_DTYPES, parse_dates=["join_date"])
+
+
+def read_transactions(transactions_csv=TRANSACTIONS_CSV, chunksize=None):
+    return pd.read_csv(transactions_csv, dtype=TRANSACTION_DTYPES, parse_dates=["date"], chunksize=chunksize)
+
+
+def _category_dtype(series, known):
+    seen = series.dropna().unique()
+    extra = sorted(set(map(str, seen)) - set(known))
+    return pd.CategoricalDtype(list(known) + extra)
+
+
+def compact_frame(df, downcast_ids=True):
+    """Apply the loader schema to a merged frame.
+
+    Low-cardinality strings become categoricals, integer columns are
+    downcast and unused customer columns are dropped. Amounts stay float64
+    so the KPI sums are exact to the cent. Ingest passes
+    ``downcast_ids=False`` so every chunk written keeps the same id type.
+    """
+    df = df[[c for c in KEEP_COLUMNS if c in df.columns]].copy()
+    for col, known in CATEGORIES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(_category_dtype(df[col], known))
+    if "fraud_flag" in df.columns:
+        df["fraud_flag"] = df["fraud_flag"].astype("int8")
+    if downcast_ids and "transaction_id" in df.columns:
+        df["transaction_id"] = pd.to_numeric(df["transaction_id"], downcast="integer")
+    if "date" in df.columns and not pd.api.types.is_datetime64_any_dtype(df["date"]):
+        df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def memory_report(df):
+    """Per-column in-memory size of a frame, largest first."""
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "bytes": usage,
+    })
+    report["mb"] = (report["bytes"] / 1024**2).round(2)
+    report["pct"] = (report["bytes"] / report["bytes"].sum() * 100).round(1)
+    return report.sort_values("bytes", ascending=False)
+
+
+def finish_merge(df):
+    """Partition column and loader schema for transactions already joined to customers."""
+    df["month"] = df["date"].dt.strftime("%Y-%m")
+    return compact_frame(df, downcast_ids=False)
+
+
+def merge_customers(transactions, customers):
+    """Left-join customer attributes onto a block of transactions."""
+    return finish_merge(transactions.merge(customers, on="account_number", how="left"))
+
+
+def _record_batches(transactions_csv, customers, chunksize, schema_holder, cubes, sample):
+    for chunk in read_transactions(transactions_csv, chunksize=chunksize):
+        merged = merge_customers(chunk, customers)
+        cubes.append(build_cube(merged))
+        # Folded as we go: the sample stays bounded by the number of strata
+        sample[:] = [merge_samples(*sample, build_sample(merged))]
+        table = pa.Table.from_pandas(merged, preserve_index=False)
+        if schema_holder:
+            table = table.cast(schema_holder[0])
+        else:
+            schema_holder.append(table.schema)
+        yield from table.to_batches()
+
+
+def build_store(transactions_csv=TRANSACTIONS_CSV, customers_csv=CUSTOMERS_CSV, store_dir=STORE_DIR, chunksize=500_000):
+    """Convert the CSV exports into a partitioned Parquet dataset.
+
+    The Overview aggregate cube and stratified sample are built in the same
+    pass. The new store is
+    written next to the old one and swapped in with a rename, so a running
+    dashboard never sees a half-written dataset.
+    Returns the number of transaction rows written.
+    """
+    start = time.perf_counter()
+    customers = read_customers(customers_csv)
+    customers = customers[[c for c in customers.columns if c in KEEP_COLUMNS]]
+
+    tmp_dir = store_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # The arrow schema is fixed by the first chunk so later chunks with
+    # all-null columns still cast to the same types
+    schema_holder = []
+    cubes = []
+    sample = []
+    batches = _record_batches(transactions_csv, customers, chunksize, schema_holder, cubes, sample)
+    first = next(batches, None)
+    if first is None:
+        raise ValueError(f"No transactions found in {transactions_csv}")
+
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for batch in itertools.chain([first], batches):
+            rows += batch.num_rows
+            yield batch
+
+    ds.write_dataset(
+        counted(),
+        tmp_dir,
+        schema=schema_holder[0],
+        format="parquet",
+        partitioning=_partitioning(),
+        existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_group=256 * 1024,
+    )
+    save_cube(merge_cubes(*cubes), tmp_dir)
+    save_sample(sample[0], tmp_dir)
+    write_version(tmp_dir)
+
+    old_dir = store_dir.rstrip(os.sep) + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.isdir(store_dir):
+        os.rename(store_dir, old_dir)
+    os.rename(tmp_dir, store_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    print(f"✓ {rows:,} rows written to {store_dir} in {time.perf_counter() - start:.1f}s")
+    return rows
+
+
+def append_to_store(df, store_dir=STORE_DIR, batch_name=None, prefix="part"):
+    """Add a block of merged transactions as new files in the existing partitions.
+
+    prefix="_part" writes them under names the dataset scan skips, so
+    they stay invisible until renamed (see streaming_ingest).
+    """
+    batch_name = batch_name or str(time.time_ns())
+    schema = open_store(store_dir).schema
+    table = pa.Table.from_pandas(df, preserve_index=False).select(schema.names).cast(schema)
+    ds.write_dataset(
+        table,
+        store_dir,
+        format="parquet",
+        partitioning=_partitioning(),
+        basename_template=f"{prefix}-{batch_name}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return table.num_rows
+
+
+def dataset_version(store_dir=STORE_DIR):
+    """Current dataset version token ("csv" when there is no store)."""
+    try:
+        with open(os.path.join(store_dir, VERSION_FILE), encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return "csv" if not store_exists(store_dir) else "0"
+
+
+def write_version(store_dir=STORE_DIR, version=None):
+    """Publish a new dataset version with an atomic rename."""
+    version = version or str(time.time_ns())
+    path = os.path.join(store_dir, VERSION_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(path + ".tmp", path)
+    return version
+
+
+def open_store(store_dir=STORE_DIR):
+    return ds.dataset(store_dir, format="parquet", partitioning=_partitioning(), filesystem=_filesystem())
+
+
+def _filter_expression(filters):
+    expr = None
+    for column, values in (filters or {}).items():
+        if values is None:
+            continue
+        cond = ds.field(column).isin(list(values))
+        expr = cond if expr is None else expr & cond
+    return expr
+
+
+def load_store(store_dir=STORE_DIR, columns=None, filters=None):
+    """Read the merged table from the store.
+
+    columns: only these columns are decoded from disk (all when None).
+    filters: dict of column -> allowed values; conditions on ``month`` and
+    ``channel`` prune whole partitions before any file is opened.
+    """
+    dataset = open_store(store_dir)
+    table = dataset.to_table(columns=columns, filter=_filter_expression(filters))
+    # Partition columns come back as plain strings and file dictionaries may
+    # differ in order; compact_frame restores the canonical categories
+    return compact_frame(table.to_pandas())
+
+
+def scan_store(store_dir=STORE_DIR, columns=None, filters=None, batch_size=100_000):
+    """Stream the merged table from the store as frames of about ``batch_size`` rows.
+
+    Same columns and filters as load_store, but only one batch is decoded
+    at a time, so memory does not grow with the result.
+    """
+    scanner = open_store(store_dir).scanner(columns=columns, filter=_filter_expression(filters), batch_size=batch_size)
+    pending, rows = [], 0
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            pending.append(batch)
+            rows += batch.num_rows
+        # Files and row groups cut the scan into uneven batches; regroup them
+        while rows >= batch_size:
+            table = pa.Table.from_batches(pending)
+            yield compact_frame(table.slice(0, batch_size).to_pandas())
+            rest = table.slice(batch_size)
+            pending, rows = rest.to_batches(), rest.num_rows
+    if rows:
+        yield compact_frame(pa.Table.from_batches(pending).to_pandas())
+
+
+def store_exists(store_dir=STORE_DIR):
+    return os.path.isdir(store_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the columnar transactions store from the CSV exports.")
+    parser.add_argument("--transactions", default=TRANSACTIONS_CSV)
+    parser.add_argument("--customers", default=CUSTOMERS_CSV)
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    parser.add_argument("--report", action="store_true", help="Print per-column memory of the raw CSV merge vs the store")
+    args = parser.parse_args()
+
+    if args.report:
+        raw = pd.read_csv(args.transactions).merge(pd.read_csv(args.customers), on="account_number", how="left")
+        compact = load_store(args.store)
+        for name, frame in (("Raw CSV merge", raw), ("Compact store frame", compact)):
+            report = memory_report(frame)
+            print(f"\n{name}: {report['bytes'].sum() / 1024**2:,.1f} MB")
+            print(report.to_string())
+        return
+
+    build_store(args.transactions, args.customers, args.store, args.chunksize)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Indexed, paginated queries for the Fraud Explorer.
+
+ExplorerIndex keeps sorted row-position arrays per channel, per home
+branch and for fraud rows, built once per dataset. A filter change
+unions the positions of the selected values and intersects the
+predicates, giving the exact match count without touching the table;
+only the requested page of rows is then materialized.
+"""
+
+import numpy as np
+import pandas as pd
+
+DISPLAY_COLUMNS = [
+    "transaction_id", "date", "amount_etb", "channel", "location",
+    "merchant", "status", "home_branch", "balance_etb",
+]
+# Columns the index needs from the merged table ("status" is derived per page)
+SOURCE_COLUMNS = [c for c in DISPLAY_COLUMNS if c != "status"] + ["fraud_flag"]
+
+
+def _positions_by_value(series):
+    """value -> ascending row positions holding that value."""
+    codes = pd.Categorical(series)
+    order = np.argsort(codes.codes, kind="stable")
+    counts = np.bincount(codes.codes[codes.codes >= 0], minlength=len(codes.categories))
+    skip = int((codes.codes < 0).sum())  # missing values sort first with code -1
+    bounds = np.cumsum(counts) + skip
+    starts = bounds - counts
+    return {
+        str(value): order[start:stop]
+        for value, start, stop in zip(codes.categories, starts, bounds)
+    }
+
+
+def _intersect_sorted(a, b):
+    """Intersection of two ascending unique position arrays."""
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a):
+        return a
+    hits = np.searchsorted(b, a).clip(max=len(b) - 1)
+    return a[b[hits] == a]
+
+
+class ExplorerIndex:
+    """Prebuilt row indexes over the merged transactions table."""
+
+    def __init__(self, df):
+        self.df = df
+        self.n_rows = len(df)
+        self.by_channel = _positions_by_value(df["channel"])
+        self.by_branch = _positions_by_value(df["home_branch"])
+        self.fraud = np.flatnonzero(df["fraud_flag"].to_numpy() == 1)
+
+    @staticmethod
+    def _union(index, values):
+        empty = np.empty(0, dtype=np.int64)
+        parts = [index.get(v, empty) for v in values]
+        # The per-value arrays are disjoint, so a sort is a full union
+        return np.sort(np.concatenate(parts)) if parts else empty
+
+    def query(self, channels=None, branches=None, fraud_only=False):
+        """Ascending row positions matching all given predicates.
+
+        An empty or None selection means no filter on that column, like
+        the multiselects in the app.
+        """
+        predicates = []
+        if channels:
+            predicates.append(self._union(self.by_channel, channels))
+        if branches:
+            predicates.append(self._union(self.by_branch, branches))
+        if fraud_only:
+            predicates.append(self.fraud)
+        if not predicates:
+            return np.arange(self.n_rows)
+
+        predicates.sort(key=len)
+        result = predicates[0]
+        for other in predicates[1:]:
+            result = _intersect_sorted(result, other)
+        return result
+
+    def page(self, positions, page=1, page_size=1000, columns=DISPLAY_COLUMNS):
+        """One page of matching rows with the derived "status" column."""
+        start = (page - 1) * page_size
+        rows = self.df.iloc[positions[start:start + page_size]]
+        rows = rows.assign(status=np.where(rows["fraud_flag"].to_numpy() == 1, "Fraud", "Normal"))
+        return rows[columns]
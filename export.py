@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Streaming export of full Fraud Explorer result sets.
+
+The Explorer shows one page at a time; an export writes every matching
+transaction. Rows come from the data source in fixed-size batches
+(``DataSource.explorer_batches``: Parquet scans for the store, keyset
+pages for SQL, index slices for in-memory sources) and each batch is
+appended to the output before the next one is read, so memory stays
+flat whatever the size of the result:
+
+    python export.py fraud_merkato.parquet --channels "AwashBirr Mobile Transfer" \\
+        --branches "Merkato Branch - Addis Ababa" --fraud-only
+
+Formats: CSV, Parquet (one row group per batch) and gzip-compressed
+NDJSON, chosen by the file extension or ``--format``.
+"""
+
+import argparse
+import gzip
+import os
+import tempfile
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "ndjson.gz": ".ndjson.gz"}
+MIME_TYPES = {"csv": "text/csv", "parquet": "application/octet-stream", "ndjson.gz": "application/gzip"}
+EXPORT_DIR = os.path.join("data", "exports")
+BATCH_ROWS = 100_000
+DOWNLOAD_MAX_BYTES = 200 * 1024 * 1024  # larger exports stay on disk; the browser download is held in memory
+
+# Fixed output types, so every batch lands in the same Parquet schema
+SCHEMA = pa.schema([
+    ("transaction_id", pa.int64()),
+    ("date", pa.timestamp("ns")),
+    ("amount_etb", pa.float64()),
+    ("channel", pa.string()),
+    ("location", pa.string()),
+    ("merchant", pa.string()),
+    ("status", pa.string()),
+    ("home_branch", pa.string()),
+    ("balance_etb", pa.float64()),
+])
+
+
+def format_for(path):
+    """Export format implied by a file name."""
+    for fmt, ext in FORMATS.items():
+        if path.endswith(ext):
+            return fmt
+    raise ValueError(f"Cannot tell the export format of {path}; use one of {', '.join(FORMATS.values())}")
+
+
+def _plain(batch):
+    # Categories differ from batch to batch; plain strings keep every batch alike
+    return batch.astype({c: object for c in batch.columns if isinstance(batch[c].dtype, pd.CategoricalDtype)})
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        self.f = open(path, "w", newline="", encoding="utf-8")
+        self.header = True
+
+    def write(self, batch):
+        batch.to_csv(self.f, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        self.f.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        self.writer = pq.ParquetWriter(path, SCHEMA, compression="zstd")
+
+    def write(self, batch):
+        self.writer.write_table(pa.Table.from_pandas(_plain(batch), schema=SCHEMA, preserve_index=False))
+
+    def close(self):
+        self.writer.close()
+
+
+class _NdjsonGzWriter:
+    def __init__(self, path):
+        self.f = gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+
+    def write(self, batch):
+        text = _plain(batch).to_json(orient="records", lines=True, date_format="iso")
+        self.f.write(text if text.endswith("\n") else text + "\n")
+
+    def close(self):
+        self.f.close()
+
+
+WRITERS = {"csv": _CsvWriter, "parquet": _ParquetWriter, "ndjson.gz": _NdjsonGzWriter}
+
+
+def export_explorer(source, path, channels=None, branches=None, fraud_only=False, fmt=None,
+                    batch_size=BATCH_ROWS, progress=None):
+    """Write every transaction matching the Explorer filters to ``path``.
+
+    progress: optional callable(rows_written, total_rows, elapsed_seconds),
+    called after each batch.
+    Returns {"rows", "seconds", "rows_per_sec", "bytes", "path", "format"}.
+    The file is written under a unique temporary name (sessions share one
+    process) and renamed when complete.
+    """
+    fmt = fmt or format_for(path)
+    total = source.explorer_count(channels, branches, fraud_only)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    os.close(fd)
+
+    start = time.perf_counter()
+    rows = 0
+    try:
+        writer = WRITERS[fmt](tmp)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    try:
+        for batch in source.explorer_batches(channels, branches, fraud_only, batch_size):
+            writer.write(batch)
+            rows += len(batch)
+            if progress is not None:
+                progress(rows, total, time.perf_counter() - start)
+    except BaseException:
+        writer.close()
+        os.remove(tmp)
+        raise
+    writer.close()
+    os.replace(tmp, path)
+
+    elapsed = time.perf_counter() - start
+    return {"rows": rows, "seconds": elapsed, "rows_per_sec": rows / elapsed if elapsed else 0.0,
+            "bytes": os.path.getsize(path), "path": path, "format": fmt}
+
+
+def default_path(fmt, export_dir=EXPORT_DIR):
+    """A fresh file name under the export directory, unique even within the same second."""
+    return os.path.join(export_dir, f"explorer-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}{FORMATS[fmt]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export every transaction matching Fraud Explorer filters.")
+    parser.add_argument("output", nargs="?", help="Output file (.csv, .parquet or .ndjson.gz); default under data/exports/")
+    parser.add_argument("--format", choices=list(FORMATS), help="Overrides the extension")
+    parser.add_argument("--channels", nargs="*", default=[])
+    parser.add_argument("--branches", nargs="*", default=[])
+    parser.add_argument("--fraud-only", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=BATCH_ROWS)
+    parser.add_argument("--source", default=None, help="AWASH_DATA_SOURCE value (auto, csv, store, snapshot, mysql, sqlite)")
+    args = parser.parse_args()
+
+    from data_sources import open_data_source
+
+    fmt = args.format or (format_for(args.output) if args.output else "parquet")
+    path = args.output or default_path(fmt)
+    source = open_data_source(args.source)
+
+    def report(rows, total, elapsed):
+        pct = rows / total * 100 if total else 100.0
+        print(f"\r  {rows:,} / {total:,} rows ({pct:.0f}%), {rows / elapsed if elapsed else 0:,.0f} rows/sec", end="", flush=True)
+
+    result = export_explorer(source, path, args.channels, args.branches, args.fraud_only, fmt, args.batch_size, report)
+    print(f"\n✓ {result['rows']:,} transactions written to {path} ({result['bytes'] / 2**20:,.1f} MB) "
+          f"in {result['seconds']:.1f}s ({result['rows_per_sec']:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Fraud model features, shared by training, the app and batch scoring.
+
+A FeatureSchema is fitted once on the training frame (the same
+drop-first dummies as ``pd.get_dummies(..., drop_first=True)``) and
+saved as ``feature_schema.pkl`` next to ``model_features.pkl``. It turns
+raw merged transactions into the exact training column layout in one
+vectorized pass, writing straight into a preallocated NumPy matrix, and
+turns a single form submission into a row without building a DataFrame.
+"""
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+SCHEMA_PATH = "feature_schema.pkl"
+HIGH_AMOUNT_ETB = 15000
+
+BASE_FEATURES = ["amount_etb", "hour", "is_weekend", "location_mismatch", "high_amount", "balance_etb"]
+DUMMY_COLUMNS = {"channel": "channel_", "account_type": "account_type_"}
+
+
+class FeatureSchema:
+    """Column layout of the model input and how to build each column."""
+
+    def __init__(self, features, high_amount_etb=HIGH_AMOUNT_ETB):
+        self.features = list(features)
+        self.high_amount_etb = high_amount_etb
+        self.position = {name: i for i, name in enumerate(self.features)}
+        self.dummies = {
+            column: [f[len(prefix):] for f in self.features if f.startswith(prefix)]
+            for column, prefix in DUMMY_COLUMNS.items()
+        }
+        dummy_names = {DUMMY_COLUMNS[c] + level for c, levels in self.dummies.items() for level in levels}
+        # Anything else (e.g. velocity features) is copied from a column of the same name
+        self.passthrough = [f for f in self.features if f not in BASE_FEATURES and f not in dummy_names]
+
+    @classmethod
+    def fit(cls, df):
+        """Schema for a training frame: base features plus drop-first dummies."""
+        features = list(BASE_FEATURES)
+        for column, prefix in DUMMY_COLUMNS.items():
+            levels = sorted(df[column].dropna().astype(str).unique())
+            features += [prefix + level for level in levels[1:]]
+        return cls(features)
+
+    @classmethod
+    def from_features(cls, features):
+        """Schema recovered from a saved model_features.pkl list."""
+        return cls(features)
+
+    def _derived(self, df):
+        if "hour" in df.columns and "is_weekend" in df.columns:
+            hour, is_weekend = df["hour"].to_numpy(), df["is_weekend"].to_numpy()
+        else:
+            dates = pd.to_datetime(df["date"])  # parsed once for both features
+            hour, is_weekend = dates.dt.hour.to_numpy(), dates.dt.dayofweek.to_numpy() >= 5
+        amount = df["amount_etb"].to_numpy(dtype=np.float64)
+        location = df["location"].to_numpy(dtype=object)
+        home_branch = df["home_branch"].to_numpy(dtype=object)
+        return {
+            "amount_etb": amount,
+            "hour": hour,
+            "is_weekend": is_weekend,
+            "location_mismatch": location != home_branch,
+            "high_amount": amount > self.high_amount_etb,
+            "balance_etb": df["balance_etb"].to_numpy(dtype=np.float64),
+        }
+
+    def transform(self, df, out=None):
+        """Feature matrix for a merged transactions frame.
+
+        out: optional preallocated float64 array of shape (len(df), n_features).
+        """
+        n = len(df)
+        if out is None:
+            out = np.empty((n, len(self.features)), dtype=np.float64)
+        out[:] = 0.0
+
+        for name, values in self._derived(df).items():
+            if name in self.position:
+                out[:, self.position[name]] = values
+        for name in self.passthrough:
+            out[:, self.position[name]] = df[name].to_numpy(dtype=np.float64)
+
+        rows = np.arange(n)
+        for column, levels in self.dummies.items():
+            if not levels:
+                continue
+            cols = np.array([self.position[DUMMY_COLUMNS[column] + level] for level in levels])
+            codes = pd.Index(levels).get_indexer(df[column].astype(object))
+            hit = codes >= 0
+            out[rows[hit], cols[codes[hit]]] = 1.0
+        return out
+
+    def transform_record(self, record):
+        """One-row feature matrix from a dict of raw fields (no DataFrame).
+
+        Needs amount_etb, hour, is_weekend, location, home_branch,
+        balance_etb, channel and account_type.
+        """
+        row = np.zeros((1, len(self.features)), dtype=np.float64)
+        values = {
+            "amount_etb": record["amount_etb"],
+            "hour": record["hour"],
+            "is_weekend": int(record["is_weekend"]),
+            "location_mismatch": int(record["location"] != record["home_branch"]),
+            "high_amount": int(record["amount_etb"] > self.high_amount_etb),
+            "balance_etb": record["balance_etb"],
+        }
+        values.update({name: record.get(name, 0.0) for name in self.passthrough})
+        for name, value in values.items():
+            if name in self.position:
+                row[0, self.position[name]] = value
+        for column, prefix in DUMMY_COLUMNS.items():
+            i = self.position.get(prefix + str(record.get(column)))
+            if i is not None:
+                row[0, i] = 1.0
+        return row
+
+    def save(self, path=SCHEMA_PATH):
+        joblib.dump(self, path)
+
+
+def load_schema(features_path="model_features.pkl", schema_path=None):
+    """The persisted schema next to the feature list, or one rebuilt from the list."""
+    if schema_path is None:
+        schema_path = os.path.join(os.path.dirname(features_path), SCHEMA_PATH)
+    if os.path.exists(schema_path):
+        return joblib.load(schema_path)
+    return FeatureSchema.from_features(joblib.load(features_path))
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Flattened NumPy inference path for the fitted RandomForest.
+
+All trees of the forest are exported into one set of flat node arrays
+(split feature, threshold, left/right child, leaf fraud probability).
+Leaves point to themselves, so a fixed number of steps (the tree's
+depth) brings every row to its leaf without joblib dispatch. A single
+row walks all trees at once; a batch walks one tree at a time over a
+block of rows and adds the leaf values into one probability per row, so
+memory stays at a few arrays of ``ROW_BLOCK`` rows.
+
+Check parity with scikit-learn and compare latency on a held-out set:
+
+    python flat_forest.py --bench --transactions awash_transactions.csv
+
+The run exits with status 1 when any probability differs from
+scikit-learn's by more than ``--tolerance`` (default 1e-9).
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+ROW_BLOCK = 16_384  # rows per traversal block; bounds the per-block index arrays
+COMPACT_EVERY = 4  # levels between dropping finished (tree, row) pairs
+PARITY_TOLERANCE = 1e-9  # max |p_sklearn - p_flat| accepted by --bench
+
+
+class FlatForest:
+    """A fitted binary forest as flat node arrays.
+
+    ``predict_proba`` takes a batch like scikit-learn does;
+    ``predict_proba_one`` scores a single row into preallocated buffers,
+    so it allocates nothing per call after a thread's first. The buffers
+    are per thread, so one instance can be shared (the app's cached model,
+    the scoring service's worker pool).
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_trees = len(roots)
+        self.classes_ = np.array([0, 1])
+
+        # children[2 * node + go_left]: one gather per level instead of two plus a select
+        self._children = np.empty(2 * len(left), dtype=np.int64)
+        self._children[0::2] = right
+        self._children[1::2] = left
+        self._is_leaf = left == np.arange(len(left))
+        # float32 inputs against float64 thresholds: x <= t exactly when x <= t rounded down to
+        # float32, so batches compare in float32 with the same result and half the bandwidth
+        threshold32 = np.asarray(threshold, dtype=np.float32)
+        over = threshold32.astype(np.float64) > threshold
+        threshold32[over] = np.nextafter(threshold32[over], np.float32(-np.inf))
+        self._threshold32 = threshold32
+        self._tree_depth = self._depths()
+        self._local = threading.local()
+
+    def _depths(self):
+        """Depth of every tree: the steps after which all of its rows sit on a leaf."""
+        depth = np.zeros(self.n_trees, dtype=np.int64)
+        nodes, tree = np.asarray(self.roots), np.arange(self.n_trees)
+        step = 0
+        while nodes.size:
+            internal = ~self._is_leaf[nodes]
+            nodes, tree = nodes[internal], tree[internal]
+            if nodes.size:
+                step += 1
+                depth[tree] = step
+                nodes = np.concatenate([self.left[nodes], self.right[nodes]])
+                tree = np.concatenate([tree, tree])
+        return depth
+
+    def _buffers(self):
+        """This thread's scratch arrays for predict_proba_one."""
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            n = self.n_trees
+            buf = self._local.buf = {
+                "idx": np.empty(n, dtype=np.int64),
+                "feat": np.empty(n, dtype=np.int64),
+                "xv": np.empty(n, dtype=np.float32),
+                "val": np.empty(n, dtype=np.float64),
+                "thr": np.empty(n, dtype=np.float64),
+                "go_left": np.empty(n, dtype=bool),
+                "next": np.empty(n, dtype=np.int64),
+                "x": np.empty(0, dtype=np.float32),
+            }
+        return buf
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Export a fitted RandomForestClassifier (binary, fraud = class 1)."""
+        positive = list(model.classes_).index(1)
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            node_ids = np.arange(offset, offset + n)
+            is_leaf = tree.children_left == -1
+
+            # Leaves loop back to themselves and always compare true
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            left.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            right.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            counts = tree.value[:, 0, :]
+            value.append(counts[:, positive] / counts.sum(axis=1))
+            roots.append(offset)
+            offset += n
+
+        max_depth = max(e.tree_.max_depth for e in model.estimators_)
+        return cls(
+            np.concatenate(feature).astype(np.int64),
+            np.concatenate(threshold).astype(np.float64),
+            np.concatenate(left).astype(np.int64),
+            np.concatenate(right).astype(np.int64),
+            np.concatenate(value).astype(np.float64),
+            np.array(roots, dtype=np.int64),
+            max_depth,
+        )
+
+    @staticmethod
+    def _as_float32(X):
+        # scikit-learn compares float32 inputs against float64 thresholds; do the same for parity
+        return np.asarray(X, dtype=np.float32)
+
+    def apply(self, X):
+        """Leaf node index reached in every tree, shape (n_trees, n_rows)."""
+        X = self._as_float32(X)
+        n = X.shape[0]
+        leaves = np.empty((self.n_trees, n), dtype=np.int64)
+        for start in range(0, n, ROW_BLOCK):
+            block = X[start:start + ROW_BLOCK]
+            rows = block.shape[0]
+            flat_x = block.T.ravel()  # feature-major: feature f of row r sits at f * rows + r
+            idx = np.repeat(self.roots, rows)
+            col = np.tile(np.arange(rows), self.n_trees)
+            pos = np.arange(idx.size)
+            out = np.empty(idx.size, dtype=np.int64)
+            step = 0
+            while idx.size:
+                go_left = flat_x[self.feature[idx] * rows + col] <= self.threshold[idx]
+                idx = self._children[2 * idx + go_left]
+                step += 1
+                # Every few levels, drop the (tree, row) pairs that reached a
+                # leaf; most trees end long before the forest's max depth
+                if step % COMPACT_EVERY == 0 or step >= self.max_depth:
+                    done = self._is_leaf[idx]
+                    out[pos[done]] = idx[done]
+                    keep = ~done
+                    idx, col, pos = idx[keep], col[keep], pos[keep]
+            leaves[:, start:start + rows] = out.reshape(self.n_trees, rows)
+        return leaves
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        if X.shape[0] == 1:
+            p = self.predict_proba_one(X[0])
+            return np.array([[1.0 - p, p]])
+        p = self.predict_fraud_proba(X)
+        return np.column_stack([1.0 - p, p])
+
+    def predict_fraud_proba(self, X):
+        """Fraud probability per row, one tree at a time into an (n_rows,) sum."""
+        X = self._as_float32(X)
+        n, n_features = X.shape
+        p = np.zeros(n, dtype=np.float64)
+        for start in range(0, n, ROW_BLOCK):
+            block = X[start:start + ROW_BLOCK]
+            rows = block.shape[0]
+            flat_x = np.ascontiguousarray(block).ravel()  # feature f of row r sits at r * n_features + f
+            offset = np.arange(rows) * n_features
+            total = p[start:start + rows]
+            for root, depth in zip(self.roots, self._tree_depth):
+                idx = np.full(rows, root, dtype=np.int64)
+                for _ in range(depth):
+                    go_left = flat_x[offset + self.feature[idx]] <= self._threshold32[idx]
+                    idx = self._children[2 * idx + go_left]
+                total += self.value[idx]
+        p /= self.n_trees
+        return p
+
+    def predict(self, X):
+        return (self.predict_proba(X)[:, 1] > 0.5).astype(np.int64)
+
+    def predict_proba_one(self, x):
+        """Fraud probability for one feature row, without allocating."""
+        b = self._buffers()
+        x = np.asarray(x).ravel()
+        if b["x"].shape != x.shape:
+            b["x"] = np.empty(x.shape, dtype=np.float32)
+        np.copyto(b["x"], x, casting="unsafe")
+        idx, nxt, feat, go_left = b["idx"], b["next"], b["feat"], b["go_left"]
+        np.copyto(idx, self.roots)
+        for step in range(1, self.max_depth + 1):
+            np.take(self.feature, idx, out=feat)
+            np.take(b["x"], feat, out=b["xv"])
+            np.take(self.threshold, idx, out=b["thr"])
+            np.less_equal(b["xv"], b["thr"], out=go_left)
+            np.multiply(idx, 2, out=nxt)
+            np.add(nxt, go_left, out=nxt)
+            np.take(self._children, nxt, out=idx)
+            if step % COMPACT_EVERY == 0:
+                np.take(self._is_leaf, idx, out=go_left)
+                if go_left.all():
+                    break
+        np.take(self.value, idx, out=b["val"])
+        return float(b["val"].mean())
+
+    def save(self, path):
+        """Write the node arrays as .npy files into a directory."""
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        np.save(os.path.join(path, "max_depth.npy"), np.array(self.max_depth))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load saved node arrays, memory-mapped by default."""
+        mode = "r" if mmap else None
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in ARRAYS]
+        max_depth = np.load(os.path.join(path, "max_depth.npy"))
+        return cls(*arrays, max_depth)
+
+
+def _timeit(fn, repeat):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def benchmark(model, X, single_repeat=200, batch_rows=10_000):
+    """Parity and latency of sklearn vs the flat path on held-out rows."""
+    import pandas as pd
+
+    flat = FlatForest.from_sklearn(model)
+    frame = pd.DataFrame(X, columns=getattr(model, "feature_names_in_", None))
+
+    sk_prob = model.predict_proba(frame)[:, 1]
+    flat_prob = flat.predict_proba(X)[:, 1]
+    one_rows = min(len(X), 500)
+    one_prob = np.array([flat.predict_proba_one(X[i]) for i in range(one_rows)])
+
+    # The same instance scored from several threads at once, as the app and the service share it
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        threaded = list(pool.map(lambda i: flat.predict_proba_one(X[i % one_rows]), range(4 * one_rows)))
+    threaded_prob = np.array(threaded).reshape(4, one_rows)
+
+    batch = X[:batch_rows]
+    results = {
+        "rows_checked": len(X),
+        "max_abs_diff_batch": float(np.abs(sk_prob - flat_prob).max()),
+        "max_abs_diff_single": float(np.abs(sk_prob[:one_rows] - one_prob).max()),
+        "max_abs_diff_threads": float(np.abs(sk_prob[:one_rows] - threaded_prob).max()),
+        "sklearn_single_ms": _timeit(lambda: model.predict_proba(frame.iloc[:1]), single_repeat),
+        "flat_single_ms": _timeit(lambda: flat.predict_proba_one(X[0]), single_repeat),
+        "sklearn_batch_ms": _timeit(lambda: model.predict_proba(frame.iloc[:batch_rows]), 3),
+        "flat_batch_ms": _timeit(lambda: flat.predict_proba(batch), 3),
+        "batch_rows": len(batch),
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the forest to flat arrays, check parity and benchmark.")
+    parser.add_argument("--model", default="fraud_model.pkl")
+    parser.add_argument("--features", default="model_features.pkl")
+    parser.add_argument("--transactions", default="awash_transactions.csv")
+    parser.add_argument("--customers", default="awash_customers.csv")
+    parser.add_argument("--holdout", type=float, default=0.3, help="Fraction of rows (from the end of the file) used for checks")
+    parser.add_argument("--export", help="Also write the flat arrays to this directory")
+    parser.add_argument("--bench", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=PARITY_TOLERANCE,
+                        help="Exit with status 1 when any |p_sklearn - p_flat| exceeds this")
+    args = parser.parse_args()
+
+    import pandas as pd
+    from scoring import attach_customers, build_features, load_scoring_model
+    from velocity import add_velocity_features
+
+    model, schema = load_scoring_model(args.model, args.features)
+    if args.export:
+        FlatForest.from_sklearn(model).save(args.export)
+        print(f"✓ Flat forest written to {args.export}")
+    if not args.bench:
+        return
+
+    transactions = pd.read_csv(args.transactions)
+    holdout = transactions.iloc[int(len(transactions) * (1 - args.holdout)):]
+    df = add_velocity_features(attach_customers(holdout, pd.read_csv(args.customers)), schema)
+    X = build_features(df, schema)
+
+    r = benchmark(model, X)
+    print(f"Parity on {r['rows_checked']:,} held-out rows: max |p_sklearn - p_flat| = "
+          f"{r['max_abs_diff_batch']:.2e} (batch), {r['max_abs_diff_single']:.2e} (single row), "
+          f"{r['max_abs_diff_threads']:.2e} (single row, 4 threads)")
+    print(f"{'':<12}{'sklearn':>12}{'flat':>12}")
+    print(f"{'1 row':<12}{r['sklearn_single_ms']:>10.3f}ms{r['flat_single_ms']:>10.3f}ms")
+    batch_label = f"{r['batch_rows']:,} rows"
+    print(f"{batch_label:<12}{r['sklearn_batch_ms']:>10.1f}ms{r['flat_batch_ms']:>10.1f}ms")
+
+    worst = max(r["max_abs_diff_batch"], r["max_abs_diff_single"], r["max_abs_diff_threads"])
+    if worst > args.tolerance:
+        print(f"✗ Parity check failed: {worst:.2e} > tolerance {args.tolerance:.0e}")
+        raise SystemExit(1)
+    print(f"✓ Parity within {args.tolerance:.0e}")
+
+
+if __name__ == "__main__":
+    main()
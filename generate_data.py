@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Seeded synthetic customers and transactions at any scale.
+
+    python generate_data.py --transactions 100000000 --workers 8 --out data/synthetic
+    python generate_data.py --transactions 1000000 --format parquet
+
+Writes ``awash_customers`` and ``awash_transactions`` with the columns of
+the CSV exports and ``sql/schema.sql``. Branches, channels and account
+types come from ``constants.py``. Fraud follows the documented patterns:
+transactions away from the home branch, amounts above 15,000 ETB and
+off-hours activity (22:00-06:00) are each far more likely to be fraud.
+
+All columns are drawn with NumPy in bulk; Faker only fills a small pool
+of phone numbers. Transactions are generated in fixed-size shards, each
+from its own seed derived from ``--seed``. The output is therefore the
+same whatever the number of workers. Shards run in a process pool and
+stream to CSV or Parquet in chunks, so memory stays flat at any row
+count.
+"""
+
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from constants import account_types, branches, transaction_channels
+
+OUT_DIR = os.path.join("data", "synthetic")
+SHARD_ROWS = 2_000_000
+CHUNK_ROWS = 500_000
+
+FIRST_NAMES = ["Abebe", "Almaz", "Bekele", "Dawit", "Eleni", "Fikadu", "Genet", "Hana", "Kebede", "Lemlem",
+               "Meseret", "Mulugeta", "Rahel", "Selam", "Solomon", "Tadesse", "Tigist", "Yared", "Yonas", "Zewditu"]
+LAST_NAMES = ["Alemu", "Ayele", "Bekele", "Desta", "Gebre", "Girma", "Haile", "Kassahun", "Mekonnen", "Negash",
+              "Tadesse", "Tesfaye", "Wolde", "Wondimu", "Worku", "Yilma", "Zeleke", "Asfaw", "Abebe", "Getachew"]
+MERCHANTS = ["Total Energies", "Shoa Supermarket", "Ethio Telecom", "Kaldis Coffee", "Zemen Mall"]
+
+# Fraud model: each pattern independently raises the chance of fraud
+BASE_FRAUD = 0.005
+MISMATCH_RATE = 0.14
+PATTERN_FRAUD = {"location_mismatch": 0.10, "high_amount": 0.105, "off_hours": 0.031}
+HIGH_AMOUNT_ETB = 15000
+OFF_HOURS = (22, 6)  # [22:00, 06:00)
+
+
+def phone_pool(size=5_000, seed=0):
+    """Ethiopian-format mobile numbers from Faker; customers draw from this pool."""
+    from faker import Faker
+
+    fake = Faker()
+    fake.seed_instance(seed)
+    return [fake.numerify("+251-9###-######") for _ in range(size)]
+
+
+def _city(branch):
+    return branch.split(" - ")[-1]
+
+
+def generate_customers(n, seed=0, first_id=100_000):
+    """Customer table as an Arrow table (all columns drawn in bulk), and each home branch index."""
+    rng = np.random.default_rng(seed)
+    phones = pa.array(phone_pool(min(n, 5_000), int(rng.integers(2**31))))
+    first, last = rng.integers(0, len(FIRST_NAMES), n), rng.integers(0, len(LAST_NAMES), n)
+    names = pa.array([f"{f} {l}" for f in FIRST_NAMES for l in LAST_NAMES])
+    home = rng.integers(0, len(branches), n)
+    join = np.datetime64("2015-12-01") + rng.integers(0, 3_650, n).astype("timedelta64[D]")
+    table = pa.table({
+        "customer_id": pa.array(np.arange(first_id, first_id + n)),
+        "full_name": names.take(pa.array(first * len(LAST_NAMES) + last)),
+        "phone": phones.take(pa.array(rng.integers(0, len(phones), n))),
+        "address": pa.array([f"{_city(b)} City" for b in branches]).take(pa.array(home)),
+        "account_number": pa.array(10**12 + rng.choice(9 * 10**12, n, replace=False)),
+        "account_type": pa.array(account_types).take(pa.array(rng.integers(0, len(account_types), n))),
+        "balance_etb": pa.array(rng.uniform(500, 500_000, n).round(2)),
+        "home_branch": pa.array(branches).take(pa.array(home)),
+        "join_date": pa.array(join),
+    })
+    return table, home
+
+
+def generate_transactions(rng, first_id, n, accounts, home, start, days):
+    """One block of transactions for customers (accounts, home branch index)."""
+    who = rng.integers(0, len(accounts), n)
+    home_idx = home[who]
+
+    # Away from home: shift to one of the other branches
+    mismatch = rng.random(n) < MISMATCH_RATE
+    location = np.where(mismatch, (home_idx + rng.integers(1, len(branches), n)) % len(branches), home_idx)
+
+    seconds = rng.integers(0, days * 86_400, n)
+    hour = seconds // 3_600 % 24
+    off_hours = (hour >= OFF_HOURS[0]) | (hour < OFF_HOURS[1])
+    amount = rng.lognormal(8.0, 1.2, n).round(2).clip(10, None)
+    high_amount = amount > HIGH_AMOUNT_ETB
+
+    not_fraud = np.full(n, 1 - BASE_FRAUD)
+    for pattern, hit in (("location_mismatch", mismatch), ("high_amount", high_amount), ("off_hours", off_hours)):
+        not_fraud *= np.where(hit, 1 - PATTERN_FRAUD[pattern], 1.0)
+    fraud = rng.random(n) >= not_fraud
+
+    return pa.table({
+        "transaction_id": pa.array(np.arange(first_id, first_id + n)),
+        "account_number": pa.array(accounts[who]),
+        "date": pa.array(start + seconds.astype("timedelta64[s]")),
+        "amount_etb": pa.array(amount),
+        "channel": pa.array(transaction_channels).take(pa.array(rng.integers(0, len(transaction_channels), n))),
+        "location": pa.array(branches).take(pa.array(location)),
+        "merchant": pa.array(MERCHANTS).take(pa.array(rng.integers(0, len(MERCHANTS), n))),
+        "fraud_flag": pa.array(fraud.astype(np.int64)),
+    })
+
+
+class _Writer:
+    """Streams Arrow tables to one CSV or Parquet file."""
+
+    def __init__(self, path, fmt, schema):
+        self.fmt = fmt
+        if fmt == "csv":
+            self.file = open(path, "wb")
+            self.file.write((",".join(schema.names) + "\n").encode())
+            self.options = pa_csv.WriteOptions(include_header=False, quoting_style="needed")
+        else:
+            self.writer = pq.ParquetWriter(path, schema)
+
+    def write(self, table):
+        if self.fmt == "csv":
+            pa_csv.write_csv(table, self.file, self.options)
+        else:
+            self.writer.write_table(table)
+
+    def close(self):
+        if self.fmt == "csv":
+            self.file.close()
+        else:
+            self.writer.close()
+
+
+def _write_shard(path, fmt, seed_seq, first_id, rows, accounts, home, start, days):
+    rng = np.random.default_rng(seed_seq)
+    writer = None
+    for offset in range(0, rows, CHUNK_ROWS):
+        table = generate_transactions(rng, first_id + offset, min(CHUNK_ROWS, rows - offset), accounts, home, start, days)
+        writer = writer or _Writer(path, fmt, table.schema)
+        writer.write(table)
+    writer.close()
+    return rows
+
+
+def _concat_csv(parts, path):
+    """Join shard CSVs into one file, keeping only the first header."""
+    with open(path, "wb") as out:
+        for i, part in enumerate(parts):
+            with open(part, "rb") as f:
+                if i:
+                    f.readline()
+                shutil.copyfileobj(f, out, 16 * 1024 * 1024)
+            os.remove(part)
+
+
+def generate(out_dir=OUT_DIR, n_transactions=100_000, n_customers=None, seed=42, fmt="csv",
+             workers=None, start="2024-01-01", days=365):
+    """Write customers and transactions; returns (customers, transactions, seconds)."""
+    began = time.perf_counter()
+    n_customers = n_customers or max(10_000, n_transactions // 10)
+    customer_seed, transaction_seed = np.random.SeedSequence(seed).spawn(2)
+    os.makedirs(out_dir, exist_ok=True)
+
+    customers, home = generate_customers(n_customers, customer_seed)
+    writer = _Writer(os.path.join(out_dir, f"awash_customers.{fmt}"), fmt, customers.schema)
+    writer.write(customers)
+    writer.close()
+    accounts = customers["account_number"].to_numpy()
+
+    # Fixed shard boundaries and seeds, independent of the worker count
+    n_shards = max(1, -(-n_transactions // SHARD_ROWS))
+    shard_seeds = transaction_seed.spawn(n_shards)
+    parts_dir = os.path.join(out_dir, "awash_transactions" + (".parts" if fmt == "csv" else ""))
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    os.makedirs(parts_dir)
+    start = np.datetime64(start, "s")
+
+    parts, done = [], 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for shard in range(n_shards):
+            first = shard * SHARD_ROWS
+            rows = min(SHARD_ROWS, n_transactions - first)
+            path = os.path.join(parts_dir, f"part-{shard:05d}.{fmt}")
+            parts.append(path)
+            futures.append(pool.submit(_write_shard, path, fmt, shard_seeds[shard], first + 1, rows,
+                                       accounts, home, start, days))
+        for future in as_completed(futures):
+            done += future.result()
+            elapsed = time.perf_counter() - began
+            print(f"  {done:>13,} / {n_transactions:,} transactions ({done / elapsed:,.0f} rows/sec)")
+
+    if fmt == "csv":
+        _concat_csv(parts, os.path.join(out_dir, "awash_transactions.csv"))
+        os.rmdir(parts_dir)
+    return n_customers, n_transactions, time.perf_counter() - began
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Awash Bank customers and transactions.")
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--customers", type=int, help="Default: transactions / 10, at least 10,000")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--out", default=OUT_DIR)
+    parser.add_argument("--workers", type=int, help="Processes (default: all cores)")
+    parser.add_argument("--start", default="2024-01-01", help="First transaction day")
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    customers, transactions, seconds = generate(args.out, args.transactions, args.customers, args.seed,
+                                                args.format, args.workers, args.start, args.days)
+    print(f"✓ {customers:,} customers and {transactions:,} transactions written to {args.out} "
+          f"in {seconds:.1f}s ({transactions / seconds:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
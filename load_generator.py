@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Replay synthetic traffic against scoring_service.py.
+
+    python load_generator.py --url http://127.0.0.1:8080 --requests 5000 --concurrency 64
+
+Transactions are drawn from real accounts in awash_customers.csv with
+random channels, amounts and hours, and ~15% of them away from the home
+branch. Client-side p50/p99 latency and throughput are printed, followed
+by the service's own /metrics.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+import numpy as np
+import pandas as pd
+
+from constants import branches, transaction_channels
+from scoring import CUSTOMERS_CSV
+
+
+def synthetic_transactions(customers_csv, n, seed=42):
+    rng = np.random.default_rng(seed)
+    customers = pd.read_csv(customers_csv, usecols=["account_number", "home_branch"])
+    picked = customers.iloc[rng.integers(0, len(customers), n)]
+    away = rng.random(n) < 0.15
+    location = np.where(away, rng.choice(branches, n), picked["home_branch"].to_numpy())
+    dates = pd.Timestamp.now().normalize() + pd.to_timedelta(rng.integers(0, 86400, n), unit="s")
+    return [
+        {
+            "transaction_id": i,
+            "account_number": int(acc),
+            "date": str(date),
+            "amount_etb": float(amount),
+            "channel": channel,
+            "location": loc,
+        }
+        for i, (acc, date, amount, channel, loc) in enumerate(zip(
+            picked["account_number"], dates, np.round(rng.lognormal(8, 1.2, n), 2),
+            rng.choice(transaction_channels, n), location,
+        ))
+    ]
+
+
+async def run(url, transactions, concurrency):
+    queue = asyncio.Queue()
+    for t in transactions:
+        queue.put_nowait(t)
+    latencies = []
+    errors = 0
+
+    async def worker(session):
+        nonlocal errors
+        while not queue.empty():
+            payload = queue.get_nowait()
+            start = time.perf_counter()
+            async with session.post(f"{url}/score", json=payload) as resp:
+                await resp.read()
+                if resp.status != 200:
+                    errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    async with aiohttp.ClientSession() as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        async with session.get(f"{url}/metrics") as resp:
+            server = await resp.json()
+    return np.array(latencies), errors, elapsed, server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the fraud scoring service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--customers", default=CUSTOMERS_CSV)
+    args = parser.parse_args()
+
+    transactions = synthetic_transactions(args.customers, args.requests)
+    latencies, errors, elapsed, server = asyncio.run(run(args.url, transactions, args.concurrency))
+
+    print(f"Requests:    {len(latencies):,} ({errors} errors) with concurrency {args.concurrency}")
+    print(f"Throughput:  {len(latencies) / elapsed:,.0f} req/sec")
+    print(f"Latency p50: {np.percentile(latencies, 50):.2f} ms")
+    print(f"Latency p99: {np.percentile(latencies, 99):.2f} ms")
+    print("Service metrics:")
+    print(json.dumps(server, indent=2))
+
+
+if __name__ == "__main__":
+    main()
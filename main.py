@@ -4,49 +4,20 @@
 # In[4]:
 
 
+import time
+_started = time.perf_counter()
+
+# Only light imports here: pandas/pyarrow come with the data source, seaborn with
+# the first chart render and joblib/scikit-learn with the predictor page
 import streamlit as st
-import pandas as pd
 import os
-import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
+from charts import OVERVIEW_CHARTS, ChartCache
+from metrics import METRICS, serve_from_env
+from constants import account_types, branches, transaction_channels
 
 # FIRST STREAMLIT COMMAND
 st.set_page_config(page_title="Awash Bank Fraud Analytics", layout="wide")
 
-# Realistic lists
-branches = [
-    "Awash Towers Headquarters - Addis Ababa",
-    "Bole Branch - Addis Ababa",
-    "Kirkos Branch - Addis Ababa",
-    "Mexico Square Branch - Addis Ababa",
-    "Piassa Branch - Addis Ababa",
-    "Merkato Branch - Addis Ababa",
-    "Dire Dawa Branch - Dire Dawa",
-    "Bahir Dar Branch - Bahir Dar",
-    "Mekelle Branch - Mekelle",
-    "Jimma Branch - Jimma",
-    "Awassa Branch - Awassa",
-    "Adama Branch - Adama",
-    "Gondar Branch - Gondar",
-    "Dessie Branch - Dessie",
-    "Harar Branch - Harar",
-    "Shashemene Branch - Shashemene",
-    "Arba Minch Branch - Arba Minch",
-    "Debre Birhan Branch - Debre Birhan"
-]
-
-transaction_channels = [
-    "AwashBirr Mobile Transfer",
-    "ATM Withdrawal",
-    "POS Payment",
-    "Branch Deposit",
-    "Branch Withdrawal",
-    "Agent Banking",
-    "Bill Payment",
-    "Fund Transfer"
-]
-
 # PROFESSIONAL & HIGH-VISIBILITY CSS
 st.markdown("""
 <style>
@@ -115,107 +86,286 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Load Model
+# Startup phase timings, recorded once per process
 @st.cache_resource
-def load_model():
+def startup_timings():
+    return {}
+
+def record_startup(phase, start):
+    timings = startup_timings()
+    if phase not in timings:
+        timings[phase] = time.perf_counter() - start
+        METRICS.observe('startup', timings[phase], phase=phase)
+
+record_startup('imports', _started)
+# Prometheus text at /metrics with AWASH_METRICS_PORT, or a file with AWASH_METRICS_FILE
+serve_from_env()
+
+# Data source: the columnar store when it has been built, otherwise the raw CSVs,
+# or the awash_analytics database with AWASH_DATA_SOURCE=mysql / sqlite.
+# Page caches are keyed on the source's dataset version, which new data bumps.
+# A snapshot (python snapshot.py) is restored memory-mapped when present.
+@st.cache_resource
+def get_data_source():
+    METRICS.cache_miss('get_data_source')
+    start = time.perf_counter()
     try:
-        model = joblib.load('fraud_model.pkl')
-        features = joblib.load('model_features.pkl')
-        return model, features
+        from data_sources import open_data_source
+
+        source = open_data_source()
+        source.version()  # fail fast on missing files or an unreachable database
+        record_startup('data source', start)
+        return source
+    except FileNotFoundError as e:
+        st.error(f"Data not found: {e}. Please ensure 'awash_transactions.csv' and 'awash_customers.csv' are in the repository root.")
+        st.stop()
     except Exception as e:
-        st.error(f"Model load failed: {e}")
+        st.error(f"Error loading data: {e}")
         st.stop()
 
-model, expected_features = load_model()
+data_source = METRICS.cached_call('get_data_source', get_data_source)
+
+# Query results keyed on (page, dataset version, filters): a size-bounded LRU per process,
+# optionally spilled to disk and shared by all workers (AWASH_CACHE_* settings, see result_cache.py)
+@st.cache_resource
+def get_result_cache():
+    from result_cache import open_result_cache
+
+    cache = open_result_cache()
+    METRICS.add_collector(cache.gauges)
+    return cache
+
+result_cache = get_result_cache()
+
+def load_kpis(version):
+    return result_cache.get_or_compute('kpis', version, {}, data_source.kpis)
+
+def load_fraud_rates(dim, version):
+    return result_cache.get_or_compute('fraud_rate_by', version, {'dim': dim}, lambda: data_source.fraud_rate_by(dim))
+
+# Sampled KPIs and chart data with 95% intervals, or None when the source keeps no sample
+def load_approximate(version):
+    def compute():
+        from sampling import sample_fraud_rate_by, sample_kpis
 
-# Load data from your CSV files
-@st.cache_data
-def load_data():
+        sample = data_source.sample()
+        if sample is None:
+            return None
+        return {'kpis': sample_kpis(sample), **{dim: sample_fraud_rate_by(sample, dim) for dim, _ in OVERVIEW_CHARTS.values()}}
+
+    return result_cache.get_or_compute('overview_approx', version, {}, compute)
+
+def count_explorer(channels, branches, fraud_only, version):
+    filters = {'channels': sorted(channels), 'branches': sorted(branches), 'fraud_only': fraud_only}
+    return result_cache.get_or_compute('explorer_count', version, filters,
+                                       lambda: data_source.explorer_count(channels, branches, fraud_only))
+
+def load_explorer_page(channels, branches, fraud_only, page_no, page_size, version):
+    params = {'channels': sorted(channels), 'branches': sorted(branches), 'fraud_only': fraud_only,
+              'page': page_no, 'page_size': page_size}
+    return result_cache.get_or_compute('explorer_page', version, params,
+                                       lambda: data_source.explorer_page(channels, branches, fraud_only, page_no, page_size))
+
+# Rendered Overview charts (PNG bytes per dataset version), shared by all sessions;
+# seeded with the snapshot's pre-rendered charts
+@st.cache_resource
+def get_chart_cache():
+    start = time.perf_counter()
+    cache = ChartCache()
+    snapshot = getattr(data_source, 'snapshot', None)
+    if snapshot is not None:
+        for name, options, png in snapshot.charts():
+            cache.put(ChartCache.key(name, snapshot.version, **options), png)
+    METRICS.add_collector(lambda: {(f'chart_cache_{stat}', ()): value for stat, value in cache.stats().items()})
+    record_startup('chart cache', start)
+    return cache
+
+chart_cache = get_chart_cache()
+
+# Load Model (Real-Time Fraud Predictor only)
+@st.cache_resource
+def load_model():
+    METRICS.cache_miss('load_model')
+    start = time.perf_counter()
     try:
-        # Your exact CSV filenames
-        transactions = pd.read_csv('awash_transactions.csv')
-        customers = pd.read_csv('awash_customers.csv')
-        
-        # Merge on account_number
-        df = transactions.merge(customers, on='account_number', how='left')
-        return df
-    except FileNotFoundError as e:
-        st.error(f"CSV file not found: {e}. Please ensure 'awash_transaction.csv' and 'awash_customer.csv' are in the repository root.")
-        st.stop()
+        snapshot = getattr(data_source, 'snapshot', None)
+        if snapshot is not None and snapshot.has_model():
+            # Flat forest arrays, memory-mapped; no scikit-learn import
+            model, features = snapshot.model()
+        else:
+            import joblib
+            from features import load_schema
+
+            model = joblib.load('fraud_model.pkl')
+            features = load_schema('model_features.pkl')
+            # Optional NumPy inference path: FRAUD_MODEL_BACKEND=flat
+            if os.getenv('FRAUD_MODEL_BACKEND', 'sklearn') == 'flat':
+                from flat_forest import FlatForest
+                model = FlatForest.from_sklearn(model)
+        record_startup('model', start)
+        return model, features
     except Exception as e:
-        st.error(f"Error loading data: {e}")
+        st.error(f"Model load failed: {e}")
         st.stop()
 
-df = load_data()
+# Per-leaf attribution tables, built once per loaded model
+@st.cache_resource
+def get_explainer():
+    METRICS.cache_miss('get_explainer')
+    from attributions import ForestExplainer
+
+    model, features = load_model()
+    return ForestExplainer(model, features.features)
+
+# Identifies the loaded model for result caching; fixed per process, like load_model()
+@st.cache_resource
+def model_version():
+    snapshot = getattr(data_source, 'snapshot', None)
+    if snapshot is not None and snapshot.has_model():
+        return f"snapshot-{snapshot.version}"
+    return f"{os.getenv('FRAUD_MODEL_BACKEND', 'sklearn')}-{os.stat('fraud_model.pkl').st_mtime_ns}"
+
+# Per-account velocity windows for models trained with them, warmed from the
+# in-memory transactions once per dataset version (cold for SQL sources)
+@st.cache_resource(max_entries=1)
+def get_velocity_state(version=None):
+    from velocity import HISTORY_COLUMNS, VelocityState
+
+    state = VelocityState()
+    history = data_source.transactions(HISTORY_COLUMNS)
+    if history is not None:
+        state.load_history(history)
+    return state
+
+# Exact Overview figures for a version, computed once per process off the script thread
+# while sessions in approximate mode show the sampled ones
+@st.cache_resource(max_entries=4)
+def refine_overview(version):
+    import threading
+
+    def run():
+        with METRICS.span('overview_refine'):
+            load_kpis(version)
+            for name, (dim, options) in OVERVIEW_CHARTS.items():
+                chart_cache.chart(name, version, lambda dim=dim: load_fraud_rates(dim, version), **options)
+
+    thread = threading.Thread(target=run, name=f"overview-refine-{version}", daemon=True)
+    thread.start()
+    return thread
+
+LIVE_REFRESH_SECONDS = 5
+REFINE_POLL_SECONDS = 1
 
 # Header
 st.markdown("<div style='text-align: center; margin-bottom: 40px;'>", unsafe_allow_html=True)
-st.image("https://upload.wikimedia.org/wikipedia/commons/thumb/8/8e/Awash_Bank_Final_logo.jpg/800px-Awash_Bank_Final_logo.jpg", width=220)
+st.image("OIP.webp", width=220)  # local asset; no network fetch per render
 st.markdown("<h1 style='color:#002D72;'>🏦 Awash Bank Fraud Detection & Risk Analytics Platform</h1>", unsafe_allow_html=True)
 st.markdown("<p style='font-size:18px; color:#555;'>Real-time monitoring and predictive fraud detection system simulating Awash Bank S.C. operations in Ethiopia</p>", unsafe_allow_html=True)
 st.markdown("</div>", unsafe_allow_html=True)
 
 # Sidebar
 st.sidebar.markdown("<h3 style='color:white; text-align:center;'>Navigation</h3>", unsafe_allow_html=True)
-page = st.sidebar.radio("Select Page", ["Overview Dashboard", "Fraud Explorer", "Real-Time Fraud Predictor"], label_visibility="collapsed")
+PAGES = ["Overview Dashboard", "Fraud Explorer", "Real-Time Fraud Predictor"]
+if os.getenv('AWASH_ADMIN') == '1':
+    PAGES.append("Performance")
+page = st.sidebar.radio("Select Page", PAGES, label_visibility="collapsed")
+page_start = time.perf_counter()
+live_refresh = st.sidebar.toggle("Live refresh", value=False, help=f"Re-check for newly ingested transactions every {LIVE_REFRESH_SECONDS}s")
+approximate = st.sidebar.toggle("Approximate first paint", value=os.getenv('AWASH_APPROXIMATE') == '1',
+                                help="Show Overview estimates from the stratified sample, with 95% intervals, while exact figures are computed in the background")
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("<h3 style='color:white; text-align:center;'>Developed by Aklilu Abera</h3>", unsafe_allow_html=True)
 st.sidebar.markdown("<p style='color:white; text-align:center; font-size:14px;'>Portfolio Project • December 2025</p>", unsafe_allow_html=True)
 st.sidebar.markdown("<p style='color:white; text-align:center; font-size:14px;'>Built with Python, scikit-learn & Streamlit</p>", unsafe_allow_html=True)
+with st.sidebar.expander("Startup timings"):
+    for phase, seconds in startup_timings().items():
+        st.markdown(f"{phase}: {seconds * 1000:,.0f} ms")
 
 # === Overview Dashboard ===
 if page == "Overview Dashboard":
     st.markdown("<h2 style='color:#002D72; text-align:center;'>🔍 Key Metrics & Insights</h2>", unsafe_allow_html=True)
 
-    total_transactions = len(df)
-    total_fraud = df['fraud_flag'].sum()
-    avg_amount = df['amount_etb'].mean()
-    fraud_amount_etb = df[df['fraud_flag'] == 1]['amount_etb'].sum()
-
-    c1, c2, c3, c4 = st.columns(4)
-    with c1:
-        st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-        st.metric("Total Transactions", f"{total_transactions:,}")
-        st.markdown("</div>", unsafe_allow_html=True)
-    with c2:
-        st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-        st.metric("Fraud Cases Detected", f"{total_fraud:,}", delta=f"{(total_fraud/total_transactions)*100:.2f}%")
-        st.markdown("</div>", unsafe_allow_html=True)
-    with c3:
-        st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-        st.metric("Average Amount (ETB)", f"{avg_amount:,.0f}")
-        st.markdown("</div>", unsafe_allow_html=True)
-    with c4:
-        st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-        st.metric("Fraud Amount at Risk (ETB)", f"{fraud_amount_etb:,.0f}")
-        st.markdown("</div>", unsafe_allow_html=True)
-
-    col_left, col_right = st.columns(2)
-    with col_left:
-        st.markdown("<h3 style='color:#002D72;'>Fraud Rate by Channel</h3>", unsafe_allow_html=True)
-        channel_df = df.groupby('channel')['fraud_flag'].mean().reset_index()
-        channel_df['fraud_rate'] = channel_df['fraud_flag'] * 100
-        channel_df = channel_df.sort_values('fraud_rate', ascending=False)
-
-        fig, ax = plt.subplots(figsize=(11,6))
-        sns.barplot(data=channel_df, x='channel', y='fraud_rate', palette='Blues_d', ax=ax)
-        ax.set_title("Fraud Rate by Channel (%)", fontsize=14)
-        ax.set_ylabel("Fraud Rate (%)")
-        ax.tick_params(axis='x', rotation=45)
-        st.pyplot(fig)
-
-    with col_right:
-        st.markdown("<h3 style='color:#002D72;'>Top 15 Branches by Fraud Rate</h3>", unsafe_allow_html=True)
-        branch_df = df.groupby('home_branch')['fraud_flag'].mean().reset_index()
-        branch_df['fraud_rate'] = branch_df['fraud_flag'] * 100
-        branch_df = branch_df.sort_values('fraud_rate', ascending=False).head(15)
-
-        fig2, ax2 = plt.subplots(figsize=(11,8))
-        sns.barplot(data=branch_df, y='home_branch', x='fraud_rate', palette='Greens_d', ax=ax2)
-        ax2.set_title("Top Branches by Fraud Rate (%)", fontsize=14)
-        ax2.set_xlabel("Fraud Rate (%)")
-        st.pyplot(fig2)
+    def overview_chart(name, version, approx=None):
+        dim, options = OVERVIEW_CHARTS[name]
+
+        def chart_data():
+            with METRICS.span('aggregate', page=page, dim=dim):
+                return load_fraud_rates(dim, version)
+
+        with METRICS.span('chart', page=page, chart=name, approximate=bool(approx) or None):
+            if approx:
+                # Separate cache key: the sampled chart carries error bars
+                return chart_cache.chart(name, f"{version}-approx", approx[dim], **options)
+            return chart_cache.chart(name, version, chart_data, **options)
+
+    # Re-runs on its own while live refresh is on, picking up new dataset versions,
+    # and while sampled figures wait for the exact ones
+    refresh_every = REFINE_POLL_SECONDS if st.session_state.get('overview_refining') else None
+    @st.fragment(run_every=refresh_every or (LIVE_REFRESH_SECONDS if live_refresh else None))
+    def overview():
+        with METRICS.span('data_version', page=page):
+            version = data_source.version()
+        approx = None
+        if approximate:
+            with METRICS.span('kpis_approx', page=page):
+                approx = load_approximate(version)
+            if approx is not None and not refine_overview(version).is_alive():
+                approx = None  # exact figures are cached by now
+        if bool(approx) != st.session_state.get('overview_refining', False):
+            # Start or stop polling for the exact figures
+            st.session_state['overview_refining'] = bool(approx)
+            st.rerun()
+
+        if approx:
+            metrics = approx['kpis']
+            ci = metrics['ci']
+            st.caption(f"≈ Estimated from a stratified sample of {metrics['sample_rows']:,} transactions, "
+                       "with 95% intervals; exact figures are being computed and will replace them")
+        else:
+            with METRICS.span('kpis', page=page):
+                metrics = load_kpis(version)
+            ci = None
+        approx_mark = "≈" if approx else ""
+
+        def interval(name):
+            return f"95% interval: ±{ci[name]:,.0f}" if ci else None
+
+        total_transactions = metrics['total_transactions']
+        total_fraud = metrics['total_fraud']
+        avg_amount = metrics['avg_amount']
+        fraud_amount_etb = metrics['fraud_amount_etb']
+
+        c1, c2, c3, c4 = st.columns(4)
+        with c1:
+            st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
+            st.metric("Total Transactions", f"{total_transactions:,}")
+            st.markdown("</div>", unsafe_allow_html=True)
+        with c2:
+            st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
+            st.metric("Fraud Cases Detected", f"{approx_mark}{total_fraud:,}", delta=f"{(total_fraud/total_transactions)*100:.2f}%",
+                      help=interval('total_fraud'))
+            st.markdown("</div>", unsafe_allow_html=True)
+        with c3:
+            st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
+            st.metric("Average Amount (ETB)", f"{approx_mark}{avg_amount:,.0f}", help=interval('avg_amount'))
+            st.markdown("</div>", unsafe_allow_html=True)
+        with c4:
+            st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
+            st.metric("Fraud Amount at Risk (ETB)", f"{approx_mark}{fraud_amount_etb:,.0f}", help=interval('fraud_amount_etb'))
+            st.markdown("</div>", unsafe_allow_html=True)
+
+        col_left, col_right = st.columns(2)
+        with col_left:
+            st.markdown("<h3 style='color:#002D72;'>Fraud Rate by Channel</h3>", unsafe_allow_html=True)
+            st.image(overview_chart('fraud_rate_by_channel', version, approx), use_container_width=True)
+
+        with col_right:
+            st.markdown("<h3 style='color:#002D72;'>Top 15 Branches by Fraud Rate</h3>", unsafe_allow_html=True)
+            st.image(overview_chart('top_branches', version, approx), use_container_width=True)
+        record_startup('overview ready', _started)  # from the top of the script run
+
+    overview()
 
 # === Fraud Explorer ===
 elif page == "Fraud Explorer":
@@ -225,22 +375,58 @@ elif page == "Fraud Explorer":
     sel_channels = col1.multiselect("Filter by Channel", options=transaction_channels, default=transaction_channels[:3])
     sel_branches = col2.multiselect("Filter by Home Branch", options=branches)
 
-    df_explore = df.copy()
-
-    if sel_channels:
-        df_explore = df_explore[df_explore['channel'].isin(sel_channels)]
-    if sel_branches:
-        df_explore = df_explore[df_explore['home_branch'].isin(sel_branches)]
-
-    df_explore['status'] = df_explore['fraud_flag'].apply(lambda x: 'Fraud' if x == 1 else 'Normal')
-
     fraud_only = st.checkbox("🔴 Show only fraud cases", value=False)
-    if fraud_only:
-        df_explore = df_explore[df_explore['status'] == 'Fraud']
 
-    st.markdown(f"**Showing {len(df_explore):,} transactions**")
-    display_cols = ['transaction_id', 'date', 'amount_etb', 'channel', 'location', 'merchant', 'status', 'home_branch', 'balance_etb']
-    st.dataframe(df_explore[display_cols].head(1000), use_container_width=True)
+    # Filters are answered by the data source (row indexes or SQL); only the visible page is materialized
+    with METRICS.span('data_version', page=page):
+        version = data_source.version()
+    filters = (tuple(sel_channels), tuple(sel_branches), fraud_only)
+    with METRICS.span('explorer_count', page=page):
+        n_matches = count_explorer(*filters, version=version)
+
+    col3, col4 = st.columns(2)
+    page_size = col3.selectbox("Rows per page", [100, 250, 500, 1000], index=3)
+    n_pages = max(1, -(-n_matches // page_size))
+    page_no = col4.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1, step=1)
+
+    st.markdown(f"**Showing {n_matches:,} transactions**")
+    with METRICS.span('explorer_page', page=page):
+        page_df = load_explorer_page(*filters, page_no, page_size, version=version)
+    with METRICS.span('dataframe', page=page, rows=page_size):
+        st.dataframe(page_df, use_container_width=True)
+
+    # The full result, streamed batch by batch into a file under AWASH_EXPORT_DIR
+    with st.expander(f"⬇️ Export all {n_matches:,} matching transactions"):
+        from export import DOWNLOAD_MAX_BYTES, EXPORT_DIR, FORMATS, MIME_TYPES, default_path, export_explorer
+
+        export_format = st.selectbox("Format", list(FORMATS), format_func=lambda fmt: {'csv': 'CSV', 'parquet': 'Parquet', 'ndjson.gz': 'NDJSON (gzip)'}[fmt])
+        if st.button("Export", disabled=n_matches == 0):
+            bar = st.progress(0.0, text="Starting export…")
+
+            def report(rows, total, elapsed):
+                bar.progress(min(rows / total, 1.0) if total else 1.0,
+                             text=f"{rows:,} / {total:,} rows · {rows / elapsed if elapsed else 0:,.0f} rows/sec")
+
+            with METRICS.span('export', page=page, format=export_format):
+                result = export_explorer(data_source, default_path(export_format, os.getenv('AWASH_EXPORT_DIR', EXPORT_DIR)),
+                                         *filters, fmt=export_format, progress=report)
+            METRICS.inc('export_rows_total', result['rows'], format=export_format)
+            st.session_state['explorer_export'] = result
+
+        result = st.session_state.get('explorer_export')
+        if result and os.path.exists(result['path']):
+            st.success(f"{result['rows']:,} transactions written to {result['path']} ({result['bytes'] / 2**20:,.1f} MB) "
+                       f"in {result['seconds']:.1f}s · {result['rows_per_sec']:,.0f} rows/sec")
+            if result['bytes'] <= DOWNLOAD_MAX_BYTES:
+                def export_bytes(path=result['path']):
+                    with open(path, 'rb') as f:
+                        return f.read()
+
+                # Read only when clicked, not held per session
+                st.download_button("Download", export_bytes, file_name=os.path.basename(result['path']), mime=MIME_TYPES[result['format']])
+            else:
+                st.info(f"Too large to download through the browser; use the file at {result['path']} "
+                        "or `python export.py` with the same filters.")
 
 # === Real-Time Fraud Predictor ===
 elif page == "Real-Time Fraud Predictor":
@@ -255,42 +441,139 @@ elif page == "Real-Time Fraud Predictor":
         location = st.selectbox("Transaction Location (Branch)", branches)
         home_branch = st.selectbox("Customer Home Branch", branches)
         hour = st.slider("Hour of Day (0-23)", 0, 23, 12)
+        col3, col4 = st.columns(2)
+        txn_date = col3.date_input("Transaction Date")
+        account_type = col4.selectbox("Account Type", account_types)
         balance = st.number_input("Customer Balance (ETB)", min_value=0.0, value=50000.0)
+        account_number = st.text_input("Account Number (optional)", help="Adds the account's recent activity when the model uses velocity features")
 
+        sweep = st.checkbox("What-if sweep: fraud risk over amount × hour × channel around these inputs")
         submitted = st.form_submit_button("🔍 Predict Fraud Risk", use_container_width=True)
 
     if submitted:
-        location_mismatch = 1 if location != home_branch else 0
-        high_amount = 1 if amount > 15000 else 0
-        is_weekend = 0
+        from datetime import datetime, time as day_time
 
-        input_df = pd.DataFrame([{
-            'amount_etb': amount,
-            'hour': hour,
-            'is_weekend': is_weekend,
-            'location_mismatch': location_mismatch,
-            'high_amount': high_amount,
-            'balance_etb': balance
-        }])
-
-        for ch in transaction_channels:
-            input_df[f'channel_{ch}'] = 1 if channel == ch else 0
+        from scoring import FRAUD_THRESHOLD, predict_fraud_proba
+        from velocity import needed_features
 
-        input_df = input_df.reindex(columns=expected_features, fill_value=0)
+        with METRICS.span('model_load', page=page):
+            model, feature_schema = METRICS.cached_call('load_model', load_model)
 
-        prob = model.predict_proba(input_df)[0][1]
-        pred = model.predict(input_df)[0]
+        record = {
+            'amount_etb': amount,
+            'hour': hour,
+            'is_weekend': txn_date.weekday() >= 5,
+            'location': location,
+            'home_branch': home_branch,
+            'balance_etb': balance,
+            'channel': channel,
+            'account_type': account_type
+        }
+        if needed_features(feature_schema) and account_number.strip().isdigit():
+            with METRICS.span('velocity', page=page):
+                # Looked up, not recorded: a what-if prediction is not a transaction
+                record.update(get_velocity_state(data_source.version()).features(
+                    int(account_number), datetime.combine(txn_date, day_time(hour)), amount, location))
+
+        with METRICS.span('inference', page=page):
+            # Same feature builder as training and batch scoring
+            input_row = feature_schema.transform_record(record)
+
+            # One forest evaluation; predict() would only re-derive the class from the same probabilities
+            prob = predict_fraud_proba(model, input_row)[0]
 
         # Black text for prediction results
-        if pred == 1 or prob > 0.5:
+        if prob > FRAUD_THRESHOLD:
             st.markdown(f"<p style='color:black; font-size:20px; font-weight:bold;'>🚨 **HIGH FRAUD RISK** – Probability: {prob*100:.1f}%</p>", unsafe_allow_html=True)
             st.markdown("<p style='color:black; font-size:18px; font-weight:bold;'>Recommended: Flag for review / Block transaction</p>", unsafe_allow_html=True)
         else:
             st.markdown(f"<p style='color:black; font-size:20px; font-weight:bold;'>✅ **Low Risk** – Probability: {prob*100:.1f}%</p>", unsafe_allow_html=True)
             st.balloons()
 
-        st.markdown(f"<p style='color:black; font-weight:bold; font-size:18px;'>Key factors: {'Location Mismatch' if location_mismatch else 'Normal location'} | "
-                    f"Amount {'High (>15k ETB)' if high_amount else 'Normal'} | Channel: {channel}</p>", unsafe_allow_html=True)
+        # What moved this prediction away from the base rate, per input field
+        with METRICS.span('attribution', page=page):
+            from attributions import top_factors
+
+            explainer = METRICS.cached_call('get_explainer', get_explainer)
+            factors = top_factors(explainer.explain(input_row)[0], explainer.features)
+        factor_text = " | ".join(f"{label} {value * 100:+.1f} pts" for label, value in factors)
+        st.markdown(f"<p style='color:black; font-weight:bold; font-size:18px;'>Key factors: {factor_text}</p>", unsafe_allow_html=True)
+        st.caption(f"Contributions to the fraud probability, in points from the model baseline of {explainer.bias * 100:.1f}%")
+        st.session_state['what_if_base'] = record
+
+    # The surface is cached per model and base point, so changing the channel slice is instant
+    if sweep and 'what_if_base' in st.session_state:
+        import altair as alt
+        from what_if import AXIS_LABELS, DEFAULT_AXES, risk_surface
+
+        model, feature_schema = METRICS.cached_call('load_model', load_model)
+        base = st.session_state['what_if_base']
+        scored_ms = {}
+
+        def score_surface():
+            start = time.perf_counter()
+            with METRICS.span('what_if', page=page):
+                surface = risk_surface(model, feature_schema, base)
+            scored_ms['batch'] = (time.perf_counter() - start) * 1000
+            return surface
+
+        surface = result_cache.get_or_compute('what_if', model_version(), {'base': base, 'axes': DEFAULT_AXES}, score_surface)
+        st.markdown("<h3 style='color:#002D72;'>What-if Risk Surface</h3>", unsafe_allow_html=True)
+        timing = f"scored in one batch ({scored_ms['batch']:,.0f} ms)" if scored_ms else "from cache"
+        st.caption(f"{len(surface):,} scenarios {timing}; other inputs fixed at the submitted values")
+        slice_channel = st.selectbox(AXIS_LABELS['channel'], transaction_channels, index=transaction_channels.index(base['channel']))
+        cells = surface[surface['channel'] == slice_channel]
+        heatmap = alt.Chart(cells).mark_rect().encode(
+            x=alt.X('hour:O', title=AXIS_LABELS['hour']),
+            y=alt.Y('amount_etb:O', title=AXIS_LABELS['amount_etb'], sort='descending', axis=alt.Axis(format=',.0f')),
+            color=alt.Color('fraud_probability:Q', title='Fraud probability', scale=alt.Scale(scheme='reds', domain=[0, 1])),
+            tooltip=[alt.Tooltip('amount_etb:Q', format=',.0f'), 'hour:O', alt.Tooltip('fraud_probability:Q', format='.1%')],
+        ).properties(height=520)
+        st.altair_chart(heatmap, use_container_width=True)
+
+# === Performance (AWASH_ADMIN=1) ===
+elif page == "Performance":
+    import pandas as pd
+    from metrics import peak_rss_bytes, rss_bytes
+
+    st.markdown("<h2 style='color:#002D72; text-align:center;'>⏱️ Performance</h2>", unsafe_allow_html=True)
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Resident memory (MB)", f"{rss_bytes() / 2**20:,.0f}")
+    c2.metric("Peak resident memory (MB)", f"{peak_rss_bytes() / 2**20:,.0f}")
+    c3.metric("Chart cache hits / misses", "{hits:,} / {misses:,}".format(**chart_cache.stats()))
+
+    spans = pd.DataFrame(METRICS.span_summary())
+    if spans.empty:
+        st.info("No spans recorded yet; visit the other pages first.")
+    else:
+        spans['page'] = spans['page'] if 'page' in spans else None
+        perf_page = st.selectbox("Page", [p for p in PAGES if p != page] + ["(startup / shared)"])
+        page_label = None if perf_page == "(startup / shared)" else perf_page
+        on_page = spans['page'] == perf_page if page_label else spans['page'].isna()
+        st.dataframe(spans[on_page].dropna(axis=1, how='all'), use_container_width=True, hide_index=True)
+
+        # Recent durations of one span, on log-spaced millisecond bins
+        keys = [(name, labels) for name, labels in METRICS.span_keys() if labels.get('page') == page_label]
+        if keys:
+            name, labels = st.selectbox("Span", keys, format_func=lambda key: " · ".join([key[0]] + [
+                f"{k}={v}" for k, v in key[1].items() if k != 'page']))
+            recent_ms = pd.Series(METRICS.recent(name, **labels), dtype=float) * 1000
+            bins = [0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float('inf')]
+            counts = pd.cut(recent_ms, bins).value_counts(sort=False)
+            counts.index = [f"≤{b:g} ms" for b in bins[1:-1]] + [">5000 ms"]
+            st.bar_chart(counts)
+
+    caches = {}
+    for (name, labels), value in METRICS.counters().items():
+        if name in ('cache_hits_total', 'cache_misses_total'):
+            caches.setdefault(dict(labels)['cache'], {'hits': 0, 'misses': 0})[name.split('_')[1]] = value
+    if caches:
+        st.markdown("**Cache hits / misses**")
+        st.dataframe(pd.DataFrame.from_dict(caches, orient='index'), use_container_width=True)
+    st.download_button("Download Prometheus metrics", METRICS.to_prometheus(), file_name="awash_metrics.prom", mime="text/plain")
+
+METRICS.observe('page_run', time.perf_counter() - page_start, page=page)
+METRICS.write_prometheus()
 
 # Footer
 st.markdown("<div class='footer'><strong>Developed by Aklilu Abera</strong> • Portfolio Project for Data Analyst & BI Developer Role • December 2025</div>", unsafe_allow_html=True)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Lightweight in-process instrumentation for the dashboard.
+
+Timing spans, counters and process memory, kept in one registry per
+process (``METRICS``) and shared by every Streamlit session:
+
+    with METRICS.span("kpis", page="Overview Dashboard"):
+        ...
+    METRICS.inc("cache_misses_total", cache="load_kpis")
+
+Each span keeps Prometheus-style cumulative histogram buckets, plus a
+bounded window of recent durations for the in-app performance page.
+``to_prometheus()`` renders everything in the Prometheus text format. It
+is served from a local endpoint when ``AWASH_METRICS_PORT`` is set, and
+written to ``AWASH_METRICS_FILE`` (for the node exporter's textfile
+collector) by ``write_prometheus()``.
+"""
+
+import collections
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Span histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+WINDOW = 1_000  # recent durations kept per span for the performance page
+PREFIX = "awash_"
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _format_labels(labels, **extra):
+    items = list(labels) + [(k, v) for k, v in extra.items()]
+    if not items:
+        return ""
+    escape = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in items) + "}"
+
+
+def rss_bytes():
+    """Current resident set size; the peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB on Linux
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = collections.deque(maxlen=WINDOW)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+class Metrics:
+    """Thread-safe registry of span histograms, counters and gauge collectors."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._spans = {}
+        self._counters = collections.Counter()
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._misses = threading.local()
+
+    # --- spans ---
+    def observe(self, name, seconds, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            hist = self._spans.get(key)
+            if hist is None:
+                hist = self._spans[key] = _Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Time the enclosed block as one observation of span ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def span_summary(self):
+        """Per (span, labels): count, total and percentiles of the recent window, in ms."""
+        import numpy as np
+
+        with self._lock:
+            items = [(name, dict(labels), h.count, h.sum, np.fromiter(h.recent, dtype=float))
+                     for (name, labels), h in self._spans.items()]
+        rows = []
+        for name, labels, count, total, recent in sorted(items, key=lambda item: (item[0], sorted(item[1].items()))):
+            p50, p95, p99 = np.percentile(recent, [50, 95, 99]) * 1000
+            rows.append({"span": name, **labels, "count": count, "total_s": round(total, 3),
+                         "mean_ms": round(total / count * 1000, 2), "p50_ms": round(p50, 2),
+                         "p95_ms": round(p95, 2), "p99_ms": round(p99, 2), "max_ms": round(recent.max() * 1000, 2)})
+        return rows
+
+    def span_keys(self):
+        """(span name, labels dict) of every recorded span, sorted."""
+        with self._lock:
+            return [(name, dict(labels)) for name, labels in sorted(self._spans)]
+
+    def recent(self, name, **labels):
+        """Recent durations (seconds) of one span."""
+        with self._lock:
+            hist = self._spans.get((name, _labels(labels)))
+            return list(hist.recent) if hist else []
+
+    # --- counters ---
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, _labels(labels))] += value
+
+    def counters(self):
+        with self._lock:
+            return {(name, labels): value for (name, labels), value in self._counters.items()}
+
+    def cache_miss(self, cache):
+        """Call from inside a cached function body: it only runs on a miss."""
+        self.inc("cache_misses_total", cache=cache)
+        self._misses.__dict__[cache] = True
+
+    def cached_call(self, cache, fn, *args, **kwargs):
+        """Call a st.cache_data/st.cache_resource function, counting hits and misses.
+
+        The body calls ``cache_miss(cache)``; Streamlit runs it on the
+        calling thread, so a thread-local flag tells a miss from a hit.
+        """
+        self._misses.__dict__[cache] = False
+        result = fn(*args, **kwargs)
+        if not self._misses.__dict__.pop(cache, False):
+            self.inc("cache_hits_total", cache=cache)
+        return result
+
+    # --- gauges ---
+    def add_collector(self, collect):
+        """Register a callable returning {(gauge name, ((label, value), ...)): value} at export time."""
+        self._collectors.append(collect)
+
+    def gauges(self):
+        gauges = {
+            ("process_resident_memory_bytes", ()): rss_bytes(),
+            ("process_peak_resident_memory_bytes", ()): peak_rss_bytes(),
+            ("process_uptime_seconds", ()): time.time() - self.started,
+        }
+        for collect in self._collectors:
+            gauges.update(collect())
+        return gauges
+
+    # --- export ---
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            spans = sorted(self._spans.items())
+            counters = sorted(self._counters.items())
+
+        by_name = collections.defaultdict(list)
+        for (name, labels), hist in spans:
+            by_name[name].append((labels, hist))
+        for name, entries in by_name.items():
+            metric = f"{PREFIX}{name}_seconds"
+            lines += [f"# HELP {metric} Duration of the {name} span.", f"# TYPE {metric} histogram"]
+            for labels, hist in entries:
+                cumulative = 0
+                for bound, n in zip(BUCKETS, hist.buckets):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{metric}_bucket{_format_labels(labels, le=le)} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {hist.sum:.6f}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {hist.count}")
+
+        typed = set()
+        for (name, labels), value in counters:
+            metric = PREFIX + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        for (name, labels), value in sorted(self.gauges().items()):
+            metric = PREFIX + name
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} gauge")
+                typed.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """Write the text exposition atomically to ``path`` (default: $AWASH_METRICS_FILE)."""
+        path = path or os.getenv("AWASH_METRICS_FILE")
+        if not path:
+            return None
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+        return path
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve GET /metrics on a daemon thread; returns the server."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+METRICS = Metrics()
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve_from_env():
+    """Start the /metrics endpoint once per process when AWASH_METRICS_PORT is set."""
+    global _server
+    port = os.getenv("AWASH_METRICS_PORT")
+    with _server_lock:
+        if port and _server is None:
+            _server = METRICS.serve(int(port), os.getenv("AWASH_METRICS_HOST", "127.0.0.1"))
+    return _server
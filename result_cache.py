@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Versioned result cache for dashboard queries.
+
+Results (KPI dicts, fraud-rate frames, Explorer counts and pages) are
+keyed explicitly on (page, dataset version, parameters) and looked up in
+three layers:
+
+1. memory - a per-process LRU bounded by the estimated size of its values
+2. disk   - optional spill directory; entries evicted from memory land
+            here, bounded by total file size
+3. shared - optional store used by every Streamlit worker: a SQLite file
+            (``SQLiteBackend``), or Redis, through the same get/set(ex=)
+            calls
+
+A miss computes the value once per process (concurrent sessions asking
+for the same key wait for the first), then fills all layers. Nothing is
+ever invalidated: a new dataset version simply produces new keys, and old
+entries age out through LRU eviction and the shared TTL.
+
+Configuration (``open_result_cache``):
+
+    AWASH_CACHE_BYTES        memory layer bound (default 256 MB)
+    AWASH_CACHE_SPILL_DIR    enable the disk layer here
+    AWASH_CACHE_SPILL_BYTES  disk layer bound (default 1 GB)
+    AWASH_CACHE_URL          sqlite:///path/cache.db or redis://host:6379/0
+    AWASH_CACHE_TTL          seconds shared entries live (default 1 day)
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import METRICS
+
+MEMORY_BYTES = 256 * 1024 * 1024
+SPILL_BYTES = 1024 * 1024 * 1024
+SHARED_BYTES = 2 * 1024 * 1024 * 1024
+SHARED_TTL = 24 * 3600
+NAMESPACE = "awash"
+
+
+def make_key(page, version, params=None):
+    """Cache key for one result: readable prefix plus a digest of the parameters."""
+    digest = hashlib.sha1(json.dumps(params or {}, sort_keys=True, default=list).encode()).hexdigest()[:20]
+    return f"{NAMESPACE}:{page}:{version}:{digest}"
+
+
+def estimate_size(value):
+    """Approximate in-memory bytes of a cached value."""
+    if hasattr(value, "memory_usage"):  # DataFrame / Series
+        usage = value.memory_usage(index=True, deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+_MISSING = object()  # lookup miss; cached results may themselves be None
+
+
+class MemoryLRU:
+    """Thread-safe LRU bounded by the total estimated size of its values."""
+
+    def __init__(self, max_bytes=MEMORY_BYTES, on_evict=None):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size=None):
+        size = estimate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                old_key, (old_value, old_size) = self._entries.popitem(last=False)
+                self.size -= old_size
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+        if self.on_evict:
+            for old_key, old_value in evicted:
+                self.on_evict(old_key, old_value)
+
+
+class DiskSpill:
+    """Pickled values in a directory, least recently read removed first."""
+
+    def __init__(self, path, max_bytes=SPILL_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self.size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.name.endswith(".pkl"))
+
+    def _file(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode()).hexdigest() + ".pkl")
+
+    def get(self, key, default=None):
+        path = self._file(key)
+        try:
+            with open(path, "rb") as f:
+                stored_key, value = pickle.load(f)
+            os.utime(path)  # mtime doubles as last access
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+        return value if stored_key == key else default
+
+    def put(self, key, value):
+        path = self._file(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if os.path.exists(path):
+                self.size -= os.path.getsize(path)
+            os.replace(tmp, path)
+            self.size += os.path.getsize(path)
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        files = sorted((entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                       for entry in os.scandir(self.path) if entry.name.endswith(".pkl"))
+        self.size = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                self.size -= size
+            except OSError:
+                pass
+
+
+class SQLiteBackend:
+    """Local stand-in for Redis: the subset of redis-py the cache uses, in a SQLite file.
+
+    Safe for several processes (WAL mode); least recently set entries are
+    dropped once the file holds more than ``max_bytes`` of values.
+    """
+
+    def __init__(self, path, max_bytes=SHARED_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                     "size INTEGER NOT NULL, expires REAL, updated REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_kv_updated ON kv (updated)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def ping(self):
+        return self._conn().execute("SELECT 1").fetchone()[0] == 1
+
+    def get(self, name):
+        row = self._conn().execute("SELECT value, expires FROM kv WHERE key = ?", (name,)).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return None
+        return row[0]
+
+    def set(self, name, value, ex=None):
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO kv (key, value, size, expires, updated) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, size = excluded.size, "
+            "expires = excluded.expires, updated = excluded.updated",
+            (name, value, len(value), now + ex if ex else None, now),
+        )
+        self._writes += 1
+        if self._writes % 64 == 0:
+            self._trim(now)
+        return True
+
+    def _trim(self, now):
+        conn = self._conn()
+        conn.execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires < ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM kv").fetchone()[0]
+        if total > self.max_bytes:
+            # Oldest entries until ~10% under the bound
+            conn.execute(
+                "DELETE FROM kv WHERE key IN (SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY updated DESC) AS kept "
+                "FROM kv) WHERE kept > ?)", (int(self.max_bytes * 0.9),))
+
+    def delete(self, *names):
+        cur = self._conn().executemany("DELETE FROM kv WHERE key = ?", [(n,) for n in names])
+        return cur.rowcount
+
+    def exists(self, name):
+        return int(self.get(name) is not None)
+
+    def flushdb(self):
+        self._conn().execute("DELETE FROM kv")
+        return True
+
+
+def open_backend(url):
+    """Shared backend for a cache URL: sqlite:///path or redis://... (needs the redis package)."""
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        import redis
+
+        return redis.Redis.from_url(url)
+    raise ValueError(f"Unsupported AWASH_CACHE_URL: {url}")
+
+
+class ResultCache:
+    """Memory LRU, optional disk spill and optional shared backend, in that order."""
+
+    def __init__(self, max_bytes=MEMORY_BYTES, spill_dir=None, spill_bytes=SPILL_BYTES, shared=None, ttl=SHARED_TTL):
+        self.spill = DiskSpill(spill_dir, spill_bytes) if spill_dir else None
+        self.memory = MemoryLRU(max_bytes, on_evict=self.spill.put if self.spill else None)
+        self.shared = shared
+        self.ttl = ttl
+        self.stats = {"memory": 0, "disk": 0, "shared": 0, "miss": 0, "shared_errors": 0}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _count(self, page, layer):
+        self.stats[layer] += 1
+        METRICS.inc("result_cache_requests_total", page=page, layer=layer)
+        METRICS.inc("cache_misses_total" if layer == "miss" else "cache_hits_total", cache=page)
+
+    def _lookup(self, key, page):
+        """The cached value, or _MISSING (None is a result like any other)."""
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count(page, "memory")
+            return value
+        if self.spill is not None:
+            value = self.spill.get(key, _MISSING)
+            if value is not _MISSING:
+                self._count(page, "disk")
+                self.memory.put(key, value)
+                return value
+        if self.shared is not None:
+            try:
+                blob = self.shared.get(key)
+            except Exception:  # an unreachable shared store degrades to a local cache
+                self.stats["shared_errors"] += 1
+                blob = None
+            if blob is not None:
+                value = pickle.loads(blob)
+                self._count(page, "shared")
+                self.memory.put(key, value)
+                return value
+        return _MISSING
+
+    def get_or_compute(self, page, version, params, compute):
+        """The cached result for (page, version, params), computing it on a miss.
+
+        Returned values are shared between sessions; treat them as read-only.
+        """
+        key = make_key(page, version, params)
+        value = self._lookup(key, page)
+        if value is not _MISSING:
+            return value
+
+        # One computation per key per process; other callers wait for it
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+        if not leader:
+            event.wait()
+            value = self._lookup(key, page)
+            if value is not _MISSING:
+                return value
+            # The first caller failed; compute it here
+        try:
+            self._count(page, "miss")
+            value = compute()
+            self.memory.put(key, value)
+            if self.shared is not None:
+                try:
+                    self.shared.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=self.ttl)
+                except Exception:
+                    self.stats["shared_errors"] += 1
+            return value
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is event:
+                    del self._inflight[key]
+            event.set()
+
+    def gauges(self):
+        """Metrics collector: sizes of the local layers."""
+        gauges = {("result_cache_memory_bytes", ()): self.memory.size,
+                  ("result_cache_memory_entries", ()): len(self.memory),
+                  ("result_cache_memory_evictions", ()): self.memory.evictions}
+        if self.spill is not None:
+            gauges[("result_cache_disk_bytes", ())] = self.spill.size
+        return gauges
+
+
+def open_result_cache():
+    """A ResultCache configured from the AWASH_CACHE_* environment variables."""
+    url = os.getenv("AWASH_CACHE_URL")
+    return ResultCache(
+        max_bytes=int(os.getenv("AWASH_CACHE_BYTES", MEMORY_BYTES)),
+        spill_dir=os.getenv("AWASH_CACHE_SPILL_DIR") or None,
+        spill_bytes=int(os.getenv("AWASH_CACHE_SPILL_BYTES", SPILL_BYTES)),
+        shared=open_backend(url) if url else None,
+        ttl=int(os.getenv("AWASH_CACHE_TTL", SHARED_TTL)),
+    )
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Stratified sample behind the approximate Overview.
+
+Up to ``SAMPLE_PER_STRATUM`` transactions are kept per (channel,
+home_branch), chosen by bottom-k on a hash of ``transaction_id``: the
+rows with the k smallest hash priorities form a uniform sample without
+replacement of their stratum (the same distribution as a reservoir), and
+two samples merge exactly by keeping the k smallest of their union. So
+the sample is built chunk by chunk at ingest and folded forward by each
+streaming batch, just like the aggregate cube, and its size is bounded
+by the number of strata rather than by history.
+
+Each row carries its stratum's population, so the KPI cards and fraud
+rates are answered with stratified estimators and 95% confidence
+intervals (``sample_kpis``, ``sample_fraud_rate_by``).
+
+Compare accuracy and latency with the exact path on the store or CSVs:
+
+    python sampling.py --bench
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+STRATA = ["channel", "home_branch"]
+SAMPLE_COLUMNS = ["transaction_id", "amount_etb", "fraud_flag", "location", "account_type"] + STRATA
+SAMPLE_PER_STRATUM = 500
+Z_95 = 1.959964
+
+SAMPLE_FILE = "_sample.parquet"  # underscore prefix keeps it out of the Parquet dataset scan
+
+
+def priority(transaction_id):
+    """Uniform [0, 1) priority per transaction: splitmix64 of the id."""
+    with np.errstate(over="ignore"):
+        x = np.asarray(transaction_id).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) / 2.0**53
+
+
+def _bottom_k(rows, populations, k):
+    rows = rows.sort_values("priority", kind="stable").groupby(STRATA, observed=True, sort=False).head(k)
+    rows = rows.merge(populations, on=STRATA, how="left")
+    for key in STRATA + ["location", "account_type"]:
+        rows[key] = rows[key].astype("category")
+    return rows.sort_values(STRATA + ["priority"]).reset_index(drop=True)
+
+
+def build_sample(df, k=SAMPLE_PER_STRATUM):
+    """Sample a block of merged transactions: bottom-k per stratum plus stratum sizes."""
+    rows = df[SAMPLE_COLUMNS].astype({key: str for key in STRATA}).assign(
+        priority=priority(df["transaction_id"].to_numpy()))
+    populations = rows.groupby(STRATA, observed=True).size().rename("stratum_rows").reset_index()
+    return _bottom_k(rows, populations, k)
+
+
+def merge_samples(*samples, k=SAMPLE_PER_STRATUM):
+    """Sample of the union of the inputs' transactions; stratum sizes add up."""
+    samples = [s for s in samples if s is not None and len(s)]
+    if not samples:
+        return None
+    populations = pd.concat([
+        s.astype({key: str for key in STRATA}).groupby(STRATA, observed=True)["stratum_rows"].first().reset_index()
+        for s in samples
+    ]).groupby(STRATA, observed=True)["stratum_rows"].sum().reset_index()
+    rows = pd.concat([s.drop(columns="stratum_rows").astype({key: str for key in STRATA + ["location", "account_type"]})
+                      for s in samples], ignore_index=True)
+    rows = rows.drop_duplicates("transaction_id", keep="last")
+    return _bottom_k(rows, populations, k)
+
+
+def update_sample(sample, new_transactions, k=SAMPLE_PER_STRATUM):
+    """Fold a batch of newly arrived merged transactions into the sample."""
+    return merge_samples(sample, build_sample(new_transactions, k), k=k)
+
+
+def _strata(sample):
+    """Per-row stratum id, sample size n_h, population N_h and finite-population factor."""
+    stratum = sample.groupby(STRATA, observed=True, sort=False).ngroup().to_numpy()
+    n = np.bincount(stratum)
+    big_n = np.zeros(len(n))
+    big_n[stratum] = sample["stratum_rows"].to_numpy(dtype=np.float64)
+    # Var of an estimated total: sum_h N_h^2 (1 - n_h/N_h) s_h^2 / n_h
+    factor = big_n**2 * (1 - n / big_n) / n
+    return stratum, n, big_n, factor
+
+
+def _total(strata, values):
+    """Estimated population total of a per-row value and its variance."""
+    stratum, n, big_n, factor = strata
+    s1 = np.bincount(stratum, values)
+    s2 = np.bincount(stratum, values**2)
+    var_h = np.where(n > 1, (s2 - s1**2 / n) / np.maximum(n - 1, 1), 0.0)
+    return float((big_n / n * s1).sum()), float((factor * var_h).sum())
+
+
+def sample_kpis(sample):
+    """The four Overview KPI cards estimated from the sample (see aggregates.kpis).
+
+    ``total_transactions`` is exact (stratum sizes are counted in full);
+    ``ci`` holds the 95% half-width of each estimate and ``sample_rows``
+    the number of sampled transactions.
+    """
+    amount = sample["amount_etb"].to_numpy(dtype=np.float64)
+    fraud = sample["fraud_flag"].to_numpy(dtype=np.float64)
+    strata = _strata(sample)
+    total = int(strata[2].sum())
+    fraud_total, fraud_var = _total(strata, fraud)
+    amount_total, amount_var = _total(strata, amount)
+    fraud_amount, fraud_amount_var = _total(strata, amount * fraud)
+    return {
+        "total_transactions": total,
+        "total_fraud": int(round(fraud_total)),
+        "avg_amount": amount_total / total if total else 0.0,
+        "fraud_amount_etb": fraud_amount,
+        "ci": {
+            "total_transactions": 0.0,
+            "total_fraud": Z_95 * np.sqrt(fraud_var),
+            "avg_amount": Z_95 * np.sqrt(amount_var) / total if total else 0.0,
+            "fraud_amount_etb": Z_95 * np.sqrt(fraud_amount_var),
+        },
+        "sample_rows": len(sample),
+    }
+
+
+def sample_fraud_rate_by(sample, dim):
+    """Estimated fraud rate (%) per value of ``dim``, highest first, with 95% bounds.
+
+    Columns as aggregates.fraud_rate_by plus ``ci_low`` and ``ci_high``.
+    Each rate is a ratio of two estimated domain totals; its variance is
+    the linearized one, from per-(stratum, value) sums of the residuals.
+    """
+    stratum, n, big_n, factor = _strata(sample)
+    fraud = sample["fraud_flag"].to_numpy(dtype=np.float64)
+    group = pd.Categorical(sample[dim]).remove_unused_categories()
+    code = group.codes
+    weight = big_n[stratum] / n[stratum]
+
+    txn = np.bincount(code, weight, minlength=len(group.categories))
+    frauds = np.bincount(code, weight * fraud, minlength=len(group.categories))
+    rate = frauds / txn
+    residual = fraud - rate[code]
+
+    # Per (stratum, value): sums of the residual and its square; rows outside the value count as 0
+    cell = stratum * len(group.categories) + code
+    cells = len(n) * len(group.categories)
+    s1 = np.bincount(cell, residual, minlength=cells).reshape(len(n), -1)
+    s2 = np.bincount(cell, residual**2, minlength=cells).reshape(len(n), -1)
+    var_h = np.where((n > 1)[:, None], (s2 - s1**2 / n[:, None]) / np.maximum(n - 1, 1)[:, None], 0.0)
+    half = Z_95 * np.sqrt((factor[:, None] * var_h).sum(axis=0)) / txn * 100
+
+    out = pd.DataFrame({
+        dim: group.categories.astype(str),
+        "txn_count": np.round(txn).astype(np.int64),
+        "fraud_count": np.round(frauds).astype(np.int64),
+        "fraud_rate": rate * 100,
+    })
+    out["ci_low"] = (out["fraud_rate"] - half).clip(lower=0)
+    out["ci_high"] = (out["fraud_rate"] + half).clip(upper=100)
+    return out.sort_values("fraud_rate", ascending=False).reset_index(drop=True)
+
+
+def sample_path(store_dir):
+    return os.path.join(store_dir, SAMPLE_FILE)
+
+
+def save_sample(sample, store_dir):
+    # Write then rename so readers never see a partial file
+    path = sample_path(store_dir)
+    tmp_path = path + ".tmp"
+    sample.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def read_sample(store_dir):
+    path = sample_path(store_dir)
+    if not os.path.exists(path):
+        return None
+    return pd.read_parquet(path)
+
+
+def benchmark(frame, k=SAMPLE_PER_STRATUM, repeat=5):
+    """Accuracy and latency of the sampled Overview against the exact one on a merged frame."""
+    from aggregates import CUBE_SOURCE_COLUMNS, build_cube, fraud_rate_by, kpis
+
+    def timed(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - start)
+        return result, float(np.median(times)) * 1000
+
+    def exact():
+        cube = build_cube(frame[CUBE_SOURCE_COLUMNS])
+        return kpis(cube), {dim: fraud_rate_by(cube, dim) for dim in STRATA}
+
+    sample, build_ms = timed(lambda: build_sample(frame, k))
+    (exact_kpis, exact_rates), exact_ms = timed(exact)
+    (approx_kpis, approx_rates), approx_ms = timed(
+        lambda: (sample_kpis(sample), {dim: sample_fraud_rate_by(sample, dim) for dim in STRATA}))
+
+    results = {"rows": len(frame), "sample_rows": len(sample), "sample_build_ms": build_ms,
+               "exact_ms": exact_ms, "approx_ms": approx_ms, "kpis": {}}
+    for name, half in approx_kpis["ci"].items():
+        truth, estimate = exact_kpis[name], approx_kpis[name]
+        results["kpis"][name] = {"exact": truth, "approx": estimate, "ci": half,
+                                 "rel_error": abs(estimate - truth) / truth if truth else 0.0}
+    for dim in STRATA:
+        both = exact_rates[dim].merge(approx_rates[dim], on=dim, suffixes=("", "_approx"))
+        covered = (both["fraud_rate"] >= both["ci_low"]) & (both["fraud_rate"] <= both["ci_high"])
+        results[dim] = {"groups": len(both),
+                        "max_abs_error_pts": float((both["fraud_rate_approx"] - both["fraud_rate"]).abs().max()),
+                        "mean_ci_half_width_pts": float(((both["ci_high"] - both["ci_low"]) / 2).mean()),
+                        "ci_coverage": float(covered.mean())}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the stratified sample, or benchmark it against the exact Overview.")
+    parser.add_argument("--store", default=None, help="Store directory (default: data/transactions_store)")
+    parser.add_argument("--k", type=int, default=SAMPLE_PER_STRATUM, help="Transactions kept per (channel, home_branch)")
+    parser.add_argument("--bench", action="store_true", help="Compare with the exact path instead of writing the sample")
+    parser.add_argument("--transactions", default=None, help="Benchmark on these CSVs instead of the store")
+    parser.add_argument("--customers", default="awash_customers.csv")
+    args = parser.parse_args()
+
+    from aggregates import CUBE_SOURCE_COLUMNS
+    from data_store import STORE_DIR, load_store, merge_customers, read_customers, read_transactions
+
+    store_dir = args.store or STORE_DIR
+    columns = list(dict.fromkeys(CUBE_SOURCE_COLUMNS + SAMPLE_COLUMNS))
+    if args.transactions:
+        frame = merge_customers(read_transactions(args.transactions), read_customers(args.customers))
+    else:
+        frame = load_store(store_dir, columns=columns)
+
+    if not args.bench:
+        save_sample(build_sample(frame, args.k), store_dir)
+        print(f"✓ Sample of {len(frame):,} rows written to {sample_path(store_dir)}")
+        return
+
+    r = benchmark(frame, args.k)
+    print(f"{r['rows']:,} rows, {r['sample_rows']:,} sampled ({r['sample_build_ms']:,.0f} ms to sample)")
+    print(f"Overview (KPIs + both fraud-rate charts): exact {r['exact_ms']:,.1f} ms, approximate {r['approx_ms']:,.1f} ms")
+    for name, k in r["kpis"].items():
+        print(f"  {name:<20} exact {k['exact']:>16,.2f}  approx {k['approx']:>16,.2f} ± {k['ci']:,.2f}  "
+              f"({k['rel_error'] * 100:.2f}% off)")
+    for dim in STRATA:
+        d = r[dim]
+        print(f"  fraud rate by {dim}: max error {d['max_abs_error_pts']:.2f} pts, mean ±{d['mean_ci_half_width_pts']:.2f} pts, "
+              f"{d['ci_coverage'] * 100:.0f}% of {d['groups']} exact rates inside the 95% interval")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Batch scoring for the fraud model.
+
+Score a day's transactions file in bounded memory:
+
+    python scoring.py awash_transactions.csv scores.csv --chunksize 200000
+
+The input is read in chunks, each chunk is joined to customers, turned
+into the training feature layout in one vectorized pass and scored with
+a single ``predict_proba`` call. Scores are appended to the output (CSV
+or Parquet) chunk by chunk, so memory does not grow with the file.
+"""
+
+import argparse
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from features import FeatureSchema, load_schema
+from flat_forest import FlatForest
+from velocity import VelocityState, add_velocity_features, needed_features
+
+MODEL_PATH = "fraud_model.pkl"
+FEATURES_PATH = "model_features.pkl"
+CUSTOMERS_CSV = "awash_customers.csv"
+
+FRAUD_THRESHOLD = 0.5
+
+CUSTOMER_COLUMNS = ["account_number", "home_branch", "balance_etb", "account_type"]
+
+
+def load_scoring_model(model_path=MODEL_PATH, features_path=FEATURES_PATH, n_jobs=None, backend="sklearn"):
+    """The fitted forest and its feature schema, same files as the app's load_model().
+
+    The features come back as the fitted FeatureSchema saved next to the
+    feature list. backend="flat" swaps in the NumPy FlatForest export of
+    the same forest.
+    """
+    model = joblib.load(model_path)
+    schema = load_schema(features_path)
+    if n_jobs is not None:
+        model.n_jobs = n_jobs
+    if backend == "flat":
+        model = FlatForest.from_sklearn(model)
+    return model, schema
+
+
+def attach_customers(transactions, customers):
+    """Add the customer columns the model needs when the input lacks them."""
+    missing = [c for c in CUSTOMER_COLUMNS[1:] if c not in transactions.columns]
+    if not missing:
+        return transactions
+    return transactions.merge(customers[["account_number"] + missing], on="account_number", how="left")
+
+
+def build_features(df, schema):
+    """Feature matrix in the training column layout.
+
+    schema: a features.FeatureSchema, or a plain model_features list.
+    """
+    if not isinstance(schema, FeatureSchema):
+        schema = FeatureSchema.from_features(schema)
+    return schema.transform(df)
+
+
+def predict_fraud_proba(model, X):
+    """Class-1 probabilities for a feature matrix from either backend."""
+    if hasattr(model, "feature_names_in_"):
+        # sklearn warns on bare arrays when it was fitted on a DataFrame; wrapping does not copy
+        X = pd.DataFrame(X, columns=list(model.feature_names_in_), copy=False)
+    return model.predict_proba(X)[:, 1]
+
+
+def score_frame(df, model, schema, customers=None, threshold=FRAUD_THRESHOLD, velocity=None):
+    """Fraud probability and flag for every row of a transactions frame.
+
+    velocity: a velocity.VelocityState carrying per-account history across
+    calls, for models trained with velocity features; without one they
+    are computed from the frame alone.
+    """
+    if customers is not None:
+        df = attach_customers(df, customers)
+    df = add_velocity_features(df, schema, velocity)
+    X = build_features(df, schema)
+    # One forest evaluation per chunk; the flag is derived from the probability
+    prob = predict_fraud_proba(model, X)
+    out = pd.DataFrame({"fraud_probability": prob, "fraud_pred": (prob > threshold).astype(np.int8)})
+    if "transaction_id" in df.columns:
+        out.insert(0, "transaction_id", df["transaction_id"].to_numpy())
+    return out
+
+
+def score_file(input_path, output_path, customers_csv=CUSTOMERS_CSV, model=None, schema=None,
+               chunksize=200_000, threshold=FRAUD_THRESHOLD):
+    """Stream a transactions CSV through the model into a CSV or Parquet file."""
+    if model is None:
+        model, schema = load_scoring_model()
+    customers = pd.read_csv(customers_csv, usecols=CUSTOMER_COLUMNS)
+    # Account history carries over from chunk to chunk (the file is in time order)
+    velocity = VelocityState() if needed_features(schema) else None
+
+    start = time.perf_counter()
+    rows = 0
+    writer = None
+    try:
+        for i, chunk in enumerate(pd.read_csv(input_path, chunksize=chunksize)):
+            scores = score_frame(chunk, model, schema, customers, threshold, velocity)
+            if output_path.endswith(".parquet"):
+                table = pa.Table.from_pandas(scores, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                writer.write_table(table)
+            else:
+                scores.to_csv(output_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            rows += len(scores)
+            elapsed = time.perf_counter() - start
+            print(f"  chunk {i + 1}: {rows:,} rows scored ({rows / elapsed:,.0f} rows/sec)")
+    finally:
+        if writer is not None:
+            writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✓ {rows:,} transactions scored into {output_path} in {elapsed:.1f}s")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a transactions CSV with the fraud model.")
+    parser.add_argument("input", help="Transactions CSV (customer columns are joined in when missing)")
+    parser.add_argument("output", help="Output .csv or .parquet file")
+    parser.add_argument("--customers", default=CUSTOMERS_CSV)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--features", default=FEATURES_PATH)
+    parser.add_argument("--chunksize", type=int, default=200_000)
+    parser.add_argument("--threshold", type=float, default=FRAUD_THRESHOLD)
+    parser.add_argument("--jobs", type=int, default=-1, help="Cores used per chunk (-1 = all)")
+    parser.add_argument("--backend", choices=["sklearn", "flat"], default="sklearn")
+    args = parser.parse_args()
+
+    model, schema = load_scoring_model(args.model, args.features, n_jobs=args.jobs, backend=args.backend)
+    score_file(args.input, args.output, args.customers, model, schema, args.chunksize, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
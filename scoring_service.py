@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""HTTP scoring service for the authorization path.
+
+    python scoring_service.py --port 8080 --max-batch 64 --max-wait-ms 5
+
+POST /score takes one transaction or {"transactions": [...]} as JSON and
+returns the fraud probability for each. Concurrent requests are coalesced
+into micro-batches of up to --max-batch rows or --max-wait-ms
+milliseconds and scored with one ``predict_proba`` call on a worker
+thread. GET /metrics reports p50/p99 latency, throughput and batch sizes.
+
+Each transaction needs ``amount_etb``, ``channel``, ``location`` and
+``account_number`` (or the customer fields ``home_branch``,
+``balance_etb`` and ``account_type``); ``date`` defaults to now.
+"""
+
+import argparse
+import asyncio
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from aiohttp import web
+
+from scoring import CUSTOMER_COLUMNS, CUSTOMERS_CSV, FEATURES_PATH, MODEL_PATH, load_scoring_model, score_frame
+from velocity import VelocityState, needed_features
+
+
+REQUIRED_FIELDS = ("amount_etb", "channel", "location")
+NUMERIC_FIELDS = ("amount_etb", "balance_etb", "account_number")
+
+
+def validate_record(record):
+    """(record with numeric fields coerced, None) or (None, error message) for one transaction."""
+    if not isinstance(record, dict):
+        return None, "each transaction must be a JSON object"
+    missing = [f for f in REQUIRED_FIELDS if f not in record]
+    if missing:
+        return None, f"missing fields: {', '.join(missing)}"
+    record = dict(record)
+    for field in NUMERIC_FIELDS:
+        value = record.get(field)
+        if value is None:
+            if field in REQUIRED_FIELDS:
+                return None, f"{field} must be a number"
+            continue
+        try:
+            if isinstance(value, bool):
+                raise ValueError
+            number = float(value)
+        except (TypeError, ValueError):
+            return None, f"{field} must be a number, got {value!r}"
+        if not np.isfinite(number):
+            return None, f"{field} must be finite, got {value!r}"
+        if field == "account_number":
+            if not number.is_integer():
+                return None, f"account_number must be an integer, got {value!r}"
+            number = int(number)
+        record[field] = number
+    if record.get("date") is not None:
+        try:
+            pd.Timestamp(record["date"])
+        except (TypeError, ValueError):
+            return None, f"date is not a date: {record['date']!r}"
+    return record, None
+
+
+class LatencyStats:
+    """Rolling request latencies and counters for /metrics."""
+
+    def __init__(self, window=10_000):
+        self.latencies_ms = collections.deque(maxlen=window)
+        self.batch_sizes = collections.deque(maxlen=window)
+        self.requests = 0
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def record_request(self, latency_ms, rows):
+        self.latencies_ms.append(latency_ms)
+        self.requests += 1
+        self.rows += rows
+
+    def snapshot(self):
+        uptime = time.perf_counter() - self.started
+        lat = np.fromiter(self.latencies_ms, dtype=float) if self.latencies_ms else np.zeros(1)
+        return {
+            "requests": self.requests,
+            "rows": self.rows,
+            "uptime_sec": round(uptime, 1),
+            "throughput_rows_per_sec": round(self.rows / uptime, 1) if uptime else 0.0,
+            "latency_p50_ms": round(float(np.percentile(lat, 50)), 3),
+            "latency_p99_ms": round(float(np.percentile(lat, 99)), 3),
+            "mean_batch_rows": round(float(np.mean(self.batch_sizes)), 1) if self.batch_sizes else 0.0,
+        }
+
+
+class MicroBatcher:
+    """Coalesces concurrent scoring requests into single model calls."""
+
+    def __init__(self, score_fn, max_batch=64, max_wait_ms=5.0, workers=2, stats=None):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="score")
+        self.slots = asyncio.Semaphore(workers)
+        self.queue = asyncio.Queue()
+        self.stats = stats or LatencyStats()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._collect())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        self.pool.shutdown(wait=True)
+
+    async def submit(self, records):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((records, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            rows = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while rows < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            # Keep collecting the next batch while this one is scored
+            await self.slots.acquire()
+            asyncio.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        loop = asyncio.get_running_loop()
+        records = [r for recs, _ in batch for r in recs]
+        try:
+            scores = await loop.run_in_executor(self.pool, self.score_fn, records)
+        except Exception as e:
+            if len(batch) == 1:
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(e)
+            else:
+                # Score each request on its own so an error only reaches the request that caused it
+                for recs, future in batch:
+                    try:
+                        result = await loop.run_in_executor(self.pool, self.score_fn, recs)
+                    except Exception as e:
+                        if not future.done():
+                            future.set_exception(e)
+                        continue
+                    if not future.done():
+                        future.set_result(result)
+            return
+        finally:
+            self.slots.release()
+        self.stats.batch_sizes.append(len(records))
+        start = 0
+        for recs, future in batch:
+            if not future.done():
+                future.set_result(scores[start:start + len(recs)])
+            start += len(recs)
+
+
+def make_scorer(model, schema, customers):
+    # Per-account windows for models trained with velocity features, updated by every scored request
+    velocity = VelocityState() if needed_features(schema) else None
+
+    def score(records):
+        df = pd.DataFrame.from_records(records)
+        if "date" not in df.columns:
+            df["date"] = pd.Timestamp.now()
+        df["date"] = df["date"].fillna(pd.Timestamp.now())
+        if "account_number" not in df.columns:
+            df["account_number"] = np.nan
+        return score_frame(df, model, schema, customers, velocity=velocity).to_dict("records")
+    return score
+
+
+async def handle_score(request):
+    start = time.perf_counter()
+    try:
+        body = await request.json()
+    except ValueError:
+        return web.json_response({"error": "request body must be JSON"}, status=400)
+    records = body.get("transactions", [body]) if isinstance(body, dict) else body
+    if not records:
+        return web.json_response({"error": "no transactions given"}, status=400)
+    if not isinstance(records, list):
+        return web.json_response({"error": "transactions must be a list"}, status=400)
+    # Reject bad rows here so they cannot fail the whole micro-batch they would join
+    clean = []
+    for i, record in enumerate(records):
+        record, error = validate_record(record)
+        if error:
+            return web.json_response({"error": f"transaction {i}: {error}"}, status=400)
+        clean.append(record)
+    records = clean
+
+    batcher = request.app["batcher"]
+    try:
+        scores = await batcher.submit(records)
+    except (KeyError, ValueError, TypeError) as e:
+        return web.json_response({"error": f"could not score request: {e}"}, status=400)
+    batcher.stats.record_request((time.perf_counter() - start) * 1000, len(records))
+    return web.json_response({"scores": scores})
+
+
+async def handle_metrics(request):
+    return web.json_response(request.app["batcher"].stats.snapshot())
+
+
+async def handle_health(request):
+    return web.json_response({"status": "ok"})
+
+
+def create_app(model_path=MODEL_PATH, features_path=FEATURES_PATH, customers_csv=CUSTOMERS_CSV,
+               max_batch=64, max_wait_ms=5.0, workers=2, backend="sklearn"):
+    # Loaded once per process; one thread per batch, so the forest itself runs single-threaded
+    model, schema = load_scoring_model(model_path, features_path, n_jobs=1, backend=backend)
+    customers = pd.read_csv(customers_csv, usecols=CUSTOMER_COLUMNS)
+    scorer = make_scorer(model, schema, customers)
+
+    app = web.Application()
+
+    async def on_startup(app):
+        app["batcher"] = MicroBatcher(scorer, max_batch, max_wait_ms, workers)
+        app["batcher"].start()
+
+    async def on_cleanup(app):
+        await app["batcher"].stop()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/score", handle_score)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/health", handle_health)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the fraud model over HTTP with micro-batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--features", default=FEATURES_PATH)
+    parser.add_argument("--customers", default=CUSTOMERS_CSV)
+    parser.add_argument("--max-batch", type=int, default=64, help="Rows per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Longest a request waits for a batch to fill")
+    parser.add_argument("--workers", type=int, default=2, help="Batches scored in parallel")
+    parser.add_argument("--backend", choices=["sklearn", "flat"], default="sklearn")
+    args = parser.parse_args()
+
+    app = create_app(args.model, args.features, args.customers, args.max_batch, args.max_wait_ms, args.workers,
+                     args.backend)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Warm-start snapshot for the dashboard.
+
+    python snapshot.py                    # from the store (or the CSVs)
+    python snapshot.py --source csv --out data/snapshot
+    python snapshot.py --check            # build and reopen one from every source
+
+A snapshot is a directory of plain ``.npy`` arrays and a JSON manifest:
+the merged table (one array per column, categoricals as codes), the
+aggregate cube, the Overview KPIs and pre-rendered charts, and the model
+as flat forest arrays. A fresh replica memory-maps it instead of
+re-reading CSVs, rebuilding aggregates and unpickling scikit-learn, so
+the Overview is served without touching pandas parsing, Matplotlib or
+joblib. It is tagged with the dataset version it was built from; once
+the live data moves on, the app falls back to the live source.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+SNAPSHOT_DIR = os.path.join("data", "snapshot")
+MANIFEST = "manifest.json"
+
+
+class Snapshot:
+    """Read side of a snapshot directory; arrays are memory-mapped."""
+
+    def __init__(self, path=SNAPSHOT_DIR):
+        self.path = path
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest["version"]
+        self.kpis = self.manifest["kpis"]
+
+    def _file(self, *parts):
+        return os.path.join(self.path, *parts)
+
+    def has_columns(self, columns):
+        return set(columns) <= set(self.manifest["columns"])
+
+    def frame(self, columns=None):
+        """The merged table as a DataFrame over memory-mapped column arrays."""
+        import pandas as pd
+
+        data = {}
+        for name in columns or list(self.manifest["columns"]):
+            spec = self.manifest["columns"][name]
+            values = np.load(self._file("table", f"{name}.npy"), mmap_mode="r")
+            if "categories" in spec:
+                values = pd.Categorical.from_codes(values, categories=spec["categories"], validate=False)
+            data[name] = pd.Series(values, name=name, copy=False)
+        return pd.DataFrame(data, copy=False)
+
+    def cube(self):
+        import pandas as pd
+
+        return pd.read_parquet(self._file("cube.parquet"))
+
+    def charts(self):
+        """(name, options, PNG bytes) for every pre-rendered chart."""
+        for chart in self.manifest["charts"]:
+            with open(self._file("charts", chart["file"]), "rb") as f:
+                yield chart["name"], chart["options"], f.read()
+
+    def has_model(self):
+        return "model" in self.manifest
+
+    def model(self):
+        """(FlatForest over memory-mapped node arrays, FeatureSchema)."""
+        from features import FeatureSchema
+        from flat_forest import FlatForest
+
+        spec = self.manifest["model"]
+        return FlatForest.load(self._file("model")), FeatureSchema(spec["features"], spec["high_amount_etb"])
+
+
+def snapshot_exists(path=SNAPSHOT_DIR):
+    return os.path.exists(os.path.join(path, MANIFEST))
+
+
+def open_snapshot(path=SNAPSHOT_DIR):
+    return Snapshot(path) if snapshot_exists(path) else None
+
+
+def _write_table(df, table_dir):
+    import pandas as pd
+
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        if series.dtype == object:
+            series = series.astype("category")
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            np.save(os.path.join(table_dir, f"{name}.npy"), codes)
+            columns[name] = {"dtype": "category", "categories": [str(c) for c in series.cat.categories]}
+        else:
+            values = series.to_numpy()
+            np.save(os.path.join(table_dir, f"{name}.npy"), values)
+            columns[name] = {"dtype": str(values.dtype)}
+    return columns
+
+
+def build_snapshot(source, path=SNAPSHOT_DIR, model_path="fraud_model.pkl", features_path="model_features.pkl"):
+    """Write a snapshot of an in-memory data source (CSV or store); returns phase timings."""
+    from aggregates import CUBE_SOURCE_COLUMNS
+    from charts import OVERVIEW_CHARTS, ChartCache
+    from explorer_query import SOURCE_COLUMNS as EXPLORER_SOURCE_COLUMNS
+    from velocity import HISTORY_COLUMNS
+
+    timings = {}
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    for sub in ("table", "charts"):
+        os.makedirs(os.path.join(tmp, sub))
+
+    start = time.perf_counter()
+    version = source.version()
+    # The predictor warms its velocity state from the same table
+    df = source.transactions(list(dict.fromkeys(CUBE_SOURCE_COLUMNS + EXPLORER_SOURCE_COLUMNS + HISTORY_COLUMNS)))
+    if df is None:
+        raise ValueError(f"{type(source).__name__} does not hold the transactions in memory; use the CSV or store source")
+    manifest = {"version": version, "created": time.time(), "n_rows": len(df), "columns": _write_table(df, os.path.join(tmp, "table"))}
+    timings["table"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    source.cube().to_parquet(os.path.join(tmp, "cube.parquet"), index=False)
+    manifest["kpis"] = {k: float(v) if isinstance(v, (float, np.floating)) else int(v) for k, v in source.kpis().items()}
+    timings["aggregates"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cache = ChartCache()
+    manifest["charts"] = []
+    for name, (_, options) in OVERVIEW_CHARTS.items():
+        png = cache.overview_chart(name, source, version)
+        with open(os.path.join(tmp, "charts", f"{name}.png"), "wb") as f:
+            f.write(png)
+        manifest["charts"].append({"name": name, "options": options, "file": f"{name}.png"})
+    timings["charts"] = time.perf_counter() - start
+
+    if os.path.exists(model_path):
+        start = time.perf_counter()
+        from scoring import load_scoring_model
+
+        flat, schema = load_scoring_model(model_path, features_path, backend="flat")
+        flat.save(os.path.join(tmp, "model"))
+        manifest["model"] = {"features": schema.features, "high_amount_etb": schema.high_amount_etb}
+        timings["model"] = time.perf_counter() - start
+
+    with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    old = path + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return timings
+
+
+def check_sources(kinds=("csv", "store"), model_path="fraud_model.pkl", features_path="model_features.pkl"):
+    """Smoke check: build a snapshot from each source into a temporary directory and reopen it.
+
+    Sources whose data is missing (no store built yet) are skipped.
+    Returns {kind: "ok" | "skipped: ..."}; raises on any mismatch.
+    """
+    import tempfile
+
+    from data_sources import open_live_source
+    from data_store import store_exists
+
+    results = {}
+    for kind in kinds:
+        if kind == "store" and not store_exists():
+            results[kind] = "skipped: no store (run `python data_store.py`)"
+            continue
+        source = open_live_source(kind)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "snapshot")
+            build_snapshot(source, path, model_path, features_path)
+            snap = Snapshot(path)
+            if snap.version != source.version():
+                raise AssertionError(f"{kind}: snapshot version {snap.version} != source version {source.version()}")
+            if len(snap.frame()) != source.kpis()["total_transactions"]:
+                raise AssertionError(f"{kind}: snapshot holds {len(snap.frame()):,} rows, source {source.kpis()['total_transactions']:,}")
+            if snap.kpis["total_fraud"] != source.kpis()["total_fraud"]:
+                raise AssertionError(f"{kind}: snapshot KPIs differ from the source's")
+            if os.path.exists(model_path) and not snap.has_model():
+                raise AssertionError(f"{kind}: model missing from the snapshot")
+        results[kind] = "ok"
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the dashboard's warm-start snapshot.")
+    parser.add_argument("--source", default="auto", choices=["auto", "csv", "store"])
+    parser.add_argument("--out", default=SNAPSHOT_DIR)
+    parser.add_argument("--model", default="fraud_model.pkl")
+    parser.add_argument("--features", default="model_features.pkl")
+    parser.add_argument("--check", action="store_true", help="Build and reopen a snapshot from every source, then exit")
+    args = parser.parse_args()
+
+    from data_sources import open_live_source
+
+    if args.check:
+        for kind, result in check_sources(model_path=args.model, features_path=args.features).items():
+            print(f"  {kind:<8}{result}")
+        print("✓ Snapshot smoke check passed")
+        return
+
+    source = open_live_source(args.source)
+    timings = build_snapshot(source, args.out, args.model, args.features)
+    for phase, seconds in timings.items():
+        print(f"  {phase:<12}{seconds:>8.2f}s")
+    print(f"✓ Snapshot of version {source.version()} written to {args.out}")
+
+    start = time.perf_counter()
+    snap = Snapshot(args.out)
+    snap.frame()
+    print(f"✓ Restored in {(time.perf_counter() - start) * 1000:.0f} ms (memory-mapped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Time the dashboard's SQL queries before and after the summary/index changes.
+
+    python benchmark_queries.py --rows 1000000 10000000
+
+For each size a synthetic awash_analytics dataset is generated into a
+SQLite file (reused on later runs), then every query the dashboard
+issues through data_sources.SqlSource is timed twice:
+
+* before - the original single-column indexes, Overview from the raw join
+* after  - the composite indexes in schema.sql, Overview from
+           fraud_daily_summary (summary_tables.sql)
+
+``--mysql`` instead times the raw and summary paths against the
+configured MySQL database with whatever indexes it currently has.
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from constants import account_types, branches, transaction_channels  # noqa: E402
+from data_sources import SqlSource, mysql_pool, sqlite_pool  # noqa: E402
+from load_to_mysql import SQLiteTarget, refresh_summary, secondary_indexes  # noqa: E402
+
+# The indexes schema.sql shipped with before the composite ones
+BASELINE_INDEXES = {
+    "customers": [("idx_account", "account_number"), ("idx_branch", "home_branch")],
+    "transactions": [("idx_date", "date"), ("idx_amount", "amount_etb"), ("idx_fraud", "fraud_flag"),
+                     ("idx_channel", "channel"), ("idx_location", "location")],
+}
+
+DEFAULT_CHANNELS = transaction_channels[:3]  # the Explorer's default selection
+QUERIES = [
+    ("kpis", lambda s: s.kpis()),
+    ("fraud rate by channel", lambda s: s.fraud_rate_by("channel")),
+    ("fraud rate by branch", lambda s: s.fraud_rate_by("home_branch")),
+    ("explorer count (default)", lambda s: s.explorer_count(DEFAULT_CHANNELS)),
+    ("explorer page 1 (default)", lambda s: s.explorer_page(DEFAULT_CHANNELS, page=1, page_size=1000)),
+    ("explorer page 50 (default)", lambda s: s.explorer_page(DEFAULT_CHANNELS, page=50, page_size=1000)),
+    ("explorer count (branch, fraud)", lambda s: s.explorer_count(None, branches[:2], True)),
+    ("explorer page 1 (branch, fraud)", lambda s: s.explorer_page(None, branches[:2], True, page=1, page_size=1000)),
+    ("explorer count (fraud)", lambda s: s.explorer_count(None, None, True)),
+]
+
+
+def synthesize(path, rows, n_customers=50_000, seed=42, chunksize=500_000):
+    """Write a synthetic customers + transactions dataset into a SQLite file."""
+    rng = np.random.default_rng(seed)
+    target = SQLiteTarget(path)
+    conn = sqlite3.connect(path)
+
+    accounts = 1_000_000_000 + np.arange(n_customers)
+    home = rng.integers(0, len(branches), n_customers)
+    conn.executemany(
+        "INSERT INTO customers VALUES (?, ?, NULL, NULL, ?, ?, ?, ?, '2020-01-01')",
+        zip(range(1, n_customers + 1), (f"Customer {i}" for i in range(n_customers)), accounts.tolist(),
+            np.array(account_types)[rng.integers(0, len(account_types), n_customers)].tolist(),
+            rng.gamma(2.0, 40_000, n_customers).round(2).tolist(), np.array(branches)[home].tolist()),
+    )
+
+    start = np.datetime64("2024-01-01T00:00:00")
+    for offset in range(0, rows, chunksize):
+        n = min(chunksize, rows - offset)
+        who = rng.integers(0, n_customers, n)
+        roaming = rng.random(n) < 0.2
+        location = np.where(roaming, rng.integers(0, len(branches), n), home[who])
+        fraud = rng.random(n) < np.where(roaming, 0.1, 0.025)
+        dates = start + rng.integers(0, 730 * 86_400, n).astype("timedelta64[s]")
+        conn.executemany(
+            "INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            zip(range(offset + 1, offset + n + 1), accounts[who].tolist(),
+                np.char.replace(np.datetime_as_string(dates), "T", " ").tolist(),
+                rng.lognormal(8.0, 1.0, n).round(2).tolist(),
+                np.array(transaction_channels)[rng.integers(0, len(transaction_channels), n)].tolist(),
+                np.array(branches)[location].tolist(),
+                (f"Merchant {m}" for m in rng.integers(0, 500, n)), fraud.astype(int).tolist()),
+        )
+        conn.commit()
+    conn.close()
+    return target
+
+
+def set_indexes(path, indexes):
+    """Replace the secondary indexes of the base tables and refresh planner stats."""
+    conn = sqlite3.connect(path)
+    for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+        "AND tbl_name IN ('customers', 'transactions')"
+    ).fetchall():
+        conn.execute(f"DROP INDEX {name}")
+    for table, entries in indexes.items():
+        for name, cols in entries:
+            conn.execute(f"CREATE INDEX {name} ON {table} ({cols})")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def time_queries(source, repeat):
+    timings = {}
+    for name, query in QUERIES:
+        query(source)  # warm up the page cache
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            query(source)
+            runs.append((time.perf_counter() - start) * 1000)
+        timings[name] = statistics.median(runs)
+    return timings
+
+
+def report(title, before, after, labels=("before", "after")):
+    print(f"\n{title}")
+    print(f"{'query':<34}{labels[0]:>12}{labels[1]:>12}{'speedup':>10}")
+    for name in before:
+        b, a = before[name], after[name]
+        print(f"{name:<34}{b:>10.1f}ms{a:>10.1f}ms{b / a if a else float('inf'):>9.1f}x")
+
+
+def bench_sqlite(rows, workdir, repeat):
+    path = os.path.join(workdir, f"bench_{rows}.db")
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        synthesize(path, rows)
+        print(f"✓ {rows:,} synthetic transactions written to {path} in {time.perf_counter() - start:.0f}s")
+
+    set_indexes(path, BASELINE_INDEXES)
+    before = time_queries(SqlSource(sqlite_pool(path), "?", use_summary=False), repeat)
+
+    set_indexes(path, secondary_indexes())
+    refresh_summary(SQLiteTarget(path))
+    after = time_queries(SqlSource(sqlite_pool(path), "?"), repeat)
+    report(f"SQLite, {rows:,} transactions (median of {repeat})", before, after)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard's SQL queries.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--workdir", default=".", help="Where the synthetic SQLite files are kept")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mysql", action="store_true", help="Benchmark the configured MySQL database instead")
+    args = parser.parse_args()
+
+    if args.mysql:
+        pool = mysql_pool()
+        raw = time_queries(SqlSource(pool, "%s", use_summary=False), args.repeat)
+        summary = time_queries(SqlSource(pool, "%s"), args.repeat)
+        report(f"MySQL (median of {args.repeat})", raw, summary, labels=("raw", "summary"))
+        return
+    for rows in args.rows:
+        bench_sqlite(rows, args.workdir, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Chunked, parallel bulk loader for the awash_analytics schema.
+
+Script version of load_to_mysql.ipynb for full-size exports:
+
+    python load_to_mysql.py --workers 4 --batch-size 5000
+    python load_to_mysql.py --infile            # LOAD DATA LOCAL INFILE per chunk
+    python load_to_mysql.py --sqlite awash.db   # local SQLite stand-in
+
+The CSVs are streamed in chunks. Each chunk is committed in its own
+transaction by a worker from a small connection pool, using multi-row
+INSERTs (or LOAD DATA LOCAL INFILE), so a bad chunk only rolls back
+itself. The secondary indexes from schema.sql are dropped before the
+load and rebuilt once at the end (except those backing a foreign key,
+which MySQL will not drop), and finished chunks are recorded in a
+checkpoint file so an interrupted load resumes where it stopped. A
+successful load ends by folding the new rows into fraud_daily_summary
+(see summary_tables.sql); ``--refresh-summary`` does only that step.
+
+Chunk inserts skip rows whose primary key is already there, so a chunk
+that was committed but not yet checkpointed when a run died is simply
+loaded again on resume.
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+config = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER'),
+    'password': os.getenv('DB_PASSWORD'),
+    'database': os.getenv('DB_NAME', 'awash_analytics'),
+    'port': int(os.getenv('DB_PORT', 3306)),
+}
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, "..", "data")
+CUSTOMERS_CSV = os.path.join(DATA_DIR, "awash_customers.csv")
+TRANSACTIONS_CSV = os.path.join(DATA_DIR, "awash_transactions.csv")
+SCHEMA_SQL = os.path.join(HERE, "schema.sql")
+CHECKPOINT_FILE = "load_checkpoint.json"
+
+TABLE_COLUMNS = {
+    "customers": ["customer_id", "full_name", "phone", "address", "account_number",
+                  "account_type", "balance_etb", "home_branch", "join_date"],
+    "transactions": ["transaction_id", "account_number", "date", "amount_etb",
+                     "channel", "location", "merchant", "fraud_flag"],
+}
+
+PRIMARY_KEYS = {"customers": "customer_id", "transactions": "transaction_id"}
+
+# SQLite stand-in for the tables in schema.sql
+SQLITE_DDL = [
+    """CREATE TABLE IF NOT EXISTS customers (
+        customer_id INTEGER PRIMARY KEY, full_name TEXT NOT NULL, phone TEXT, address TEXT,
+        account_number INTEGER UNIQUE NOT NULL, account_type TEXT, balance_etb REAL,
+        home_branch TEXT, join_date TEXT)""",
+    """CREATE TABLE IF NOT EXISTS transactions (
+        transaction_id INTEGER PRIMARY KEY, account_number INTEGER NOT NULL, date TEXT,
+        amount_etb REAL, channel TEXT, location TEXT, merchant TEXT, fraud_flag INTEGER DEFAULT 0)""",
+    # summary_tables.sql
+    """CREATE TABLE IF NOT EXISTS fraud_daily_summary (
+        summary_date TEXT NOT NULL, home_branch TEXT NOT NULL, channel TEXT NOT NULL, location TEXT NOT NULL,
+        txn_count INTEGER NOT NULL DEFAULT 0, fraud_count INTEGER NOT NULL DEFAULT 0,
+        amount_sum REAL NOT NULL DEFAULT 0, fraud_amount_sum REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (summary_date, home_branch, channel, location))""",
+    "CREATE INDEX IF NOT EXISTS idx_summary_channel ON fraud_daily_summary (channel, txn_count, fraud_count)",
+    "CREATE INDEX IF NOT EXISTS idx_summary_branch ON fraud_daily_summary (home_branch, txn_count, fraud_count)",
+    """CREATE TABLE IF NOT EXISTS summary_watermark (
+        table_name TEXT PRIMARY KEY, last_transaction_id INTEGER NOT NULL DEFAULT 0)""",
+    "INSERT OR IGNORE INTO summary_watermark (table_name, last_transaction_id) VALUES ('fraud_daily_summary', 0)",
+]
+
+# SQLite version of refresh_fraud_daily_summary() in summary_tables.sql
+SQLITE_SUMMARY_UPSERT = """
+    INSERT INTO fraud_daily_summary
+        (summary_date, home_branch, channel, location, txn_count, fraud_count, amount_sum, fraud_amount_sum)
+    SELECT DATE(t.date), COALESCE(c.home_branch, ''), COALESCE(t.channel, ''), COALESCE(t.location, ''),
+           COUNT(*), SUM(t.fraud_flag), SUM(t.amount_etb), SUM(t.fraud_flag * t.amount_etb)
+      FROM transactions t
+      JOIN customers c ON c.account_number = t.account_number
+     WHERE t.transaction_id > ? AND t.transaction_id <= ?
+     GROUP BY 1, 2, 3, 4
+    ON CONFLICT (summary_date, home_branch, channel, location) DO UPDATE SET
+        txn_count = txn_count + excluded.txn_count,
+        fraud_count = fraud_count + excluded.fraud_count,
+        amount_sum = amount_sum + excluded.amount_sum,
+        fraud_amount_sum = fraud_amount_sum + excluded.fraud_amount_sum"""
+
+
+def secondary_indexes(schema_path=SCHEMA_SQL):
+    """{table: [(index_name, columns)]} for the plain INDEX entries in schema.sql."""
+    with open(schema_path, encoding="utf-8") as f:
+        schema = f.read()
+    indexes = {}
+    for table, body in re.findall(r"CREATE TABLE (\w+)\s*\((.*?)\)\s*ENGINE", schema, re.S):
+        indexes[table] = re.findall(r"^\s*INDEX (\w+) \(([^)]+)\)", body, re.M)
+    return indexes
+
+
+class MySQLTarget:
+    placeholder = "%s"
+    max_params = 65_535
+
+    def __init__(self, workers, use_infile=False):
+        from mysql.connector import pooling
+
+        extra = {"allow_local_infile": True} if use_infile else {}
+        self.pool = pooling.MySQLConnectionPool(pool_name="awash_loader", pool_size=workers, **config, **extra)
+        self.use_infile = use_infile
+
+    def connect(self):
+        conn = self.pool.get_connection()
+        cursor = conn.cursor()
+        # Per-session: skip FK and unique re-checks while bulk loading
+        cursor.execute("SET foreign_key_checks = 0")
+        cursor.execute("SET unique_checks = 0")
+        cursor.close()
+        return conn
+
+    def index_columns(self, cursor, table):
+        """{index_name: [columns]} for every index on ``table``, including PRIMARY and UNIQUE keys."""
+        cursor.execute(
+            "SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX", (table,))
+        columns = {}
+        for name, column in cursor.fetchall():
+            columns.setdefault(name, []).append(column)
+        return columns
+
+    def foreign_key_columns(self, cursor, table):
+        """Column lists of the foreign keys on ``table``, on either side of the reference."""
+        cursor.execute(
+            "SELECT CONSTRAINT_NAME, TABLE_NAME, COLUMN_NAME, REFERENCED_COLUMN_NAME "
+            "FROM information_schema.KEY_COLUMN_USAGE WHERE TABLE_SCHEMA = DATABASE() "
+            "AND REFERENCED_TABLE_NAME IS NOT NULL AND (TABLE_NAME = %s OR REFERENCED_TABLE_NAME = %s) "
+            "ORDER BY CONSTRAINT_NAME, ORDINAL_POSITION", (table, table))
+        keys = {}
+        for constraint, child, column, referenced in cursor.fetchall():
+            keys.setdefault((constraint, child), []).append(column if child == table else referenced)
+        return list(keys.values())
+
+    def on_duplicate(self, table):
+        # Not INSERT IGNORE, which would also turn bad values into warnings
+        key = PRIMARY_KEYS[table]
+        return f" ON DUPLICATE KEY UPDATE {key} = {key}"
+
+    def drop_index(self, cursor, table, name):
+        cursor.execute(f"ALTER TABLE `{table}` DROP INDEX `{name}`")
+
+    def create_indexes(self, cursor, table, indexes):
+        adds = ", ".join(f"ADD INDEX `{name}` ({cols})" for name, cols in indexes)
+        cursor.execute(f"ALTER TABLE `{table}` {adds}")
+
+    def load_file(self, cursor, table, columns, path):
+        col_str = ", ".join(f"`{c}`" for c in columns)
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE '{path}' IGNORE INTO TABLE `{table}` "
+            f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' LINES TERMINATED BY '\\n' ({col_str})"
+        )
+
+    def refresh_summary(self, cursor):
+        cursor.callproc("refresh_fraud_daily_summary")  # from summary_tables.sql
+
+
+class SQLiteTarget:
+    placeholder = "?"
+    max_params = 32_766
+    use_infile = False
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()  # SQLite has a single writer
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA journal_mode = WAL")
+        for ddl in SQLITE_DDL:
+            conn.execute(ddl)
+        conn.commit()
+        conn.close()
+
+    def connect(self):
+        return _LockedSQLite(sqlite3.connect(self.path, timeout=60, check_same_thread=False), self.lock)
+
+    def index_columns(self, cursor, table):
+        cursor.execute(f"PRAGMA index_list({table})")
+        names = [row[1] for row in cursor.fetchall()]
+        columns = {}
+        for name in names:
+            cursor.execute(f"PRAGMA index_info({name})")
+            columns[name] = [row[2] for row in sorted(cursor.fetchall())]
+        return columns
+
+    def foreign_key_columns(self, cursor, table):
+        cursor.execute(f"PRAGMA foreign_key_list({table})")
+        keys = {}
+        for row in cursor.fetchall():
+            keys.setdefault(row[0], []).append(row[3])
+        return list(keys.values())
+
+    def on_duplicate(self, table):
+        return " ON CONFLICT DO NOTHING"
+
+    def drop_index(self, cursor, table, name):
+        cursor.execute(f"DROP INDEX {name}")
+
+    def create_indexes(self, cursor, table, indexes):
+        for name, cols in indexes:
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})")
+
+    def refresh_summary(self, cursor):
+        cursor.execute("SELECT last_transaction_id FROM summary_watermark WHERE table_name = 'fraud_daily_summary'")
+        from_id = cursor.fetchone()[0]
+        cursor.execute("SELECT COALESCE(MAX(transaction_id), ?) FROM transactions", (from_id,))
+        to_id = cursor.fetchone()[0]
+        cursor.execute(SQLITE_SUMMARY_UPSERT, (from_id, to_id))
+        cursor.execute("UPDATE summary_watermark SET last_transaction_id = ? WHERE table_name = 'fraud_daily_summary'", (to_id,))
+
+
+class _LockedSQLite:
+    """sqlite3 connection that holds the writer lock from first cursor to commit/rollback."""
+
+    def __init__(self, conn, lock):
+        self.conn = conn
+        self.lock = lock
+        self.held = False
+
+    def cursor(self):
+        if not self.held:
+            self.lock.acquire()
+            self.held = True
+        return self.conn.cursor()
+
+    def _release(self):
+        if self.held:
+            self.held = False
+            self.lock.release()
+
+    def commit(self):
+        self.conn.commit()
+        self._release()
+
+    def rollback(self):
+        self.conn.rollback()
+        self._release()
+
+    def close(self):
+        self._release()
+        self.conn.close()
+
+
+class Checkpoint:
+    """Chunks already committed per table, persisted after every chunk."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def done(self, table):
+        return set(self.state.get(table, {}).get("done", []))
+
+    def mark(self, table, chunk_no, rows):
+        with self.lock:
+            entry = self.state.setdefault(table, {"done": [], "rows": 0})
+            entry["done"].append(chunk_no)
+            entry["rows"] += rows
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.state, f)
+            os.replace(self.path + ".tmp", self.path)
+
+
+def _rows(df):
+    # Plain Python values, NULL for missing
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def insert_chunk(target, table, columns, df, batch_size):
+    conn = target.connect()
+    try:
+        cursor = conn.cursor()
+        if target.use_infile:
+            with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8") as tmp:
+                df.to_csv(tmp, header=False, index=False, na_rep="\\N")
+            try:
+                target.load_file(cursor, table, columns, tmp.name)
+            finally:
+                os.unlink(tmp.name)
+        else:
+            col_str = ", ".join(columns)
+            row_sql = "(" + ", ".join([target.placeholder] * len(columns)) + ")"
+            rows = _rows(df)
+            batch_size = max(1, min(batch_size, target.max_params // len(columns)))
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                sql = (f"INSERT INTO {table} ({col_str}) VALUES " + ", ".join([row_sql] * len(batch))
+                       + target.on_duplicate(table))
+                cursor.execute(sql, [v for row in batch for v in row])
+        conn.commit()
+        cursor.close()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return len(df)
+
+
+def load_table(target, csv_path, table, checkpoint, chunksize=50_000, batch_size=5_000, workers=4):
+    columns = TABLE_COLUMNS[table]
+    done = checkpoint.done(table)
+    start = time.perf_counter()
+    loaded = failed = 0
+    in_flight = threading.BoundedSemaphore(workers * 2)  # bounds chunks held in memory
+
+    def run(chunk_no, df):
+        try:
+            rows = insert_chunk(target, table, columns, df, batch_size)
+            checkpoint.mark(table, chunk_no, rows)
+            return rows, None
+        except Exception as e:
+            return 0, f"chunk {chunk_no}: {e}"
+        finally:
+            in_flight.release()
+
+    print(f"Loading {csv_path} into {table} ({len(done)} chunks already done)...")
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk_no, df in enumerate(pd.read_csv(csv_path, usecols=columns, chunksize=chunksize)):
+            if chunk_no in done:
+                continue
+            in_flight.acquire()
+            futures.append(pool.submit(run, chunk_no, df[columns]))
+        for future in futures:
+            rows, error = future.result()
+            loaded += rows
+            if error:
+                failed += 1
+                print(f"✗ {table} {error}")
+
+    elapsed = time.perf_counter() - start
+    print(f"✓ {loaded:,} rows into {table} in {elapsed:.1f}s ({loaded / elapsed if elapsed else 0:,.0f} rows/sec)"
+          + (f", {failed} chunk(s) failed - rerun to retry them" if failed else ""))
+    return loaded, failed
+
+
+def _columns(cols):
+    return [c.strip(" `") for c in cols.split(",")]
+
+
+def _backs_foreign_key(cols, others, foreign_keys):
+    """True when the index is the only one whose leading columns cover a foreign key.
+
+    MySQL refuses to drop such an index (error 1553) while the constraint exists.
+    """
+    for fk in foreign_keys:
+        if cols[:len(fk)] == fk and not any(other[:len(fk)] == fk for other in others):
+            return True
+    return False
+
+
+def drop_secondary_indexes(target, tables, indexes):
+    """Drop the droppable secondary indexes; returns {table: [(name, columns)]} to rebuild.
+
+    Indexes that back a foreign key stay in place. Indexes already missing
+    (dropped by an interrupted run) are returned so they are rebuilt too.
+    Any other drop error is raised after the indexes dropped so far have
+    been restored.
+    """
+    deferred = {}
+    conn = target.connect()
+    try:
+        cursor = conn.cursor()
+        for table in tables:
+            existing = target.index_columns(cursor, table)
+            ours = {name for name, _ in indexes.get(table, [])}
+            kept = [cols for name, cols in existing.items() if name not in ours]
+            foreign_keys = target.foreign_key_columns(cursor, table)
+            for name, cols in indexes.get(table, []):
+                if name not in existing:
+                    deferred.setdefault(table, []).append((name, cols))
+                elif _backs_foreign_key(_columns(cols), kept, foreign_keys):
+                    kept.append(_columns(cols))
+                    print(f"  keeping {table}.{name}: it backs a foreign key")
+                else:
+                    target.drop_index(cursor, table, name)
+                    deferred.setdefault(table, []).append((name, cols))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        conn.close()
+        rebuild_indexes(target, deferred)
+        raise
+    conn.close()  # hand the connection back so every worker gets one
+    return deferred
+
+
+def rebuild_indexes(target, deferred):
+    start = time.perf_counter()
+    conn = target.connect()
+    try:
+        cursor = conn.cursor()
+        for table, indexes in deferred.items():
+            target.create_indexes(cursor, table, indexes)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"✓ {sum(map(len, deferred.values()))} secondary indexes rebuilt in {time.perf_counter() - start:.1f}s")
+
+
+def with_indexes_deferred(target, tables, fn):
+    """Drop the secondary indexes of ``tables``, run fn, then rebuild the ones that were dropped."""
+    deferred = drop_secondary_indexes(target, tables, secondary_indexes())
+    try:
+        result = fn()
+    except BaseException:
+        # Restore the indexes, but report the load's own error rather than a rebuild failure
+        try:
+            rebuild_indexes(target, deferred)
+        except Exception as e:
+            print(f"✗ Secondary index rebuild failed ({e}); rerun the load to retry it")
+        raise
+    rebuild_indexes(target, deferred)
+    return result
+
+
+def refresh_summary(target):
+    """Fold newly loaded transactions into fraud_daily_summary."""
+    start = time.perf_counter()
+    conn = target.connect()
+    try:
+        cursor = conn.cursor()
+        target.refresh_summary(cursor)
+        conn.commit()
+        cursor.close()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    print(f"✓ fraud_daily_summary refreshed in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load the CSV exports into awash_analytics.")
+    parser.add_argument("--customers", default=CUSTOMERS_CSV)
+    parser.add_argument("--transactions", default=TRANSACTIONS_CSV)
+    parser.add_argument("--chunksize", type=int, default=50_000, help="CSV rows per committed chunk")
+    parser.add_argument("--batch-size", type=int, default=5_000, help="Rows per multi-row INSERT")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--infile", action="store_true", help="Use LOAD DATA LOCAL INFILE instead of INSERTs")
+    parser.add_argument("--sqlite", help="Load into this SQLite file instead of MySQL")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE)
+    parser.add_argument("--keep-indexes", action="store_true", help="Do not drop/rebuild secondary indexes")
+    parser.add_argument("--refresh-summary", action="store_true", help="Only refresh the daily summary table")
+    args = parser.parse_args()
+
+    target = SQLiteTarget(args.sqlite) if args.sqlite else MySQLTarget(args.workers, args.infile)
+    if args.refresh_summary:
+        refresh_summary(target)
+        return
+    checkpoint = Checkpoint(args.checkpoint)
+
+    def load_all():
+        failed = 0
+        for csv_path, table in ((args.customers, "customers"), (args.transactions, "transactions")):
+            failed += load_table(target, csv_path, table, checkpoint, args.chunksize, args.batch_size, args.workers)[1]
+        return failed
+
+    start = time.perf_counter()
+    if args.keep_indexes:
+        failed = load_all()
+    else:
+        failed = with_indexes_deferred(target, list(TABLE_COLUMNS), load_all)
+    print(f"\nLoad finished in {time.perf_counter() - start:.1f}s" + (" with failed chunks." if failed else "."))
+    if not failed and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    if not failed:
+        try:
+            refresh_summary(target)
+        except Exception as e:
+            print(f"✗ Summary refresh failed ({e}); has summary_tables.sql been run?")
+
+
+if __name__ == "__main__":
+    main()
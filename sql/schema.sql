@@ -14,7 +14,8 @@ CREATE TABLE customers (
     home_branch VARCHAR(150),
     join_date DATE,
     INDEX idx_account (account_number),
-    INDEX idx_branch (home_branch)
+    -- Branch filters and GROUP BY home_branch resolve accounts from the index alone
+    INDEX idx_branch_account (home_branch, account_number)
 ) ENGINE=InnoDB;
 
 -- Transactions Table
@@ -30,12 +31,18 @@ CREATE TABLE transactions (
     FOREIGN KEY (account_number) REFERENCES customers(account_number) ON DELETE CASCADE,
     INDEX idx_date (date),
     INDEX idx_amount (amount_etb),
-    INDEX idx_fraud (fraud_flag),
-    INDEX idx_channel (channel),
-    INDEX idx_location (location)
+    INDEX idx_location (location),
+    -- Covering for per-channel counts/sums and channel-filtered Explorer pages
+    -- (InnoDB appends the primary key, so pages come back in transaction_id order)
+    INDEX idx_channel_fraud (channel, fraud_flag, amount_etb),
+    -- "Fraud only" Explorer filter, optionally narrowed by channel
+    INDEX idx_fraud_channel (fraud_flag, channel),
+    -- Join from a branch's accounts to their transactions without touching rows
+    INDEX idx_account_fraud (account_number, fraud_flag)
 ) ENGINE=InnoDB;
 
 -- Optional: View for quick fraud overview
+-- (summary_tables.sql redefines it over the maintained daily summary)
 CREATE VIEW vw_fraud_summary AS
 SELECT 
     c.home_branch,
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Streaming ingest of new transactions into the columnar store.
+
+    python streaming_ingest.py --watch data/incoming --interval 2
+
+Upstream systems drop CSV or NDJSON files of new transactions into the
+watched directory. Every poll collects the files that arrived, joins
+them against an in-memory customer index keyed by ``account_number``,
+appends them to the Parquet store, folds them into the Overview cube and
+stratified sample, and then publishes a new dataset version. Dashboard
+caches are keyed on that version, so the next rerun picks up the new
+data without a full reload.
+Ingested files are moved to ``processed/`` (or ``failed/``) under the
+watched directory.
+
+A batch is named after its drop files and staged under underscore names
+that readers skip. A journal of the renames that publish it is written
+before any of them, and replayed after a crash, so a batch is either
+not in the store at all or in the data files, cube, sample and version
+alike. A batch that is already published is not ingested again.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from aggregates import cube_path, read_cube, update_cube
+from data_store import (
+    CUSTOMERS_CSV, KEEP_COLUMNS, STORE_DIR, TRANSACTION_DTYPES, append_to_store,
+    finish_merge, read_customers, store_exists, write_version,
+)
+from sampling import read_sample, sample_path, update_sample
+
+INCOMING_DIR = os.path.join("data", "incoming")
+PATTERNS = ("*.csv", "*.ndjson", "*.jsonl")
+
+
+class CustomerIndex:
+    """Customer attributes keyed by account_number, reloaded when the CSV changes."""
+
+    def __init__(self, customers_csv=CUSTOMERS_CSV):
+        self.customers_csv = customers_csv
+        self.mtime = None
+        self.table = None
+        self.refresh()
+
+    def refresh(self):
+        mtime = os.path.getmtime(self.customers_csv)
+        if mtime != self.mtime:
+            customers = read_customers(self.customers_csv)
+            columns = [c for c in customers.columns if c in KEEP_COLUMNS and c != "account_number"]
+            self.table = customers.drop_duplicates("account_number").set_index("account_number")[columns]
+            self.mtime = mtime
+
+    def attach(self, transactions):
+        """Join customer columns onto a batch with one hash lookup per row."""
+        found = self.table.reindex(transactions["account_number"].to_numpy())
+        found.index = transactions.index
+        return pd.concat([transactions, found], axis=1)
+
+
+def read_drop_file(path):
+    if path.endswith(".csv"):
+        df = pd.read_csv(path, dtype=TRANSACTION_DTYPES, parse_dates=["date"])
+    else:
+        df = pd.read_json(path, lines=True, dtype=False)
+        df = df.astype({k: v for k, v in TRANSACTION_DTYPES.items() if k in df.columns})
+        df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def pending_files(watch_dir, max_files):
+    files = sorted(f for pattern in PATTERNS for f in glob.glob(os.path.join(watch_dir, pattern)))
+    # Skip files modified in the last second; the producer may still be writing them
+    now = time.time()
+    return [f for f in files if now - os.path.getmtime(f) > 1.0][:max_files]
+
+
+def _move(path, watch_dir, sub):
+    target = os.path.join(watch_dir, sub)
+    os.makedirs(target, exist_ok=True)
+    shutil.move(path, os.path.join(target, os.path.basename(path)))
+
+
+def batch_name_for(files):
+    """Stable name for a set of drop files: the same files give the same name after a restart."""
+    digest = hashlib.sha1()
+    for path in sorted(files):
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def _batch_files(store_dir, batch_name, prefix):
+    return glob.glob(os.path.join(store_dir, "**", f"{prefix}-{batch_name}-*.parquet"), recursive=True)
+
+
+def _journal_path(store_dir, batch_name):
+    return os.path.join(store_dir, f"_ingest-{batch_name}.json")
+
+
+def publish_pending(store_dir=STORE_DIR):
+    """Finish publishing every journaled batch: rename its staged files, then bump the version.
+
+    Renames are skipped once done, so a journal can be replayed any number of times.
+    Returns the new version, or None when nothing was pending.
+    """
+    version = None
+    for journal in sorted(glob.glob(os.path.join(store_dir, "_ingest-*.json"))):
+        with open(journal, encoding="utf-8") as f:
+            renames = json.load(f)["renames"]
+        # Data files first, then the cube and sample, then the version the dashboard keys on
+        for src, dst in renames:
+            if os.path.exists(src):
+                os.replace(src, dst)
+        version = write_version(store_dir)
+        os.remove(journal)
+    return version
+
+
+def ingest_batch(files, customer_index, store_dir=STORE_DIR):
+    """Append one micro-batch of drop files; returns (rows, new version)."""
+    publish_pending(store_dir)  # a batch interrupted mid-publish goes out before the next one
+    frames, read = [], []
+    for path in files:
+        try:
+            frames.append(read_drop_file(path))
+            read.append(path)
+        except Exception as e:
+            print(f"✗ Skipping {path}: {e}")
+            _move(path, os.path.dirname(path), "failed")
+    if not frames:
+        return 0, None
+
+    batch_name = batch_name_for(read)
+    if _batch_files(store_dir, batch_name, "part"):
+        # Published before a crash stopped the files being moved
+        print(f"  batch {batch_name} is already in the store; not ingesting it again")
+        rows, version = 0, None
+    else:
+        customer_index.refresh()
+        batch = finish_merge(customer_index.attach(pd.concat(frames, ignore_index=True)))
+
+        # Stage everything under names readers skip; leftovers of an unjournaled attempt are rewritten
+        for stale in _batch_files(store_dir, batch_name, "_part"):
+            os.remove(stale)
+        rows = append_to_store(batch, store_dir, batch_name, prefix="_part")
+        renames = [(path, os.path.join(os.path.dirname(path), os.path.basename(path)[1:]))
+                   for path in _batch_files(store_dir, batch_name, "_part")]
+        for target, updated in ((cube_path(store_dir), update_cube(read_cube(store_dir), batch)),
+                                (sample_path(store_dir), update_sample(read_sample(store_dir), batch))):
+            staged = f"{target}.{batch_name}.staged"
+            updated.to_parquet(staged, index=False)
+            renames.append((staged, target))
+
+        journal = _journal_path(store_dir, batch_name)
+        with open(journal + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"files": [os.path.basename(p) for p in read], "renames": renames}, f)
+        os.replace(journal + ".tmp", journal)  # the commit point
+        version = publish_pending(store_dir)
+
+    for path in read:
+        if os.path.exists(path):
+            _move(path, os.path.dirname(path), "processed")
+    return rows, version
+
+
+def watch(watch_dir=INCOMING_DIR, store_dir=STORE_DIR, customers_csv=CUSTOMERS_CSV, interval=2.0, max_files=100, once=False):
+    if not store_exists(store_dir):
+        raise SystemExit(f"No store at {store_dir}; run `python data_store.py` first")
+    os.makedirs(watch_dir, exist_ok=True)
+    if publish_pending(store_dir):
+        print("✓ Finished publishing a batch interrupted by the last run")
+    customer_index = CustomerIndex(customers_csv)
+    print(f"Watching {watch_dir} for new transactions (every {interval}s)")
+    while True:
+        files = pending_files(watch_dir, max_files)
+        if files:
+            start = time.perf_counter()
+            rows, version = ingest_batch(files, customer_index, store_dir)
+            if rows:
+                print(f"✓ {rows:,} rows from {len(files)} file(s) ingested in "
+                      f"{time.perf_counter() - start:.2f}s -> version {version}")
+        if once:
+            return
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail a directory of transaction drop files into the store.")
+    parser.add_argument("--watch", default=INCOMING_DIR)
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument("--customers", default=CUSTOMERS_CSV)
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls")
+    parser.add_argument("--max-files", type=int, default=100, help="Drop files per micro-batch")
+    parser.add_argument("--once", action="store_true", help="Ingest what is there and exit")
+    args = parser.parse_args()
+    watch(args.watch, args.store, args.customers, args.interval, args.max_files, args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Out-of-core training pipeline for the fraud model.
+
+    python train.py                                  # store (or CSVs), default candidates
+    python train.py --velocity --workers 4 --out app
+    python train.py --candidates candidates.json --metric roc_auc
+
+The script replaces the notebook's in-memory ``pd.read_sql`` + ``get_dummies`` fit:
+
+1. Rows stream from the Parquet store (or the CSV exports) in chunks.
+   Each chunk is encoded by the shared FeatureSchema straight into
+   float32 ``.npy`` files, one each for the train and test rows. The
+   split is a hash of ``transaction_id``, so a transaction stays on the
+   same side as the data grows. With ``--velocity`` the per-account
+   velocity features are added from the narrow (account, time, amount,
+   location) projection.
+2. The cache directory is keyed by dataset version + feature schema +
+   split. Retraining on unchanged data finds it and goes straight to
+   fitting.
+3. Candidate models are fitted in a process pool. Every worker
+   memory-maps the same cached matrix, which sklearn's trees read
+   without a copy (float32, C order).
+4. The best candidate by ``--metric`` on the test rows is written as
+   ``fraud_model.pkl``, ``model_features.pkl`` and ``feature_schema.pkl``,
+   along with ``training_report.json`` (phase timings, cache hit, metrics
+   of every candidate).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from constants import account_types, transaction_channels
+from features import SCHEMA_PATH, FeatureSchema
+
+CACHE_DIR = os.path.join("data", "train_cache")
+MANIFEST = "manifest.json"
+REPORT = "training_report.json"
+CHUNK_ROWS = 500_000
+TEST_SIZE = 0.3
+SPLIT_SEED = 42
+
+MODEL_COLUMNS = ["transaction_id", "date", "amount_etb", "location", "home_branch", "balance_etb",
+                 "channel", "account_type", "fraud_flag"]
+VELOCITY_COLUMNS = ["account_number", "date", "amount_etb", "location"]
+
+# name -> (estimator, params); all tree ensembles, so FlatForest and the snapshot can export the winner
+CANDIDATES = {
+    "rf_100_balanced": ("random_forest", {"n_estimators": 100, "class_weight": "balanced", "random_state": 42}),
+    "rf_200_leaf5": ("random_forest", {"n_estimators": 200, "min_samples_leaf": 5, "max_features": "sqrt",
+                                       "class_weight": "balanced_subsample", "random_state": 42}),
+    "rf_100_depth12": ("random_forest", {"n_estimators": 100, "max_depth": 12, "class_weight": "balanced",
+                                         "random_state": 42}),
+    "extra_trees_200": ("extra_trees", {"n_estimators": 200, "min_samples_leaf": 3, "class_weight": "balanced",
+                                        "random_state": 42}),
+}
+METRICS = ["average_precision", "roc_auc", "precision", "recall", "f1"]
+
+
+def _estimator(kind):
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+    return {"random_forest": RandomForestClassifier, "extra_trees": ExtraTreesClassifier}[kind]
+
+
+def is_test(transaction_ids, test_size=TEST_SIZE, seed=SPLIT_SEED):
+    """Deterministic split: a multiplicative hash of the id, uniform in [0, 1)."""
+    h = (np.asarray(transaction_ids, dtype=np.uint64) + np.uint64(seed)) * np.uint64(0x9E3779B97F4A7C15)
+    return (h >> np.uint64(40)).astype(np.float64) / 2**24 < test_size
+
+
+def default_schema(velocity=False):
+    """Base features plus drop-first dummies over the known channels and account types."""
+    from velocity import VELOCITY_FEATURES
+
+    levels = pd.DataFrame({"channel": pd.Series(transaction_channels), "account_type": pd.Series(account_types)})
+    schema = FeatureSchema.fit(levels)
+    return FeatureSchema(schema.features + VELOCITY_FEATURES) if velocity else schema
+
+
+class TrainingData:
+    """Chunked reads of the merged table from the store or the CSV exports."""
+
+    def __init__(self, kind="auto", chunksize=CHUNK_ROWS):
+        from data_sources import open_live_source
+
+        self.source = open_live_source(kind)
+        self.kind = "store" if hasattr(self.source, "store_dir") else "csv"
+        self.chunksize = chunksize
+
+    def version(self):
+        return self.source.version()
+
+    def column(self, name):
+        if self.kind == "store":
+            from data_store import open_store
+
+            return open_store(self.source.store_dir).to_table(columns=[name])[name].to_numpy()
+        return pd.read_csv(self.source.transactions_csv, usecols=[name], engine="pyarrow")[name].to_numpy()
+
+    def chunks(self, columns):
+        if self.kind == "store":
+            import pyarrow as pa
+
+            from data_store import compact_frame, open_store
+
+            batches = open_store(self.source.store_dir).to_batches(columns=columns, batch_size=self.chunksize)
+            for batch in batches:
+                if batch.num_rows:
+                    yield compact_frame(pa.Table.from_batches([batch]).to_pandas())
+        else:
+            from data_store import merge_customers, read_customers, read_transactions
+
+            customers = read_customers(self.source.customers_csv)
+            for chunk in read_transactions(self.source.transactions_csv, chunksize=self.chunksize):
+                yield merge_customers(chunk, customers)[columns]
+
+
+def cache_key(version, schema, test_size=TEST_SIZE, seed=SPLIT_SEED):
+    spec = json.dumps([version, schema.features, schema.high_amount_etb, test_size, seed])
+    return hashlib.sha1(spec.encode()).hexdigest()[:16]
+
+
+def build_feature_cache(data, schema, path, test_size=TEST_SIZE, seed=SPLIT_SEED):
+    """Encode the whole table into memory-mapped train/test .npy files under ``path``."""
+    from numpy.lib.format import open_memmap
+
+    from velocity import needed_features, velocity_features
+
+    start = time.perf_counter()
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    # Split sizes first (ids only), so the files can be preallocated
+    test_mask = is_test(data.column("transaction_id"), test_size, seed)
+    n_test = int(test_mask.sum())
+    n_train = len(test_mask) - n_test
+    n_features = len(schema.features)
+    X = {"train": open_memmap(os.path.join(tmp, "X_train.npy"), "w+", np.float32, (n_train, n_features)),
+         "test": open_memmap(os.path.join(tmp, "X_test.npy"), "w+", np.float32, (n_test, n_features))}
+    y = {"train": open_memmap(os.path.join(tmp, "y_train.npy"), "w+", np.int8, (n_train,)),
+         "test": open_memmap(os.path.join(tmp, "y_test.npy"), "w+", np.int8, (n_test,))}
+
+    velocity = needed_features(schema)
+    columns = list(dict.fromkeys(MODEL_COLUMNS + (VELOCITY_COLUMNS if velocity else [])))
+    filled = {"train": 0, "test": 0}
+    history, splits = [], []
+    for chunk in data.chunks(columns):
+        test = is_test(chunk["transaction_id"].to_numpy(), test_size, seed)
+        # Velocity columns are written after the pass, over the full history
+        encoded = schema.transform(chunk.assign(**dict.fromkeys(velocity, 0.0)))
+        for side, rows in (("train", ~test), ("test", test)):
+            lo, hi = filled[side], filled[side] + int(rows.sum())
+            X[side][lo:hi] = encoded[rows]
+            y[side][lo:hi] = chunk["fraud_flag"].to_numpy()[rows]
+            filled[side] = hi
+        if velocity:
+            history.append(chunk[VELOCITY_COLUMNS])
+            splits.append(test)
+        print(f"  encoded {filled['train'] + filled['test']:>13,} / {n_train + n_test:,} rows")
+    if filled != {"train": n_train, "test": n_test}:
+        raise RuntimeError(f"data changed while caching features: {filled} rows, expected {n_train:,} / {n_test:,}")
+
+    if velocity:
+        values = velocity_features(pd.concat(history, ignore_index=True))[velocity].to_numpy(dtype=np.float32)
+        test = np.concatenate(splits)
+        cols = [schema.position[name] for name in velocity]
+        for side, rows in (("train", ~test), ("test", test)):
+            X[side][:, cols] = values[rows]
+        del history, values
+
+    for array in (*X.values(), *y.values()):
+        array.flush()
+    manifest = {
+        "version": data.version(), "features": schema.features, "high_amount_etb": schema.high_amount_etb,
+        "test_size": test_size, "seed": seed, "n_train": n_train, "n_test": n_test,
+        "fraud_rate_train": float(y["train"].mean()) if n_train else 0.0,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    del X, y
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp, path)
+    return manifest
+
+
+def load_cache(path, split):
+    """(X, y) of one split, memory-mapped."""
+    return (np.load(os.path.join(path, f"X_{split}.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, f"y_{split}.npy"), mmap_mode="r"))
+
+
+def evaluate(y_true, prob, threshold=0.5):
+    from sklearn.metrics import average_precision_score, precision_recall_fscore_support, roc_auc_score
+
+    precision, recall, f1, _ = precision_recall_fscore_support(y_true, prob > threshold, average="binary", zero_division=0)
+    both = len(np.unique(y_true)) == 2
+    return {
+        "average_precision": float(average_precision_score(y_true, prob)) if both else None,
+        "roc_auc": float(roc_auc_score(y_true, prob)) if both else None,
+        "precision": float(precision), "recall": float(recall), "f1": float(f1),
+    }
+
+
+def fit_candidate(cache_path, name, kind, params, features, n_jobs=1):
+    """Fit one candidate on the memory-mapped cache (runs in a worker process)."""
+    X_train, y_train = load_cache(cache_path, "train")
+    X_test, y_test = load_cache(cache_path, "test")
+
+    start = time.perf_counter()
+    model = _estimator(kind)(**params, n_jobs=n_jobs)
+    model.fit(X_train, np.asarray(y_train))
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prob = model.predict_proba(X_test)[:, list(model.classes_).index(1)] if 1 in model.classes_ else np.zeros(len(X_test))
+    predict_seconds = time.perf_counter() - start
+    # Fitted on arrays; record the names so the app's DataFrame inputs validate
+    model.feature_names_in_ = np.asarray(features, dtype=object)
+
+    os.makedirs(os.path.join(cache_path, "models"), exist_ok=True)
+    model_path = os.path.join(cache_path, "models", f"{name}.pkl")
+    joblib.dump(model, model_path)
+    return {"name": name, "model": kind, "params": params, "fit_seconds": round(fit_seconds, 2),
+            "predict_seconds": round(predict_seconds, 2), "path": model_path, **evaluate(np.asarray(y_test), prob)}
+
+
+def train(kind="auto", candidates=None, out_dir=".", cache_dir=CACHE_DIR, velocity=False, workers=None,
+          metric="average_precision", test_size=TEST_SIZE, chunksize=CHUNK_ROWS, rebuild=False):
+    """Run the pipeline; returns the report dict."""
+    candidates = candidates or CANDIDATES
+    report = {"timings": {}, "started": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    start = time.perf_counter()
+    data = TrainingData(kind, chunksize)
+    schema = default_schema(velocity)
+    path = os.path.join(cache_dir, cache_key(data.version(), schema, test_size))
+    report["cache"] = {"path": path, "hit": os.path.exists(os.path.join(path, MANIFEST)) and not rebuild}
+    if report["cache"]["hit"]:
+        print(f"✓ Feature cache for version {data.version()} found at {path}; skipping encoding")
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    else:
+        print(f"Encoding {data.kind} data (version {data.version()}) into {path}")
+        manifest = build_feature_cache(data, schema, path, test_size)
+    report["data"] = {k: manifest[k] for k in ("version", "n_train", "n_test", "fraud_rate_train")}
+    report["timings"]["features"] = round(time.perf_counter() - start, 2)
+
+    # One process per candidate; the cores are split between them
+    start = time.perf_counter()
+    workers = workers or min(len(candidates), os.cpu_count() or 1)
+    n_jobs = max(1, (os.cpu_count() or 1) // workers)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fit_candidate, path, name, model, params, schema.features, n_jobs)
+                   for name, (model, params) in candidates.items()]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"  {result['name']:<20} {metric} {result[metric] or 0:.4f}  fit {result['fit_seconds']:.1f}s")
+    report["timings"]["fit"] = round(time.perf_counter() - start, 2)
+
+    results.sort(key=lambda r: r[metric] if r[metric] is not None else -1, reverse=True)
+    best = results[0]
+    report["candidates"] = results
+    report["best"] = best["name"]
+    report["metric"] = metric
+
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    shutil.copyfile(best["path"], os.path.join(out_dir, "fraud_model.pkl"))
+    joblib.dump(schema.features, os.path.join(out_dir, "model_features.pkl"))
+    schema.save(os.path.join(out_dir, SCHEMA_PATH))
+    report["timings"]["save"] = round(time.perf_counter() - start, 2)
+    with open(os.path.join(out_dir, REPORT), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the fraud model from the store with cached features.")
+    parser.add_argument("--source", default="auto", choices=["auto", "csv", "store"])
+    parser.add_argument("--out", default=".", help="Where fraud_model.pkl, model_features.pkl and the report go")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--candidates", help="JSON file of {name: [estimator, params]} (default: built-in grid)")
+    parser.add_argument("--only", nargs="+", help="Fit only these candidates")
+    parser.add_argument("--velocity", action="store_true", help="Add the per-account velocity features")
+    parser.add_argument("--workers", type=int, help="Candidate processes (default: one per candidate, up to the cores)")
+    parser.add_argument("--metric", default="average_precision", choices=METRICS)
+    parser.add_argument("--test-size", type=float, default=TEST_SIZE)
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--rebuild", action="store_true", help="Re-encode even when the cache is current")
+    args = parser.parse_args()
+
+    candidates = CANDIDATES
+    if args.candidates:
+        with open(args.candidates, encoding="utf-8") as f:
+            candidates = {name: tuple(spec) for name, spec in json.load(f).items()}
+    if args.only:
+        candidates = {name: candidates[name] for name in args.only}
+
+    report = train(args.source, candidates, args.out, args.cache_dir, args.velocity, args.workers,
+                   args.metric, args.test_size, args.chunksize, args.rebuild)
+    print(f"\n{'candidate':<20}{'avg prec':>10}{'roc auc':>10}{'recall':>8}{'fit s':>8}")
+    for r in report["candidates"]:
+        print(f"{r['name']:<20}{r['average_precision'] or 0:>10.4f}{r['roc_auc'] or 0:>10.4f}{r['recall']:>8.3f}{r['fit_seconds']:>8.1f}")
+    timings = ", ".join(f"{phase} {seconds:.1f}s" for phase, seconds in report["timings"].items())
+    print(f"✓ {report['best']} saved to {args.out} ({timings}; cache {'hit' if report['cache']['hit'] else 'built'})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""Per-account velocity and behavioral features.
+
+For every transaction, from the same account's earlier activity:
+
+* ``txn_count_1h`` / ``amount_sum_1h``   - transactions and ETB in the last hour
+* ``txn_count_24h`` / ``amount_sum_24h`` - the same over the last 24 hours
+* ``distinct_locations_24h``             - locations used in the last 24 hours,
+                                           this transaction's included
+* ``amount_deviation``                   - z-score of log(amount) against all of the
+                                           account's earlier amounts (0 until it has two)
+
+The windows look at the account's last ``ring_size`` transactions only,
+so counts saturate at ``ring_size``. That bound is what lets the online
+state stay a fixed-size ring per account. ``velocity_features`` computes
+the features over history in a vectorized pass over rows sorted by
+(account, time). ``VelocityState`` keeps one ring per account in
+preallocated arrays, within a memory budget, and gives a new
+transaction's features in O(1). For a time-ordered stream both produce
+the same values, so a model trained on one is served by the other.
+
+Models pick the features up through FeatureSchema passthrough columns:
+train with these columns in the frame and they become part of the
+schema.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from constants import branches
+
+VELOCITY_FEATURES = ["txn_count_1h", "amount_sum_1h", "txn_count_24h", "amount_sum_24h",
+                     "distinct_locations_24h", "amount_deviation"]
+WINDOWS = {"1h": 3_600, "24h": 86_400}
+HISTORY_COLUMNS = ["account_number", "date", "amount_etb", "location"]  # what load_history reads
+RING_SIZE = 8
+MIN_LOG_STD = 0.1  # floor for the amount deviation's denominator
+MEMORY_BUDGET = 512 * 1024 * 1024
+EPOCH = np.datetime64("2020-01-01T00:00:00", "s")  # ring timestamps are int32 seconds from here
+DICT_ENTRY_BYTES = 100  # account -> slot dict, per entry (estimate)
+EVICT_FRACTION = 1 / 16
+
+
+def _seconds(dates):
+    dates = pd.to_datetime(dates).to_numpy(dtype="datetime64[s]")
+    return (dates - EPOCH).astype(np.int64)
+
+
+def velocity_features(df, ring_size=RING_SIZE):
+    """Velocity features of every row of a transactions frame, aligned to its index.
+
+    Needs account_number, date, amount_etb and location. Rows with equal
+    timestamps count in their order in the frame.
+    """
+    n = len(df)
+    accounts = pd.factorize(df["account_number"])[0]
+    locations = pd.factorize(df["location"])[0]
+    seconds = _seconds(df["date"])
+    # Same float32 amounts as the online ring
+    amounts = df["amount_etb"].to_numpy(dtype=np.float32).astype(np.float64)
+
+    order = np.lexsort((np.arange(n), seconds, accounts))
+    acct, t, amt, loc = accounts[order], seconds[order], amounts[order], locations[order]
+
+    # Next row of the same (account, location), in sorted order; n when none
+    by_location = np.lexsort((np.arange(n), loc, acct))
+    same = (acct[by_location[1:]] == acct[by_location[:-1]]) & (loc[by_location[1:]] == loc[by_location[:-1]])
+    next_same = np.full(n, n)
+    next_same[by_location[:-1][same]] = by_location[1:][same]
+
+    out = {name: np.zeros(n) for name in VELOCITY_FEATURES}
+    out["distinct_locations_24h"][:] = 1
+    rows = np.arange(n)
+    for k in range(1, min(ring_size, n - 1) + 1):
+        i, j = rows[k:], rows[:-k]
+        dt = np.where(acct[i] == acct[j], t[i] - t[j], np.iinfo(np.int64).max)
+        for window, seconds_ in WINDOWS.items():
+            hit = dt < seconds_
+            out[f"txn_count_{window}"][k:] += hit
+            out[f"amount_sum_{window}"][k:] += np.where(hit, amt[j], 0.0)
+        # Count j when it is its location's latest use before i, and not i's location
+        out["distinct_locations_24h"][k:] += (dt < WINDOWS["24h"]) & (next_same[j] > i)
+
+    # Running log-amount moments over all earlier transactions of the account
+    x = np.log1p(amt)
+    start = np.flatnonzero(np.r_[True, acct[1:] != acct[:-1]])
+    first = np.repeat(start, np.diff(np.r_[start, n]))
+    s1, s2 = np.r_[0.0, np.cumsum(x)], np.r_[0.0, np.cumsum(x * x)]
+    out["amount_deviation"] = _deviation(x, rows - first, s1[rows] - s1[first], s2[rows] - s2[first])
+
+    result = np.empty((n, len(VELOCITY_FEATURES)))
+    result[order] = np.column_stack([out[name] for name in VELOCITY_FEATURES])
+    return pd.DataFrame(result, columns=VELOCITY_FEATURES, index=df.index)
+
+
+def _deviation(x, count, s1, s2):
+    count = np.asarray(count, dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s1 / count
+        std = np.sqrt(np.maximum(s2 / count - mean * mean, 0.0))
+        z = (x - mean) / np.maximum(std, MIN_LOG_STD)
+    return np.where(count >= 2, z, 0.0)
+
+
+class VelocityState:
+    """Online per-account ring buffers, bounded by a memory budget.
+
+    Each account holds its last ``ring_size`` (time, amount, location)
+    entries plus running log-amount moments in fixed-width array rows.
+    When the budget is full, the accounts idle longest are evicted in
+    blocks; they start again without history. Thread-safe.
+    """
+
+    def __init__(self, ring_size=RING_SIZE, max_bytes=MEMORY_BUDGET):
+        self.ring_size = ring_size
+        self.capacity = max(1, int(max_bytes // self.bytes_per_account(ring_size)))
+        self.evictions = 0
+        self._slots = {}
+        self._free = []
+        self._locations = {name: i for i, name in enumerate(branches)}
+        self._lock = threading.Lock()
+        self._allocate(min(self.capacity, 1024))
+
+    @staticmethod
+    def bytes_per_account(ring_size=RING_SIZE):
+        # ring: int32 time, float32 amount, uint16 location; head, size, count, moments, last seen, key
+        return ring_size * (4 + 4 + 2) + 1 + 1 + 4 + 8 + 8 + 4 + 8 + DICT_ENTRY_BYTES
+
+    def _allocate(self, size):
+        old = getattr(self, "_size", 0)
+        arrays = {
+            "times": ((size, self.ring_size), np.int32), "amounts": ((size, self.ring_size), np.float32),
+            "locs": ((size, self.ring_size), np.uint16), "head": (size, np.uint8), "filled": (size, np.uint8),
+            "count": (size, np.uint32), "s1": (size, np.float64), "s2": (size, np.float64),
+            "last_seen": (size, np.int32), "keys": (size, np.int64),
+        }
+        for name, (shape, dtype) in arrays.items():
+            grown = np.zeros(shape, dtype=dtype)
+            if old:
+                grown[:old] = getattr(self, "_" + name)
+            setattr(self, "_" + name, grown)
+        self._free.extend(range(size - 1, old - 1, -1))
+        self._size = size
+
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def nbytes(self):
+        return self._size * (self.bytes_per_account(self.ring_size) - DICT_ENTRY_BYTES) + len(self._slots) * DICT_ENTRY_BYTES
+
+    def _location(self, name):
+        code = self._locations.get(name)
+        if code is None:
+            code = self._locations[name] = min(len(self._locations), np.iinfo(np.uint16).max)
+        return code
+
+    def _slot(self, account, create):
+        slot = self._slots.get(account)
+        if slot is not None or not create:
+            return slot
+        if not self._free:
+            if self._size < self.capacity:
+                self._allocate(min(self.capacity, self._size * 2))
+            else:
+                self._evict()
+        slot = self._free.pop()
+        self._slots[account] = slot
+        self._keys[slot] = account
+        self._head[slot] = self._filled[slot] = self._count[slot] = 0
+        self._s1[slot] = self._s2[slot] = 0.0
+        return slot
+
+    def _evict(self):
+        n = max(1, int(self._size * EVICT_FRACTION))
+        idle = np.argpartition(self._last_seen, n - 1)[:n]
+        for slot in idle.tolist():
+            del self._slots[int(self._keys[slot])]
+            self._free.append(slot)
+        self.evictions += n
+
+    def _features(self, slot, t, amount, loc):
+        values = dict.fromkeys(VELOCITY_FEATURES, 0.0)
+        values["distinct_locations_24h"] = 1.0
+        x = np.log1p(np.float64(np.float32(amount)))
+        if slot is None:
+            return values
+        filled = self._filled[slot]
+        dt = t - self._times[slot, :filled].astype(np.int64)
+        amounts = self._amounts[slot, :filled].astype(np.float64)
+        for window, seconds in WINDOWS.items():
+            hit = (dt >= 0) & (dt < seconds)
+            values[f"txn_count_{window}"] = float(hit.sum())
+            values[f"amount_sum_{window}"] = float(amounts[hit].sum())
+        locs = self._locs[slot, :filled][(dt >= 0) & (dt < WINDOWS["24h"])]
+        values["distinct_locations_24h"] = float(len(set(locs.tolist()) - {loc}) + 1)
+        values["amount_deviation"] = float(_deviation(x, self._count[slot], self._s1[slot], self._s2[slot]))
+        return values
+
+    def _update(self, slot, t, amount, loc):
+        head = self._head[slot]
+        self._times[slot, head] = t
+        self._amounts[slot, head] = amount
+        self._locs[slot, head] = loc
+        self._head[slot] = (head + 1) % self.ring_size
+        self._filled[slot] = min(self._filled[slot] + 1, self.ring_size)
+        x = np.log1p(np.float64(np.float32(amount)))
+        self._count[slot] += 1
+        self._s1[slot] += x
+        self._s2[slot] += x * x
+        self._last_seen[slot] = max(self._last_seen[slot], t)
+
+    def features(self, account, date, amount, location):
+        """Features of a new transaction, without recording it."""
+        with self._lock:
+            t = int(_seconds([date])[0])
+            return self._features(self._slot(int(account), create=False), t, amount, self._location(location))
+
+    def observe(self, account, date, amount, location):
+        """Features of a new transaction, then record it in the account's ring."""
+        with self._lock:
+            t = int(_seconds([date])[0])
+            loc = self._location(location)
+            values = self._features(self._slots.get(int(account)), t, amount, loc)
+            self._update(self._slot(int(account), create=True), t, amount, loc)
+            return values
+
+    def observe_frame(self, df):
+        """observe() every row of a frame in order; features aligned to its index."""
+        seconds = _seconds(df["date"])
+        with self._lock:
+            rows = []
+            for account, t, amount, location in zip(df["account_number"].tolist(), seconds.tolist(),
+                                                     df["amount_etb"].tolist(), df["location"].tolist()):
+                if account is None or account != account:  # unknown account: no history
+                    rows.append(self._features(None, t, amount, 0))
+                    continue
+                loc = self._location(location)
+                rows.append(self._features(self._slots.get(int(account)), t, amount, loc))
+                self._update(self._slot(int(account), create=True), t, amount, loc)
+        return pd.DataFrame(rows, columns=VELOCITY_FEATURES, index=df.index, dtype=np.float64)
+
+    def load_history(self, df):
+        """Warm the rings from historical transactions in one vectorized pass.
+
+        Keeps the most recently active accounts when there are more than
+        the budget holds. Replaces any state of the same accounts.
+        """
+        df = df[df["account_number"].notna()]
+        accounts = df["account_number"].to_numpy(dtype=np.int64)
+        seconds = _seconds(df["date"])
+        order = np.lexsort((np.arange(len(df)), seconds, accounts))
+        acct, t = accounts[order], seconds[order]
+        amt = df["amount_etb"].to_numpy(dtype=np.float32)[order]
+        if not len(acct):
+            return 0
+        with self._lock:
+            loc = np.array([self._location(name) for name in df["location"].tolist()], dtype=np.uint16)[order]
+            x = np.log1p(amt.astype(np.float64))
+
+            start = np.flatnonzero(np.r_[True, acct[1:] != acct[:-1]])
+            end = np.r_[start[1:], len(acct)]
+            keep = np.argsort(t[end - 1])[-self.capacity:]  # most recently active accounts
+            start, end = np.sort(start[keep]), np.sort(end[keep])
+            while self._size < min(self.capacity, len(self._slots) + len(start)):
+                self._allocate(min(self.capacity, self._size * 2))
+
+            slots = np.array([self._slot(int(a), create=True) for a in acct[start]], dtype=np.int64)
+            sizes = end - start
+            self._count[slots] = sizes
+            self._s1[slots], self._s2[slots] = np.add.reduceat(x, start), np.add.reduceat(x * x, start)
+            self._last_seen[slots] = t[end - 1]
+            filled = np.minimum(sizes, self.ring_size)
+            self._filled[slots], self._head[slots] = filled, filled % self.ring_size
+
+            # The last `filled` rows of each account go to ring positions 0..filled-1
+            pos = np.arange(filled.sum()) - np.repeat(np.cumsum(filled) - filled, filled)
+            rows = np.repeat(end - filled, filled) + pos
+            owner = np.repeat(slots, filled)
+            self._times[owner, pos] = t[rows]
+            self._amounts[owner, pos] = amt[rows]
+            self._locs[owner, pos] = loc[rows]
+        return len(start)
+
+
+def needed_features(schema):
+    """Velocity features a FeatureSchema (or feature list) expects."""
+    features = getattr(schema, "passthrough", schema)
+    return [name for name in VELOCITY_FEATURES if name in features]
+
+
+def add_velocity_features(df, schema, state=None):
+    """Attach the velocity columns a schema needs and the frame lacks.
+
+    With an online ``state`` the rows are observed in order (and recorded);
+    otherwise they are computed from the frame's own history.
+    """
+    missing = [name for name in needed_features(schema) if name not in df.columns]
+    if not missing:
+        return df
+    values = state.observe_frame(df) if state is not None else velocity_features(df)
+    return df.assign(**{name: values[name] for name in missing})